@@ -3,7 +3,6 @@
 """
 import json
 from typing import List, Optional, Dict, Any
-from PyQt6.QtWidgets import QMessageBox
 from models import AnnotationMarker, VideoInfo, LabelConfig, ProgressionType
 from utils import FileUtils
 
@@ -798,7 +798,7 @@ class MultiLabelAnnotationPage(QWidget):
 
         try:
             # 使用修复后的多标签导出器
-            from dataset_exporter import export_multi_label_dataset_fixed
+            from export_dialog import export_multi_label_dataset_fixed
 
             print("🔧 使用修复后的导出函数...")  # 调试信息
 
@@ -834,4 +834,43 @@ class MultiLabelAnnotationPage(QWidget):
 
         except Exception as e:
             print(f"❌ 导出异常: {e}")  # 调试信息
-            QMessageBox.critical(self, "导出错误", f"多标签数据集导出失败: {str(e)}")
\ No newline at end of file
+            QMessageBox.critical(self, "导出错误", f"多标签数据集导出失败: {str(e)}")
+
+    def add_to_export_queue(self):
+        """把当前项目加入导出任务队列，由 batch_export queue run 在后台批量导出"""
+        if not self.annotation_manager.annotations:
+            QMessageBox.warning(self, "警告", "暂无标注数据可导出为数据集")
+            return
+
+        # 队列任务按项目文件导出，未保存的修改需要先保存
+        if not self.annotation_manager.project_file_path or self.annotation_manager.is_modified:
+            if not self.save_project():
+                return
+
+        output_root = QFileDialog.getExistingDirectory(
+            self, "选择数据集输出根目录", "", QFileDialog.Option.ShowDirsOnly
+        )
+        if not output_root:
+            return
+
+        from export_queue import ExportQueue, DEFAULT_QUEUE_PATH
+
+        project_path = self.annotation_manager.project_file_path
+        stem = os.path.splitext(os.path.basename(project_path))[0]
+        try:
+            export_queue = ExportQueue.load(DEFAULT_QUEUE_PATH)
+            job = export_queue.add(project_path, os.path.join(output_root, stem), options={"incremental": True})
+            export_queue.save()
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"加入导出队列失败: {str(e)}")
+            return
+
+        pending = len(export_queue.jobs_with_status("pending"))
+        QMessageBox.information(
+            self,
+            "已加入导出队列",
+            f"任务 [{job.job_id}] {job.name} -> {job.output_dir}\n"
+            f"队列中共有 {pending} 个等待的任务。\n\n"
+            f"运行以下命令开始导出（可中断，重新运行时继续）:\n"
+            f"python -m batch_export queue run"
+        )
\ No newline at end of file
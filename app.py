@@ -29,7 +29,27 @@ def check_dependencies():
         'utils.py',
         'video_player.py',
         'recording_page.py',
-        'dataset_exporter.py'
+        'dataset_exporter.py',
+        'export_pipeline.py',
+        'label_generator.py',
+        'label_store.py',
+        'shard_writer.py',
+        'export_manifest.py',
+        'export_log.py',
+        'export_estimator.py',
+        'frame_sampler.py',
+        'frame_transform.py',
+        'image_codec.py',
+        'frame_cache.py',
+        'export_queue.py',
+        'export_stats.py',
+        'dataset_split.py',
+        'dataset_append.py',
+        'frame_decoder.py',
+        'mjpeg_writer.py',
+        'video_recorder.py',
+        'frame_timing.py',
+        'export_dialog.py'
     ]
     
     for file in required_files:
@@ -0,0 +1,552 @@
+"""
+无界面批量数据集导出 - 命令行入口
+不依赖PyQt界面，可在渲染服务器上并行导出多个项目文件
+
+用法:
+    python -m batch_export export --projects "projects/*.json" --out DIR --workers 4
+    python -m batch_export export --projects "sessions/*.json" --out DATASET --append
+    python -m batch_export estimate --projects "projects/*.json" --out DIR
+    python -m batch_export benchmark --projects "projects/*.json"
+    python -m batch_export queue add --projects "sessions/*.json" --out DIR
+    python -m batch_export queue run --jobs 2 --cpu-budget 16
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Tuple
+
+from annotation_manager import MultiLabelAnnotationManager
+from dataset_exporter import MultiLabelDatasetExporter, LABEL_FORMATS, OUTPUT_LAYOUTS
+from export_queue import ExportQueue, DEFAULT_QUEUE_PATH
+from export_estimator import probe_video, run_calibration, estimate_table, describe_video, benchmark_codecs
+from frame_cache import DEFAULT_FRAME_CACHE_BYTES
+from frame_timing import TIME_BASES, load_time_base
+from image_codec import create_codec, DEFAULT_IMAGE_CODEC, BENCHMARK_CODECS
+from frame_transform import FrameTransform, parse_roi, parse_size, export_roi_from_sidecar
+from dataset_split import parse_split_ratios
+from models import AnnotationMarker, VideoInfo
+from utils import FileUtils
+
+
+def expand_project_paths(patterns: List[str]) -> List[str]:
+    """展开项目文件通配符（Windows命令行不会自动展开）"""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else [pattern])
+
+    # 去重并保持顺序
+    seen = set()
+    unique_paths = []
+    for path in paths:
+        abs_path = os.path.abspath(path)
+        if abs_path not in seen:
+            seen.add(abs_path)
+            unique_paths.append(abs_path)
+    return unique_paths
+
+
+def assign_output_dirs(project_paths: List[str], output_root: str) -> List[str]:
+    """为每个项目分配输出子目录，同名项目追加序号"""
+    used = {}
+    output_dirs = []
+    for path in project_paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        count = used.get(stem, 0)
+        used[stem] = count + 1
+        name = stem if count == 0 else f"{stem}_{count}"
+        output_dirs.append(os.path.join(output_root, name))
+    return output_dirs
+
+
+def load_project(project_path: str, require_video: bool = True) -> Tuple[str, List[AnnotationMarker], VideoInfo]:
+    """加载项目文件，返回(视频路径, 标注列表, 视频信息)
+
+    require_video 为False时（任务中另外指定了视频）不检查项目中的视频路径。
+    """
+    manager = MultiLabelAnnotationManager()
+    if not manager.load_project(project_path):
+        raise ValueError(f"无法加载项目文件: {project_path}")
+
+    video_path = manager.video_info.file_path
+    if not require_video:
+        return video_path, manager.annotations, manager.video_info
+    if not video_path:
+        raise ValueError(f"项目没有关联的视频文件: {project_path}")
+
+    # 项目在其他机器上保存时，尝试按项目文件所在目录解析视频路径
+    if not os.path.exists(video_path):
+        candidate = os.path.join(os.path.dirname(project_path), os.path.basename(video_path))
+        if os.path.exists(candidate):
+            video_path = candidate
+        else:
+            raise FileNotFoundError(f"视频文件不存在: {video_path}")
+
+    return video_path, manager.annotations, manager.video_info
+
+
+def transform_options(args) -> Dict[str, Any]:
+    """从命令行参数中提取帧变换选项（可在进程间传递）"""
+    return {
+        "roi": args.roi,
+        "size": args.resize,
+        "grayscale": args.grayscale,
+        "letterbox": args.letterbox
+    }
+
+
+def build_transform(options: Dict[str, Any], video_path: str) -> FrameTransform:
+    """创建帧变换，--roi auto 时使用录制时保存在视频旁的ROI"""
+    roi = options.get("roi")
+    if roi == "auto":
+        roi = export_roi_from_sidecar(video_path)
+    return FrameTransform(roi=roi or None, size=options.get("size"),
+                          grayscale=options.get("grayscale", False),
+                          letterbox=options.get("letterbox", False))
+
+
+def export_project(project_path: str, output_dir: str, encoder_workers: int,
+                   shard_workers: int = 1, label_format: str = "txt",
+                   output_layout: str = "files", incremental: bool = False,
+                   fast_path: bool = False, sampling: Dict[str, Any] = None,
+                   transform: Dict[str, Any] = None,
+                   image_codec: str = DEFAULT_IMAGE_CODEC,
+                   frame_cache_bytes: int = DEFAULT_FRAME_CACHE_BYTES,
+                   splits: Dict[str, Any] = None,
+                   append: bool = False,
+                   time_base: str = "video",
+                   video_path: str = "", progress_queue=None, job_id: str = "") -> Dict[str, Any]:
+    """导出单个项目（在工作进程中执行）
+
+    video_path 不为空时替代项目中记录的视频；给出 progress_queue 时进度以
+    (job_id, 百分比, 消息) 写入队列，否则直接打印。
+    """
+    name = os.path.basename(project_path)
+    start = time.time()
+    result = {
+        "project": project_path,
+        "output_dir": output_dir,
+        "success": False,
+        "exported_images": 0,
+        "exported_labels": 0,
+        "errors": [],
+        "elapsed": 0.0
+    }
+
+    try:
+        project_video, annotations, video_info = load_project(project_path, require_video=not video_path)
+        video_path = video_path or project_video
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"视频文件不存在: {video_path}")
+        if not annotations:
+            raise ValueError("没有标注数据可导出")
+
+        exporter = MultiLabelDatasetExporter(
+            video_path,
+            annotations,
+            output_dir,
+            video_info.fps,
+            encoder_workers=encoder_workers,
+            shard_workers=shard_workers,
+            label_format=label_format,
+            output_layout=output_layout,
+            incremental=incremental,
+            fast_path=fast_path,
+            transform=build_transform(transform or {}, video_path),
+            image_codec=image_codec,
+            frame_cache_bytes=frame_cache_bytes,
+            append=append,
+            time_base=time_base,
+            **(sampling or {}),
+            **(splits or {})
+        )
+
+        last_bucket = [-1]
+
+        def progress_callback(value, message):
+            # 每10%输出一次（任务队列中每1%汇报一次），避免多进程日志刷屏
+            bucket = value if progress_queue is not None else value // 10
+            if bucket != last_bucket[0]:
+                last_bucket[0] = bucket
+                if progress_queue is not None:
+                    progress_queue.put((job_id, value, message))
+                else:
+                    print(f"[{name}] {value}% {message}", flush=True)
+            return True
+
+        result["success"] = exporter.export_dataset(progress_callback)
+        result["exported_images"] = exporter.stats["exported_images"]
+        result["exported_labels"] = exporter.stats["exported_labels"]
+        result["errors"] = exporter.log.messages(5, "error")
+
+    except Exception as e:
+        result["errors"] = [str(e)]
+
+    result["elapsed"] = time.time() - start
+    return result
+
+
+def run_export(args) -> int:
+    """执行批量导出，返回进程退出码"""
+    project_paths = expand_project_paths(args.projects)
+    if not project_paths:
+        print("没有找到项目文件")
+        return 1
+
+    if args.append and args.incremental:
+        print("--append 不能与 --incremental 同时使用")
+        return 1
+
+    options = export_options(args)
+    if args.append:
+        # 所有项目依次追加到同一个数据集
+        workers = 1
+        output_dirs = [args.out] * len(project_paths)
+        options["append"] = True
+    else:
+        workers = max(1, min(args.workers, len(project_paths)))
+        output_dirs = assign_output_dirs(project_paths, args.out)
+    encoder_workers = args.encoder_workers or max(1, (os.cpu_count() or 2) // workers)
+
+    print(f"批量导出 {len(project_paths)} 个项目 -> {args.out} "
+          f"(进程数: {workers}, 每进程编码线程: {encoder_workers})")
+
+    start = time.time()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(export_project, path, out_dir, encoder_workers, **options): path
+            for path, out_dir in zip(project_paths, output_dirs)
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"project": futures[future], "success": False, "errors": [str(e)],
+                          "exported_images": 0, "elapsed": 0.0}
+            results.append(result)
+
+            status = "✅" if result["success"] else "❌"
+            print(f"{status} {os.path.basename(result['project'])}: "
+                  f"{result['exported_images']} 张图像, {result['elapsed']:.1f}秒", flush=True)
+            for error in result["errors"]:
+                print(f"    {error}")
+
+    failed = [r for r in results if not r["success"]]
+    total_images = sum(r["exported_images"] for r in results)
+    print(f"完成: {len(results) - len(failed)}/{len(results)} 个项目成功, "
+          f"共 {total_images} 张图像, 耗时 {time.time() - start:.1f}秒")
+
+    return 1 if failed else 0
+
+
+def export_options(args) -> Dict[str, Any]:
+    """从命令行参数中提取 export_project 的导出参数（可以保存到任务队列）"""
+    return {
+        "shard_workers": args.shards,
+        "label_format": args.label_format,
+        "output_layout": args.layout,
+        "incremental": args.incremental,
+        "fast_path": args.fast,
+        "sampling": {
+            "sample_fps": args.sample_fps,
+            "label_epsilon": args.label_epsilon,
+            "dedup_threshold": args.dedup_threshold
+        },
+        "transform": transform_options(args),
+        "image_codec": args.codec,
+        "frame_cache_bytes": args.frame_cache_mb * 1024 * 1024,
+        "splits": {
+            "split_ratios": args.split,
+            "split_stratify": not args.no_stratify,
+            "split_seed": args.split_seed
+        },
+        "time_base": args.time_base
+    }
+
+
+def run_queue_add(args) -> int:
+    """把项目加入导出任务队列"""
+    project_paths = expand_project_paths(args.projects)
+    if not project_paths:
+        print("没有找到项目文件")
+        return 1
+    if args.video and len(project_paths) > 1:
+        print("--video 只能用于单个项目")
+        return 1
+
+    export_queue = ExportQueue.load(args.queue)
+    options = export_options(args)
+    # 队列任务总是增量导出，中断后重新运行时跳过已完成的标注
+    options["incremental"] = True
+    for path, out_dir in zip(project_paths, assign_output_dirs(project_paths, args.out)):
+        job = export_queue.add(path, out_dir, args.video, options)
+        print(f"已加入队列 [{job.job_id}] {job.name} -> {job.output_dir}")
+    export_queue.save()
+    return 0
+
+
+def print_queue_status(export_queue: ExportQueue):
+    """打印队列中每个任务的状态"""
+    for job in export_queue.jobs:
+        print(f"[{job.job_id}] {job.status:<9} {job.progress:>3}% {job.name} -> {job.output_dir}"
+              + (f" ({job.exported_images} 张图像)" if job.status == "completed" else ""))
+        for error in job.errors:
+            print(f"    {error}")
+    summary = export_queue.summary()
+    print("  ".join(f"{state}: {count}" for state, count in summary.items()))
+
+
+def run_queue_status(args) -> int:
+    """显示任务队列状态"""
+    export_queue = ExportQueue.load(args.queue)
+    if not export_queue.jobs:
+        print(f"队列为空: {args.queue}")
+        return 0
+    print_queue_status(export_queue)
+    return 0
+
+
+def run_queue_run(args) -> int:
+    """执行队列中所有等待的任务"""
+    export_queue = ExportQueue.load(args.queue)
+    if args.retry_failed:
+        export_queue.retry_failed()
+    pending = export_queue.jobs_with_status("pending")
+    if not pending:
+        print("没有等待中的任务")
+        return 0
+
+    print(f"开始执行 {len(pending)} 个任务 (同时运行: {args.jobs}, 线程预算: {args.cpu_budget or os.cpu_count()})")
+    last_bucket = {}
+
+    def on_progress(job):
+        # 每个任务每10%输出一次
+        bucket = job.progress // 10
+        if job.status in ("completed", "failed"):
+            status = "✅" if job.status == "completed" else "❌"
+            print(f"{status} [{job.job_id}] {job.name}: {job.exported_images} 张图像, {job.elapsed:.1f}秒", flush=True)
+            for error in job.errors:
+                print(f"    {error}")
+        elif last_bucket.get(job.job_id) != bucket:
+            last_bucket[job.job_id] = bucket
+            print(f"[{job.job_id}] {job.name} {job.progress}% {job.message}", flush=True)
+
+    try:
+        summary = export_queue.run(export_project, args.jobs, args.cpu_budget, on_progress)
+    except KeyboardInterrupt:
+        print("已中断，未完成的任务保留在队列中，下次运行时继续")
+        return 1
+
+    print("  ".join(f"{state}: {count}" for state, count in summary.items()))
+    return 1 if summary["failed"] else 0
+
+
+def run_queue_clear(args) -> int:
+    """删除已完成的任务（--all 清空整个队列）"""
+    export_queue = ExportQueue.load(args.queue)
+    if args.all:
+        removed = export_queue.clear()
+    else:
+        removed = export_queue.remove_finished()
+    export_queue.save()
+    print(f"已删除 {removed} 个任务")
+    return 0
+
+
+def run_estimate(args) -> int:
+    """预估每个项目在不同输出格式和分片进程数下的导出耗时与磁盘占用"""
+    project_paths = expand_project_paths(args.projects)
+    if not project_paths:
+        print("没有找到项目文件")
+        return 1
+
+    # 在输出目录所在的文件系统上测量写入耗时
+    write_probe_dir = args.out if args.out and os.path.isdir(args.out) else None
+    options = transform_options(args)
+
+    for project_path in project_paths:
+        try:
+            video_path, annotations, _ = load_project(project_path)
+            probe = probe_video(video_path)
+            frame_times = load_time_base(video_path, args.time_base)
+            calibration = run_calibration(video_path, output_dir=write_probe_dir,
+                                          transform=build_transform(options, video_path),
+                                          codec=create_codec(args.codec))
+        except Exception as e:
+            print(f"❌ {os.path.basename(project_path)}: {e}")
+            continue
+
+        print(f"{os.path.basename(project_path)}: {describe_video(probe)}, {len(annotations)} 个标注")
+        print(f"    校准: 解码 {calibration['decode_seconds_per_frame'] * 1000:.2f}ms/帧, "
+              f"编码 {calibration['encode_seconds_per_frame'] * 1000:.2f}ms/帧, "
+              f"图像 {FileUtils.format_size(calibration['image_bytes_per_frame'])}/帧")
+        for row in estimate_table(annotations, probe, calibration, args.shards, frame_times=frame_times):
+            print(f"    {row['output_layout']:>5}/{row['label_format']:<4} 分片 {row['shard_workers']:>2}: "
+                  f"{row['frames']} 帧, 约 {row['wall_seconds']:.1f}秒, "
+                  f"占用 {FileUtils.format_size(row['disk_bytes'])}")
+    return 0
+
+
+def run_benchmark(args) -> int:
+    """用项目视频中的帧比较各图像编码器的编码耗时和输出大小"""
+    project_paths = expand_project_paths(args.projects)
+    if not project_paths:
+        print("没有找到项目文件")
+        return 1
+
+    options = transform_options(args)
+    for project_path in project_paths:
+        try:
+            video_path, _, _ = load_project(project_path)
+            rows = benchmark_codecs(video_path, args.codecs, transform=build_transform(options, video_path))
+        except Exception as e:
+            print(f"❌ {os.path.basename(project_path)}: {e}")
+            continue
+
+        print(f"{os.path.basename(project_path)}: {describe_video(probe_video(video_path))}")
+        for row in rows:
+            print(f"    {row['codec']:<12} {row['encode_ms_per_frame']:>7.2f}ms/帧  "
+                  f"{FileUtils.format_size(row['bytes_per_frame']):>10}/帧")
+    return 0
+
+
+def codec_argument(text: str) -> str:
+    """--codec 参数：检查编码器描述是否有效"""
+    return create_codec(text).spec
+
+
+def roi_argument(text: str):
+    """--roi 参数：auto 或 x,y,w,h"""
+    return text if text == "auto" else parse_roi(text)
+
+
+def add_export_arguments(parser: argparse.ArgumentParser):
+    """导出参数（export 和 queue add 共用）"""
+    parser.add_argument("--shards", type=int, default=1,
+                        help="单个项目按时间切分的分片进程数（适合少量长视频）")
+    parser.add_argument("--label-format", choices=LABEL_FORMATS, default="txt",
+                        help="标注输出格式: txt逐帧文件 / npy单个labels.npy / both")
+    parser.add_argument("--layout", choices=OUTPUT_LAYOUTS, default="files",
+                        help="图像输出布局: files独立文件 / tar分片（约1GB一个）")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量导出：跳过输出目录中已完整导出且未修改的标注")
+    parser.add_argument("--fast", action="store_true",
+                        help="快速模式：不逐帧检查写入的文件，导出结束后统一扫描核对（适合网络文件系统）")
+    parser.add_argument("--sample-fps", type=float, default=0.0,
+                        help="按目标帧率采样（默认0，导出全部帧）")
+    parser.add_argument("--label-epsilon", type=float, default=0.0,
+                        help="只在45维标注变化超过该值时导出帧（默认0，不启用）")
+    parser.add_argument("--dedup-threshold", type=int, default=-1,
+                        help="丢弃与上一导出帧感知哈希距离不超过该值的近似重复帧（0-64，默认不去重）")
+    parser.add_argument("--codec", type=codec_argument, default=DEFAULT_IMAGE_CODEC,
+                        help="图像编码: jpeg[:质量] 基线JPEG / jpeg-opt[:质量] 优化+渐进式（默认jpeg-opt:95）/ "
+                             "webp[:质量] / png[:压缩级别0-9] / raw 原始像素.npy")
+    parser.add_argument("--frame-cache-mb", type=int, default=DEFAULT_FRAME_CACHE_BYTES // (1024 * 1024),
+                        help="解码帧缓存的内存预算（MB），重叠标注共享的帧只解码一次，0为不缓存")
+    parser.add_argument("--split", type=parse_split_ratios, default=None,
+                        help="按标注划分 train,val,test 的比例，如 0.8,0.1,0.1（写入 splits/<子集>.txt）")
+    parser.add_argument("--no-stratify", action="store_true",
+                        help="划分时不按标签组合分层，每个标注只由ID哈希决定")
+    parser.add_argument("--split-seed", default="", help="划分哈希的种子，修改后得到另一种划分")
+    add_time_base_argument(parser)
+    add_transform_arguments(parser)
+
+
+def add_time_base_argument(parser: argparse.ArgumentParser):
+    """标注时间基准的参数（导出和预估共用）"""
+    parser.add_argument("--time-base", choices=TIME_BASES, default="video",
+                        help="标注时间换算帧号的基准: video 视频时间轴（默认，播放器中的标注）/ "
+                             "arrival 录制时的逐帧到达时间（需要 <视频>.timestamps.csv）")
+
+
+def add_transform_arguments(parser: argparse.ArgumentParser):
+    """编码前帧变换的参数（导出和预估共用）"""
+    parser.add_argument("--roi", type=roi_argument, default=None,
+                        help="只导出ROI区域: x,y,w,h，或 auto 使用录制时保存的ROI（<视频>.roi.json）")
+    parser.add_argument("--resize", type=parse_size, default=None, help="缩放到指定尺寸: 宽x高，如 224x224")
+    parser.add_argument("--grayscale", action="store_true", help="导出灰度图像")
+    parser.add_argument("--letterbox", action="store_true",
+                        help="缩放时保持宽高比，不足部分补黑边（需配合 --resize）")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="batch_export", description="无界面批量导出多标签数据集")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="导出项目文件为数据集")
+    export_parser.add_argument("--projects", nargs="+", required=True,
+                               help="项目JSON文件，支持通配符")
+    export_parser.add_argument("--out", required=True, help="输出根目录，每个项目一个子目录")
+    export_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                               help="并行导出的进程数")
+    export_parser.add_argument("--encoder-workers", type=int, default=0,
+                               help="每个进程的图像编码线程数（默认按CPU核心数分配）")
+    export_parser.add_argument("--append", action="store_true",
+                               help="追加模式：所有项目依次追加到 --out 中的同一个数据集，保留已有的样本和统计")
+    add_export_arguments(export_parser)
+    export_parser.set_defaults(func=run_export)
+
+    estimate_parser = subparsers.add_parser("estimate", help="预估导出耗时和磁盘占用")
+    estimate_parser.add_argument("--projects", nargs="+", required=True,
+                                 help="项目JSON文件，支持通配符")
+    estimate_parser.add_argument("--out", default="", help="输出目录（用于测量写入速度和块大小）")
+    estimate_parser.add_argument("--shards", type=int, nargs="+", default=None,
+                                 help="要比较的分片进程数（默认 1、2、半数核心、全部核心）")
+    estimate_parser.add_argument("--codec", type=codec_argument, default=DEFAULT_IMAGE_CODEC,
+                                 help="校准使用的图像编码（同 export --codec）")
+    add_time_base_argument(estimate_parser)
+    add_transform_arguments(estimate_parser)
+    estimate_parser.set_defaults(func=run_estimate)
+
+    benchmark_parser = subparsers.add_parser("benchmark", help="比较各图像编码器的速度和输出大小")
+    benchmark_parser.add_argument("--projects", nargs="+", required=True,
+                                  help="项目JSON文件，支持通配符")
+    benchmark_parser.add_argument("--codecs", type=codec_argument, nargs="+", default=BENCHMARK_CODECS,
+                                  help=f"要比较的编码器（默认: {' '.join(BENCHMARK_CODECS)}）")
+    add_transform_arguments(benchmark_parser)
+    benchmark_parser.set_defaults(func=run_benchmark)
+
+    queue_parser = subparsers.add_parser("queue", help="导出任务队列（可中断，重新运行时继续）")
+    queue_parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="队列文件路径")
+    queue_subparsers = queue_parser.add_subparsers(dest="queue_command", required=True)
+
+    queue_add_parser = queue_subparsers.add_parser("add", help="加入导出任务")
+    queue_add_parser.add_argument("--projects", nargs="+", required=True,
+                                  help="项目JSON文件，支持通配符")
+    queue_add_parser.add_argument("--out", required=True, help="输出根目录，每个项目一个子目录")
+    queue_add_parser.add_argument("--video", default="", help="替代项目中记录的视频文件（单个项目）")
+    add_export_arguments(queue_add_parser)
+    queue_add_parser.set_defaults(func=run_queue_add)
+
+    queue_run_parser = queue_subparsers.add_parser("run", help="执行等待中的任务")
+    queue_run_parser.add_argument("--jobs", type=int, default=1,
+                                  help="同时运行的任务数（IO预算，机械硬盘建议1-2）")
+    queue_run_parser.add_argument("--cpu-budget", type=int, default=0,
+                                  help="所有任务共用的线程数（默认CPU核心数）")
+    queue_run_parser.add_argument("--retry-failed", action="store_true", help="同时重新执行失败的任务")
+    queue_run_parser.set_defaults(func=run_queue_run)
+
+    queue_status_parser = queue_subparsers.add_parser("status", help="查看任务状态")
+    queue_status_parser.set_defaults(func=run_queue_status)
+
+    queue_clear_parser = queue_subparsers.add_parser("clear", help="删除已完成的任务")
+    queue_clear_parser.add_argument("--all", action="store_true", help="清空整个队列")
+    queue_clear_parser.set_defaults(func=run_queue_clear)
+
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    """命令行主函数"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
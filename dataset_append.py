@@ -0,0 +1,183 @@
+"""
+追加导出 - 把新的录制会话追加到已有数据集
+已有数据集的图像、标注和索引文件保持不动，新会话的样本追加到各索引文件末尾，
+汇总统计在已有计数上累加，耗时只与新会话的帧数有关。
+追加前记录各索引文件的长度和本次样本的文件名前缀，追加失败或进程中断后可以截断回追加前的状态。
+"""
+import glob
+import json
+import os
+from typing import Dict, Any, List, Optional
+from export_manifest import write_json_atomic, read_json
+from export_stats import DATASET_INFO_NAME, FRAME_DETAILS_NAME
+from dataset_split import SPLIT_NAMES, SPLITS_DIR_NAME
+from label_store import LABELS_NPY_NAME, LABELS_INDEX_NAME, read_label_store_rows, truncate_label_store
+
+
+APPEND_CHECKPOINT_NAME = ".append_checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+# 追加导出时在末尾追加内容的索引文件（相对数据集目录）
+APPENDED_FILES = [FRAME_DETAILS_NAME, LABELS_INDEX_NAME] + [
+    os.path.join(SPLITS_DIR_NAME, f"{name}.txt") for name in SPLIT_NAMES
+]
+
+
+def load_dataset_info(output_dir: str) -> Optional[Dict[str, Any]]:
+    """读取已有数据集的 dataset_info.json，不存在或损坏时返回None"""
+    return read_json(os.path.join(output_dir, DATASET_INFO_NAME))
+
+
+def dataset_sessions(info: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """数据集中已有的会话列表（早期导出的数据集没有会话列表，按单个会话处理）"""
+    if "sessions" in info:
+        return list(info["sessions"])
+    return [{
+        "video_path": info.get("source_video", ""),
+        "video_hash": info.get("video_hash", ""),
+        "frames": info.get("statistics", {}).get("exported_images", 0)
+    }]
+
+
+class AppendCheckpoint:
+    """追加前的数据集状态
+
+    保存为数据集目录下的 .append_checkpoint.json；追加成功后删除。
+    下次导出时如果仍然存在，说明上次追加没有完成，先回滚。
+    """
+
+    def __init__(self, output_dir: str, data: Dict[str, Any]):
+        self.output_dir = output_dir
+        self.data = data
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.output_dir, APPEND_CHECKPOINT_NAME)
+
+    @classmethod
+    def create(cls, output_dir: str, base_info: Optional[Dict[str, Any]], label_store_dir: str,
+               n_cols: int, tar_prefix: str) -> "AppendCheckpoint":
+        """记录各索引文件当前的长度并写入检查点"""
+        files = {}
+        for rel_path in APPENDED_FILES:
+            path = os.path.join(output_dir, rel_path)
+            files[rel_path] = os.path.getsize(path) if os.path.exists(path) else None
+
+        label_rows = None
+        if os.path.exists(os.path.join(label_store_dir, LABELS_INDEX_NAME)):
+            label_rows = read_label_store_rows(label_store_dir)
+
+        checkpoint = cls(output_dir, {
+            "version": CHECKPOINT_VERSION,
+            "files": files,
+            "label_store_dir": os.path.relpath(label_store_dir, output_dir),
+            "label_rows": label_rows,
+            "n_cols": n_cols,
+            "tar_prefix": tar_prefix,
+            "base_info": base_info
+        })
+        write_json_atomic(checkpoint.path, checkpoint.data)
+        return checkpoint
+
+    @classmethod
+    def load(cls, output_dir: str) -> Optional["AppendCheckpoint"]:
+        """读取未完成的追加检查点"""
+        data = read_json(os.path.join(output_dir, APPEND_CHECKPOINT_NAME))
+        if not data or data.get("version") != CHECKPOINT_VERSION:
+            return None
+        return cls(output_dir, data)
+
+    def rollback(self) -> int:
+        """删除本次追加写入的样本文件，把索引文件截断回追加前，返回删除的文件数"""
+        removed = self._remove_appended_samples()
+
+        for rel_path, size in self.data["files"].items():
+            path = os.path.join(self.output_dir, rel_path)
+            if not os.path.exists(path):
+                continue
+            if size is None:
+                os.remove(path)
+            else:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+        label_store_dir = os.path.join(self.output_dir, self.data["label_store_dir"])
+        if self.data["label_rows"] is None:
+            npy_path = os.path.join(label_store_dir, LABELS_NPY_NAME)
+            if os.path.exists(npy_path):
+                os.remove(npy_path)
+        else:
+            truncate_label_store(label_store_dir, self.data["label_rows"], self.data["n_cols"])
+
+        for path in glob.glob(os.path.join(self.output_dir, "shards", f"{self.data['tar_prefix']}-*.tar")):
+            os.remove(path)
+            removed += 1
+
+        # 汇总信息恢复为追加前的内容
+        info_path = os.path.join(self.output_dir, DATASET_INFO_NAME)
+        if self.data["base_info"] is not None:
+            write_json_atomic(info_path, self.data["base_info"])
+        elif os.path.exists(info_path):
+            os.remove(info_path)
+
+        self.discard()
+        return removed
+
+    def record_samples(self, base_names: List[str]):
+        """记录本次追加的样本文件名前缀（回滚时按前缀删除，包括分片进程已写入、尚未合并到索引的文件）"""
+        self.data["sample_prefixes"] = sorted(set(base_names))
+        write_json_atomic(self.path, self.data)
+
+    def discard(self):
+        """追加完成，删除检查点"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _remove_appended_samples(self) -> int:
+        """删除本次写入的图像和标注文件"""
+        prefixes = self.data.get("sample_prefixes")
+        if prefixes is not None:
+            return self._remove_files_with_prefixes(set(prefixes))
+
+        # 没有记录文件名前缀的检查点：按逐帧明细中追加的部分删除
+        details_path = os.path.join(self.output_dir, FRAME_DETAILS_NAME)
+        if not os.path.exists(details_path):
+            return 0
+
+        removed = 0
+        with open(details_path, "rb") as f:
+            f.seek(self.data["files"].get(FRAME_DETAILS_NAME) or 0)
+            for line in f:
+                try:
+                    image = json.loads(line)["image"]
+                except (ValueError, KeyError):
+                    continue
+                stem = os.path.splitext(image)[0]
+                for path in (os.path.join(self.output_dir, "images", image),
+                             os.path.join(self.output_dir, "labels", f"{stem}.txt")):
+                    try:
+                        os.remove(path)
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+        return removed
+
+    def _remove_files_with_prefixes(self, prefixes) -> int:
+        """删除 images/ 和 labels/ 中文件名前缀属于本次追加的文件"""
+        removed = 0
+        for sub_dir in ("images", "labels"):
+            directory = os.path.join(self.output_dir, sub_dir)
+            if not os.path.isdir(directory):
+                continue
+            with os.scandir(directory) as entries:
+                paths = [entry.path for entry in entries
+                         if entry.name.rpartition("_frame_")[0] in prefixes]
+            for path in paths:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
@@ -1,24 +1,67 @@
 """
 多标签面部动作数据集导出器 - 修复版本
 解决"导出成功却显示取消"的问题
+
+本模块不依赖PyQt，可以在无界面的服务器上使用；
+导出对话框和交互入口见 export_dialog.py
 """
 import os
 import cv2
 import hashlib
 import time
 import json
+import multiprocessing
+import shutil
+import sys
+import threading
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import List, Dict, Tuple, Optional, Callable, Any
 from pathlib import Path
-from PyQt6.QtWidgets import (
-    QMessageBox, QApplication, QFileDialog, QInputDialog,
-    QProgressBar, QLabel, QVBoxLayout, QHBoxLayout, QDialog,
-    QPushButton, QTextEdit
-)
-from PyQt6.QtCore import Qt, QTimer
 from models import AnnotationMarker, VideoInfo, LabelConfig, ProgressionType
 from utils import FileUtils, TimeUtils
 from styles import FacialActionConfig
+from export_pipeline import ExportPipeline, FrameExportJob, DEFAULT_ENCODER_WORKERS
+from label_generator import build_annotation_label_matrix, format_label_text
+from label_store import LabelStoreWriter, merge_label_stores
+from shard_writer import TarShardWriter, DEFAULT_SHARD_MAX_BYTES, SHARD_INDEX_NAME
+from export_log import ExportLog, EXPORT_LOG_NAME
+from frame_sampler import select_frame_indices, select_rate_indices, DuplicateFilter
+from frame_transform import FrameTransform
+from export_stats import (
+    LabelCounters, FrameDetailWriter, merge_frame_details, merge_counts, DATASET_INFO_NAME, FRAME_DETAILS_NAME
+)
+from dataset_append import AppendCheckpoint, load_dataset_info, dataset_sessions
+from dataset_split import (
+    SplitIndexWriter, assign_splits, merge_split_indexes, split_summary, SPLIT_NAMES, SPLITS_DIR_NAME
+)
+from frame_cache import FrameCache, DEFAULT_FRAME_CACHE_BYTES
+from frame_timing import frame_range_at, load_time_base
+from image_codec import ImageCodec, RawCodec, create_codec, DEFAULT_IMAGE_CODEC
+from export_manifest import (
+    ExportManifest, MANIFEST_NAME, compute_video_fingerprint, annotation_signature,
+    entry_file_paths, manifest_part_path, remove_manifest_parts, write_json_atomic
+)
+
+
+# 标注输出格式：逐帧txt文件 / 单个labels.npy / 两者都输出
+LABEL_FORMATS = ("txt", "npy", "both")
+
+# 图像输出布局：images/目录下的独立文件 / shards/目录下的tar分片
+OUTPUT_LAYOUTS = ("files", "tar")
+
+# 逐帧失败的分类计数（annotation_failed 为处理整个标注时的异常）
+FAILURE_KINDS = (
+    "decode_failed", "empty_frame", "encode_failed",
+    "image_write_failed", "label_write_failed", "missing_after_scan", "write_exception",
+    "annotation_failed"
+)
+
+# 导出清单的最短写入间隔（秒），中断后最多重做这段时间内的工作
+MANIFEST_FLUSH_INTERVAL = 2.0
+
+# 导出过程中更新 dataset_info.json 的最短间隔（秒）
+SUMMARY_FLUSH_INTERVAL = 2.0
 
 
 def cv2_imwrite_chinese(file_path: str, image: np.ndarray, params=None) -> bool:
@@ -52,16 +95,229 @@ def cv2_imwrite_chinese(file_path: str, image: np.ndarray, params=None) -> bool:
         return False
 
 
+def annotation_frame_range(annotation: AnnotationMarker, video_fps: float,
+                           frame_times: Optional[np.ndarray] = None) -> Tuple[int, int]:
+    """计算标注的帧范围（闭区间）
+
+    frame_times 为录制时记录的逐帧到达时间（见 frame_timing.load_time_base），
+    给出时标注时间按到达时间映射到帧号，否则按视频帧率换算。
+    """
+    if frame_times is not None:
+        return frame_range_at(frame_times, annotation.start_time, annotation.end_time)
+    return int(annotation.start_time * video_fps), int(annotation.end_time * video_fps)
+
+
+# 随机定位的代价（折算为顺序解码的帧数）
+# 一次 CAP_PROP_POS_FRAMES 定位需要回到上一个关键帧并重新解码到目标帧，
+# mp4v 默认 GOP 约为 12~30 帧，再加上解码器 flush 的固定开销
+DEFAULT_SEEK_COST_FRAMES = 30
+
+
+class SequentialFrameReader:
+    """顺序解码帧读取器
+
+    按帧号读取视频帧，尽量沿着解码方向向前推进：
+    目标帧在当前位置之后且间隔不超过定位代价时，用 grab() 跳过中间帧；
+    否则才执行一次定位。重复读取同一帧时直接返回上一次的结果；
+    给出帧缓存时，回退读取已缓存的帧也不需要定位和重新解码。
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, seek_cost_frames: int = DEFAULT_SEEK_COST_FRAMES,
+                 cache: Optional[FrameCache] = None):
+        self.cap = cap
+        self.seek_cost_frames = max(0, int(seek_cost_frames))
+        self.cache = cache
+
+        self.position = None      # 下一次 read() 将解码的帧号，None 表示未知
+        self.last_index = -1
+        self.last_frame = None
+
+        # 解码统计
+        self.seek_count = 0
+        self.grabbed_frames = 0
+        self.decoded_frames = 0
+
+    def read(self, frame_index: int) -> Optional[np.ndarray]:
+        """读取指定帧，失败返回None"""
+        if frame_index == self.last_index and self.last_frame is not None:
+            return self.last_frame
+
+        if self.cache is not None:
+            frame = self.cache.get(frame_index)
+            if frame is not None:
+                return frame
+
+        gap = frame_index - self.position if self.position is not None else -1
+
+        if gap < 0 or gap > self.seek_cost_frames:
+            # 向后跳转或跳过代价高于定位：执行定位
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            self.seek_count += 1
+        else:
+            # 跳过中间帧（只解码不转换）
+            for _ in range(gap):
+                if not self.cap.grab():
+                    self._invalidate()
+                    return None
+                self.grabbed_frames += 1
+
+        ret, frame = self.cap.read()
+        if not ret or frame is None:
+            self._invalidate()
+            return None
+
+        self.decoded_frames += 1
+        self.position = frame_index + 1
+        self.last_index = frame_index
+        self.last_frame = frame
+        if self.cache is not None:
+            self.cache.put(frame_index, frame)
+        return frame
+
+    def _invalidate(self):
+        """解码失败后位置不可信，下次读取强制定位"""
+        self.position = None
+        self.last_index = -1
+        self.last_frame = None
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取解码统计"""
+        stats = {
+            "seeks": self.seek_count,
+            "grabbed_frames": self.grabbed_frames,
+            "decoded_frames": self.decoded_frames
+        }
+        if self.cache is not None:
+            stats.update(self.cache.get_stats())
+        return stats
+
+
+def plan_frame_runs(frame_ranges: List[Tuple[int, int]],
+                    seek_cost_frames: int = DEFAULT_SEEK_COST_FRAMES) -> List[Tuple[int, int]]:
+    """将帧范围排序并合并为连续解码段
+
+    相邻范围的间隔不超过定位代价时合并到同一段（用 grab() 跳过间隔），
+    每一段只需要在开头定位一次。范围为闭区间 [start, end]。
+    """
+    runs = []
+    for start, end in sorted(r for r in frame_ranges if r[1] >= r[0]):
+        if runs and start - runs[-1][1] - 1 <= seek_cost_frames:
+            runs[-1] = (runs[-1][0], max(runs[-1][1], end))
+        else:
+            runs.append((start, end))
+    return runs
+
+
+def split_annotation_shards(ordered: List[Tuple[int, AnnotationMarker]], frame_ranges: List[Tuple[int, int]],
+                            shard_count: int) -> List[List[Tuple[int, AnnotationMarker]]]:
+    """把按时间排序的标注切分为时间连续、帧数大致相等的分片"""
+    total_frames = sum(max(0, end - start + 1) for start, end in frame_ranges)
+    shard_count = max(1, min(shard_count, len(ordered)))
+    target = total_frames / shard_count
+
+    shards = [[]]
+    accumulated = 0
+    for item, (start, end) in zip(ordered, frame_ranges):
+        # 当前分片达到目标帧数后开始新分片，保证剩余标注足够分配
+        if shards[-1] and accumulated >= target * len(shards) and len(shards) < shard_count:
+            shards.append([])
+        shards[-1].append(item)
+        accumulated += max(0, end - start + 1)
+    return shards
+
+
 class MultiLabelDatasetExporter:
     """多标签面部动作数据集导出器"""
 
     def __init__(self, video_path: str, annotations: List[AnnotationMarker],
-                 output_dir: str, fps: float = 30.0):
+                 output_dir: str, fps: float = 30.0,
+                 seek_cost_frames: int = DEFAULT_SEEK_COST_FRAMES,
+                 encoder_workers: int = DEFAULT_ENCODER_WORKERS,
+                 process_events: Optional[Callable[[], None]] = None,
+                 shard_workers: int = 1,
+                 label_format: str = "txt",
+                 output_layout: str = "files",
+                 tar_shard_bytes: int = DEFAULT_SHARD_MAX_BYTES,
+                 incremental: bool = False,
+                 video_hash: str = "",
+                 fast_path: bool = False,
+                 sample_fps: float = 0.0,
+                 label_epsilon: float = 0.0,
+                 dedup_threshold: int = -1,
+                 transform: Optional[FrameTransform] = None,
+                 image_codec: str = DEFAULT_IMAGE_CODEC,
+                 frame_cache_bytes: int = DEFAULT_FRAME_CACHE_BYTES,
+                 split_ratios: Optional[Tuple[float, float, float]] = None,
+                 split_stratify: bool = True,
+                 split_seed: str = "",
+                 append: bool = False,
+                 time_base: str = "video"):
         self.video_path = video_path
         self.annotations = annotations
         self.output_dir = output_dir
         self.fps = fps
-        self.cancelled = False
+        self.seek_cost_frames = seek_cost_frames
+        self.frame_cache_bytes = frame_cache_bytes   # 解码帧缓存的内存预算，0为不缓存
+        self.encoder_workers = encoder_workers
+        self.process_events = process_events  # 界面事件处理钩子，无界面导出时为None
+        self.shard_workers = max(1, int(shard_workers))  # >1 时按时间分片多进程导出
+        if label_format not in LABEL_FORMATS:
+            raise ValueError(f"不支持的标注格式: {label_format}")
+        self.label_format = label_format
+        if output_layout not in OUTPUT_LAYOUTS:
+            raise ValueError(f"不支持的输出布局: {output_layout}")
+        self.output_layout = output_layout
+        self.codec: ImageCodec = create_codec(image_codec)
+        if isinstance(self.codec, RawCodec) and output_layout == "tar":
+            # tar分片中 .npy 成员已用于标注
+            raise ValueError("raw编码只支持files输出布局")
+        self.tar_shard_bytes = tar_shard_bytes
+        self.tar_shard_prefix = "shard"
+        self._tar_writer: Optional[TarShardWriter] = None
+        self.label_store_dir = output_dir   # labels.npy 所在目录，分片进程写入各自的临时目录
+        self._label_store: Optional[LabelStoreWriter] = None
+        self.fast_path = fast_path          # 信任写入返回值，导出结束后统一扫描目录核对
+
+        # 帧采样：目标帧率（0为全部帧）、标注变化阈值（0为不启用）、重复帧哈希距离（<0为不去重）
+        self.sample_fps = sample_fps
+        self.label_epsilon = label_epsilon
+        self.dedup_threshold = dedup_threshold
+        # 编码前的帧变换（ROI裁剪/缩放/灰度），不变换时为None
+        self.transform = transform if transform is not None and not transform.is_identity else None
+        self.incremental = incremental      # 只导出缺失或修改过的标注
+        # 标注时间的基准：video 按视频帧率换算，arrival 按录制时的逐帧到达时间映射
+        self.time_base = time_base
+        self._frame_times = load_time_base(video_path, time_base)
+
+        # 按标注划分 train/val/test（None为不划分），划分结果不影响导出的文件，不计入内容签名
+        self.split_ratios = tuple(split_ratios) if split_ratios else None
+        self.split_stratify = split_stratify
+        self.split_seed = split_seed
+        self.splits_dir = os.path.join(output_dir, SPLITS_DIR_NAME)  # 分片进程写入各自的临时目录
+        self._split_of: Dict[str, str] = {}             # 标注ID -> 子集名
+        self._split_writer: Optional[SplitIndexWriter] = None
+
+        # 追加导出：保留目录中已有的数据集，新样本追加到索引末尾，统计在已有计数上累加
+        self.append = append
+        self._base_info: Optional[Dict[str, Any]] = None     # 追加前的 dataset_info.json
+        self._append_checkpoint: Optional[AppendCheckpoint] = None
+        self.video_hash = video_hash        # 视频指纹，用于生成稳定的文件名
+        self._manifest: Optional[ExportManifest] = None
+        self._manifest_saved_at = 0.0
+        self._manifest_pending: Dict[int, Tuple[str, str, str]] = {}  # 索引 -> (标注ID, 签名, 文件名前缀)
+        self._annotation_base_names: Dict[int, str] = {}              # 索引 -> 文件名前缀
+        self._base_names: Dict[int, str] = {}   # 索引 -> 文件名前缀（主进程统一生成，分片进程沿用）
+        self._reused_ids: Dict[str, Optional[List[int]]] = {}  # 直接复用的标注ID -> 采样导出的帧序号
+        self._submitted_indices: Dict[int, List[int]] = {}     # 采样导出时每个标注提交的帧序号
+        self._cancel_event = threading.Event()  # 取消标记，可以从界面线程设置
+        self._shard_counters: Optional[Tuple[int, int]] = None  # 分片导出时汇总的 (已处理帧数, 写入字节数)
+
+        # 每个标注提交/成功写入的帧数（写入线程更新，清单刷新时在解码线程读取）
+        self._frame_totals: Dict[int, int] = {}
+        self._frame_success_counts: Dict[int, int] = {}
+        self._counts_lock = threading.Lock()
+        # 逐帧失败在解码线程和写入线程中都会记录
+        self._failure_lock = threading.Lock()
 
         # 所有45个动作标签
         self.all_labels = FacialActionConfig.ALL_LABELS
@@ -70,8 +326,9 @@ class MultiLabelDatasetExporter:
         self.stats = {
             "exported_images": 0,
             "exported_labels": 0,
+            "planned_frames": 0,
+            "bytes_written": 0,
             "total_annotations": len(annotations),
-            "label_distribution": {label: 0 for label in self.all_labels},
             "progression_stats": {
                 "linear_count": 0,
                 "constant_count": 0
@@ -81,10 +338,44 @@ class MultiLabelDatasetExporter:
                 "multi_label": 0,
                 "max_labels_per_annotation": 0
             },
-            "errors": [],
-            "debug_info": []
+            "decode_stats": {
+                "seeks": 0,
+                "grabbed_frames": 0,
+                "decoded_frames": 0,
+                "cache_hits": 0,
+                "cache_evictions": 0,
+                "planned_runs": 0
+            },
+            "label_store_rows": 0,
+            "tar_shards": [],
+            "failure_counts": {kind: 0 for kind in FAILURE_KINDS},
+            "sampling": {
+                "candidate_frames": 0,
+                "skipped_by_sampling": 0,
+                "skipped_duplicates": 0
+            },
+            "failure_examples": {},   # 快速模式下每类失败只保留第一条详细信息
+            "incremental": {
+                "reused_annotations": 0,
+                "reused_frames": 0,
+                "removed_files": 0
+            },
         }
 
+        # 按标签索引的帧计数（NumPy数组），逐帧明细写入 frame_details.jsonl
+        self.label_counters = LabelCounters(self.all_labels)
+        self.split_counters = {name: LabelCounters(self.all_labels) for name in SPLIT_NAMES}
+        self.frame_details_path = os.path.join(output_dir, FRAME_DETAILS_NAME)
+        self._frame_details: Optional[FrameDetailWriter] = None
+
+        # dataset_info.json 在导出过程中定期更新（分片进程不写）
+        self.writes_summary = True
+        self._summary_status = ""
+        self._summary_saved_at = 0.0
+
+        # 错误和调试信息：内存中只保留最近的事件，完整记录写入 export_log.jsonl
+        self.log = ExportLog()
+
     def export_dataset(self, progress_callback=None) -> bool:
         """导出多标签数据集"""
         try:
@@ -95,105 +386,624 @@ class MultiLabelDatasetExporter:
                     self.cancelled = True
                     return False
 
-            # 创建输出目录
-            images_dir = Path(self.output_dir) / "images"
-            labels_dir = Path(self.output_dir) / "labels"
+            images_dir, labels_dir = self._prepare_output_dirs()
+            self.log.open(os.path.join(self.output_dir, EXPORT_LOG_NAME), append=self.append)
 
-            try:
-                images_dir.mkdir(parents=True, exist_ok=True)
-                labels_dir.mkdir(parents=True, exist_ok=True)
-                self.stats["debug_info"].append(f"成功创建目录: {images_dir}, {labels_dir}")
-            except Exception as e:
-                raise Exception(f"创建输出目录失败: {str(e)}")
-
-            # 检查目录权限
-            if not os.access(str(images_dir), os.W_OK):
-                raise Exception(f"没有写入权限: {images_dir}")
-            if not os.access(str(labels_dir), os.W_OK):
-                raise Exception(f"没有写入权限: {labels_dir}")
+            # 上次追加没有完成时先恢复为追加前的数据集
+            stale_checkpoint = AppendCheckpoint.load(self.output_dir)
+            if stale_checkpoint is not None:
+                removed = stale_checkpoint.rollback()
+                self.log.warning(f"回滚上次未完成的追加导出，删除 {removed} 个文件")
 
             # 测试中文路径支持
-            self._test_chinese_path_support(images_dir)
-
-            # 打开视频文件
-            cap = cv2.VideoCapture(self.video_path)
-            if not cap.isOpened():
-                raise Exception(f"无法打开视频文件: {self.video_path}")
+            self._test_chinese_path_support(images_dir if self.output_layout == "files" else self.shards_dir)
 
             # 获取视频信息
+            video_fps = self._probe_video()
+            if not self.video_hash:
+                self.video_hash = compute_video_fingerprint(self.video_path)
+
+            if self.append:
+                self._prepare_append()
+
+            total_annotations = len(self.annotations)
+            if progress_callback:
+                if not progress_callback(5, f"开始处理 {total_annotations} 个多标签标注..."):
+                    self.cancelled = True
+                    return False
+
+            # 按起始帧排序，保留原始索引用于文件命名
+            ordered = sorted(
+                enumerate(self.annotations),
+                key=lambda item: self._get_frame_range(item[1], video_fps)
+            )
+            self.stats["planned_frames"] = sum(
+                len(select_rate_indices(end - start + 1, video_fps, self.sample_fps))
+                for start, end in (self._get_frame_range(ann, video_fps) for _, ann in ordered)
+            )
+
+            # 文件名按标注ID生成，增删其他标注不会改变已导出标注的文件名
+            self._base_names = self._assign_base_names(ordered)
+            if self._append_checkpoint is not None:
+                self._append_checkpoint.record_samples(list(self._base_names.values()))
+
+            # 划分需要看到全部标注（分层），在分片之前完成
+            if self.split_ratios:
+                self._split_of = assign_splits(
+                    [(ann.id, [lc.label for lc in ann.labels]) for _, ann in ordered],
+                    self.split_ratios, self.split_stratify, self.split_seed
+                )
+            elif not self.append and os.path.isdir(self.splits_dir):
+                # 上次导出的划分与本次导出的文件不再对应
+                shutil.rmtree(self.splits_dir, ignore_errors=True)
+
+            if self.tracks_manifest:
+                self._prepare_manifest(ordered, video_fps)
+            elif self.incremental:
+                self.log.debug("追加导出不使用导出清单，执行完整导出" if self.append
+                               else "tar布局不支持增量导出，执行完整导出")
+
+            self._write_running_summary(force=True)
+
+            if self.shard_workers > 1 and len(ordered) > 1:
+                completed = self._export_sharded(ordered, video_fps, progress_callback)
+            else:
+                completed = self._export_annotations(ordered, images_dir, labels_dir, video_fps, progress_callback)
+
+            # 检查是否被取消
+            if not completed or self.cancelled:
+                return False
+
+            # 生成数据集信息文件
+            if progress_callback:
+                if not progress_callback(95, "生成数据集信息..."):
+                    self.cancelled = True
+                    return False
+
+            if self.output_layout == "tar":
+                self._write_shard_index()
+
+            self._generate_multi_label_dataset_info("completed")
+            if self._append_checkpoint is not None:
+                self._append_checkpoint.discard()
+                self._append_checkpoint = None
+
+            if progress_callback:
+                if not progress_callback(100, "多标签导出完成!"):
+                    self.cancelled = True
+                    return False
+
+            return True
+
+        except Exception as e:
+            self.log.error(f"导出失败: {str(e)}")
+            return False
+
+        finally:
+            if self._append_checkpoint is not None:
+                # 追加被取消或失败：数据集恢复为追加前的状态
+                removed = self._append_checkpoint.rollback()
+                self._append_checkpoint = None
+                self._summary_status = ""
+                self.log.warning(f"追加导出未完成，已回滚，删除 {removed} 个文件")
+            # 取消或失败时也更新汇总，监控方可以看到最终状态
+            if self._summary_status == "running":
+                self._generate_multi_label_dataset_info("cancelled" if self.cancelled else "failed")
+            self.log.close()
+
+    @property
+    def cancelled(self) -> bool:
+        """是否已取消（线程安全）"""
+        return self._cancel_event.is_set()
+
+    @cancelled.setter
+    def cancelled(self, value: bool):
+        if value:
+            self._cancel_event.set()
+        else:
+            self._cancel_event.clear()
+
+    def get_progress_counters(self) -> Dict[str, int]:
+        """导出进度计数，可以在其他线程中调用（用于计算帧率、剩余时间）"""
+        if self._shard_counters is not None:
+            frames_done, bytes_written = self._shard_counters
+        else:
+            frames_done = self.stats["exported_images"] + self.stats["incremental"]["reused_frames"]
+            bytes_written = self.stats["bytes_written"]
+        return {
+            "frames_done": frames_done,
+            "frames_total": self.stats["planned_frames"],
+            "bytes_written": bytes_written
+        }
+
+    @property
+    def writes_label_files(self) -> bool:
+        """是否输出逐帧txt标注文件（tar布局下标注已写入分片）"""
+        return self.output_layout == "files" and self.label_format in ("txt", "both")
+
+    @property
+    def shards_dir(self) -> Path:
+        """tar分片目录"""
+        return Path(self.output_dir) / "shards"
+
+    @property
+    def writes_label_store(self) -> bool:
+        """是否输出 labels.npy"""
+        return self.label_format in ("npy", "both")
+
+    @property
+    def samples_frames(self) -> bool:
+        """是否启用了帧采样或去重"""
+        return self.sample_fps > 0 or self.label_epsilon > 0 or self.dedup_threshold >= 0
+
+    @property
+    def tracks_manifest(self) -> bool:
+        """是否维护导出清单（tar分片是整体写入的，只有逐文件布局可以增量导出；
+        追加导出时清单只对应一个会话，不维护）"""
+        return self.output_layout == "files" and not self.append
+
+    def _export_settings(self) -> Dict[str, Any]:
+        """影响输出文件内容的导出设置，变化后已导出的文件不能复用"""
+        settings = {
+            "label_format": self.label_format,
+            "output_layout": self.output_layout,
+            "sample_fps": self.sample_fps,
+            "label_epsilon": self.label_epsilon,
+            "dedup_threshold": self.dedup_threshold,
+            "transform": self.transform.to_dict() if self.transform else None,
+            "image_codec": self.codec.settings()
+        }
+        if self.time_base != "video":
+            # 默认时间基准不写入，已有的导出清单继续有效
+            settings["time_base"] = self.time_base
+        return settings
+
+    def _prepare_append(self):
+        """追加导出前检查已有数据集，沿用其划分设置并记录追加前的状态"""
+        base = load_dataset_info(self.output_dir)
+        if base is not None:
+            if base.get("export_status") != "completed":
+                raise Exception("目录中的数据集没有完整导出，不能追加")
+            if base.get("output_layout", "files") != self.output_layout:
+                raise Exception(f"输出布局与已有数据集不一致: {base.get('output_layout')}")
+            if base.get("label_store", {}).get("format", "txt") != self.label_format:
+                raise Exception(f"标注格式与已有数据集不一致: {base['label_store']['format']}")
+            if any(session.get("video_hash") == self.video_hash for session in dataset_sessions(base)):
+                raise Exception(f"该视频已经在数据集中: {os.path.basename(self.video_path)}")
+
+            # 已有数据集划分过时，新会话按相同的设置划分，子集索引保持完整
+            splits = base.get("splits")
+            if splits and not self.split_ratios:
+                self.split_ratios = tuple(splits["ratios"][name] for name in SPLIT_NAMES)
+                self.split_stratify = splits.get("stratify", True)
+                self.split_seed = splits.get("seed", "")
+            elif self.split_ratios and not splits and dataset_sessions(base):
+                self.log.warning("已有数据集没有划分子集，子集索引只包含追加的样本")
+
+            if base.get("image_codec") != self.codec.settings() or \
+                    base.get("frame_transform") != (self.transform.to_dict() if self.transform else None):
+                self.log.warning("图像编码或帧变换设置与已有数据集不同")
+
+        self._base_info = base
+        # 每个会话的tar分片带视频指纹前缀，不会覆盖已有的分片
+        self.tar_shard_prefix = f"shard-{self.video_hash[:12]}"
+        self._append_checkpoint = AppendCheckpoint.create(
+            self.output_dir, base, self.label_store_dir, len(self.all_labels), self.tar_shard_prefix
+        )
+        self.log.debug(f"追加导出: 已有 {len(dataset_sessions(base)) if base else 0} 个会话")
+
+    def _prepare_manifest(self, ordered: List[Tuple[int, AnnotationMarker]], video_fps: float):
+        """加载导出清单：确定可以复用的标注，增量导出时删除不再属于数据集的旧文件"""
+        settings = self._export_settings()
+        manifest = ExportManifest.load(self.output_dir, self.video_hash, settings)
+        reuse = self.incremental and manifest.is_compatible()
+        # 只清理同一视频上次增量导出的文件；非增量导出或清单属于其他视频时，
+        # 目录中已有的文件（如其他项目导出到同一目录的样本）保持不动
+        prune = self.incremental and manifest.loaded_video_hash == self.video_hash
+
+        # 清单按标注ID记录，ID重复的标注无法区分各自的记录，总是重新导出
+        id_counts: Dict[str, int] = {}
+        for _, annotation in ordered:
+            id_counts[annotation.id] = id_counts.get(annotation.id, 0) + 1
+
+        self._reused_ids = {}
+        expected_paths = set()
+        for annotation_index, annotation in ordered:
+            signature = annotation_signature(annotation, video_fps, settings)
+            base_name = self._base_names[annotation_index]
+            # 记录的文件名不同（如旧版本的命名方式）时，复用会让索引指向不存在的文件
+            if reuse and id_counts[annotation.id] == 1 and manifest.is_complete(annotation.id, signature) \
+                    and manifest.entries[annotation.id]["base_name"] == base_name:
+                self._reused_ids[annotation.id] = manifest.entries[annotation.id].get("frame_indices")
+                continue
+            # 采样导出的帧事先无法确定，旧文件全部删除后重新写入
+            if self.samples_frames:
+                continue
+            start_frame, end_frame = self._get_frame_range(annotation, video_fps)
+            expected_paths.update(entry_file_paths({
+                "base_name": base_name,
+                "frames_total": end_frame - start_frame + 1,
+                "image_ext": self.codec.extension
+            }, self.output_dir))
+
+        # 已删除、已修改的标注以及设置变化后的旧文件，本次不会被覆盖的部分直接删除
+        removed_files = 0
+        for annotation_id in list(manifest.entries):
+            if annotation_id in self._reused_ids:
+                continue
+            entry = manifest.remove(annotation_id)
+            if not prune:
+                continue
+            for path in entry_file_paths(entry, self.output_dir):
+                if path in expected_paths:
+                    continue
+                try:
+                    os.remove(path)
+                    removed_files += 1
+                except FileNotFoundError:
+                    pass
+
+        manifest.save()
+        remove_manifest_parts(self.output_dir)
+        self._manifest = manifest
+
+        self.stats["incremental"]["reused_annotations"] = len(self._reused_ids)
+        self.stats["incremental"]["removed_files"] = removed_files
+        self.log.debug(
+            f"导出清单: 复用 {len(self._reused_ids)} 个标注, 删除 {removed_files} 个过期文件"
+        )
+
+    def _flush_manifest(self, force: bool = False):
+        """把已处理标注的写入进度原子写入清单，按时间间隔限流"""
+        if self._manifest is None:
+            return
+        now = time.time()
+        if not force and now - self._manifest_saved_at < MANIFEST_FLUSH_INTERVAL:
+            return
+
+        with self._counts_lock:
+            success_counts = dict(self._frame_success_counts)
+
+        for annotation_index, (annotation_id, signature, base_name) in self._manifest_pending.items():
+            if annotation_index in self._frame_totals:
+                self._manifest.record(annotation_id, signature, base_name,
+                                      self._frame_totals[annotation_index],
+                                      success_counts.get(annotation_index, 0),
+                                      self._submitted_indices.get(annotation_index),
+                                      self.codec.extension)
+
+        try:
+            self._manifest.save()
+        except OSError as e:
+            self.log.error(f"写入导出清单失败: {str(e)}")
+        self._manifest_saved_at = now
+
+    def _prepare_output_dirs(self) -> Tuple[Path, Path]:
+        """创建输出目录并检查写入权限"""
+        images_dir = Path(self.output_dir) / "images"
+        labels_dir = Path(self.output_dir) / "labels"
+        dirs = [images_dir if self.output_layout == "files" else self.shards_dir]
+        if self.writes_label_files:
+            dirs.append(labels_dir)
+
+        try:
+            for directory in dirs:
+                directory.mkdir(parents=True, exist_ok=True)
+            self.log.debug(f"成功创建目录: {', '.join(str(d) for d in dirs)}")
+        except Exception as e:
+            raise Exception(f"创建输出目录失败: {str(e)}")
+
+        # 检查目录权限
+        for directory in dirs:
+            if not os.access(str(directory), os.W_OK):
+                raise Exception(f"没有写入权限: {directory}")
+
+        return images_dir, labels_dir
+
+    def _probe_video(self) -> float:
+        """读取视频信息，返回实际帧率"""
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            raise Exception(f"无法打开视频文件: {self.video_path}")
+
+        try:
             video_fps = cap.get(cv2.CAP_PROP_FPS) or self.fps
             frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
             video_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             video_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        finally:
+            cap.release()
+
+        self.log.debug(f"视频信息: {video_width}x{video_height}, {video_fps}fps, {frame_count}帧")
+        return video_fps
+
+    def _export_annotations(self, ordered: List[Tuple[int, AnnotationMarker]], images_dir: Path,
+                            labels_dir: Path, video_fps: float, progress_callback=None) -> bool:
+        """顺序导出一组已排序的标注，返回False表示被取消"""
+        # 打开视频文件
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            raise Exception(f"无法打开视频文件: {self.video_path}")
+
+        # 顺序解码读取器：按帧号顺序处理标注，避免逐帧定位；
+        # 标注之间重叠的帧缓存起来，每帧在一次导出中只解码一次
+        cache = FrameCache(self.frame_cache_bytes) if self.frame_cache_bytes > 0 else None
+        reader = SequentialFrameReader(cap, self.seek_cost_frames, cache)
+
+        # 编码/写入流水线：当前线程负责解码，编码和写入在后台线程中进行
+        pipeline = ExportPipeline(self._encode_frame_job, self._write_frame_job, self.encoder_workers,
+                                  on_write_error=self._on_write_error)
+        pipeline.start()
+        self._frame_totals.clear()
+        self._frame_success_counts.clear()
+        self._manifest_pending.clear()
+        self._annotation_base_names.clear()
+        self._submitted_indices.clear()
 
-            self.stats["debug_info"].append(f"视频信息: {video_width}x{video_height}, {video_fps}fps, {frame_count}帧")
+        try:
+            # 标注二进制存储由写入线程追加
+            if self.writes_label_store:
+                os.makedirs(self.label_store_dir, exist_ok=True)
+                self._label_store = LabelStoreWriter(self.label_store_dir, len(self.all_labels),
+                                                     append=self.append)
+
+            # 逐帧明细和子集索引由写入线程逐行追加
+            self._frame_details = FrameDetailWriter(self.frame_details_path, self.all_labels, append=self.append)
+            if self._split_of:
+                self._split_writer = SplitIndexWriter(self.splits_dir, append=self.append)
+
+            # tar分片同样只由写入线程顺序写入
+            if self.output_layout == "tar":
+                self._tar_writer = TarShardWriter(str(self.shards_dir), self.tar_shard_prefix, self.tar_shard_bytes)
+
+            total_annotations = len(ordered)
+
+            # 复用的标注不需要解码
+            runs = plan_frame_runs(
+                [self._get_frame_range(ann, video_fps) for _, ann in ordered if ann.id not in self._reused_ids],
+                self.seek_cost_frames
+            )
+            self.stats["decode_stats"]["planned_runs"] += len(runs)
+            self.log.debug(f"解码计划: {len(runs)} 个连续段")
+
+            # 处理每个标注时，后续需要解码的标注中最早的起始帧：
+            # 只有不小于该帧号的帧才会被再次读取，值得缓存
+            later_starts = []
+            next_start = sys.maxsize
+            for _, annotation in reversed(ordered):
+                later_starts.append(next_start)
+                if annotation.id not in self._reused_ids:
+                    next_start = min(next_start, self._get_frame_range(annotation, video_fps)[0])
+            later_starts.reverse()
+
+            # 处理每个标注
+            for i, (annotation_index, annotation) in enumerate(ordered):
+                try:
+                    # 检查是否被取消
+                    if self.cancelled:
+                        return False
 
-            try:
-                total_annotations = len(self.annotations)
+                    report_progress = None
+                    if progress_callback:
+                        message = f"处理标注 {i+1}/{total_annotations}: {len(annotation.labels)} 个标签"
 
-                if progress_callback:
-                    if not progress_callback(5, f"开始处理 {total_annotations} 个多标签标注..."):
-                        self.cancelled = True
-                        return False
+                        # 长标注在帧循环中按帧进度继续汇报
+                        def report_progress(fraction, i=i, message=message):
+                            return progress_callback(int(5 + (i + fraction) / total_annotations * 90), message)
 
-                # 处理每个标注
-                for i, annotation in enumerate(self.annotations):
-                    try:
-                        # 检查是否被取消
-                        if self.cancelled:
+                        if not report_progress(0.0):
+                            self.cancelled = True
                             return False
 
-                        if progress_callback:
-                            progress = int(5 + (i / total_annotations) * 90)
-                            label_count = len(annotation.labels)
-                            if not progress_callback(progress, f"处理标注 {i+1}/{total_annotations}: {label_count} 个标签"):
-                                self.cancelled = True
-                                return False
+                    # 处理刷新UI事件
+                    self._process_events()
 
-                        # 处理刷新UI事件
-                        QApplication.processEvents()
+                    if cache is not None:
+                        cache.set_window(self._get_frame_range(annotation, video_fps)[0], later_starts[i])
 
-                        success = self._process_multi_label_annotation(
-                            cap, annotation, images_dir, labels_dir, video_fps, i
-                        )
+                    success = self._process_multi_label_annotation(
+                        reader, pipeline, annotation, images_dir, labels_dir, video_fps, annotation_index,
+                        report_progress
+                    )
 
-                        if not success:
-                            error_msg = f"处理标注失败: {annotation.display_labels} ({annotation.start_time}-{annotation.end_time})"
-                            self.stats["errors"].append(error_msg)
+                    if not success:
+                        error_msg = f"处理标注失败: {annotation.display_labels} ({annotation.start_time}-{annotation.end_time})"
+                        self.log.error(error_msg)
 
-                    except Exception as e:
-                        error_msg = f"处理标注 {i+1} 时出错: {str(e)}"
-                        self.stats["errors"].append(error_msg)
-                        print(error_msg)
-                        continue
+                    self._flush_manifest()
+                    self._write_running_summary()
 
-                # 检查是否被取消
-                if self.cancelled:
+                except Exception as e:
+                    self._count_failure("annotation_failed", f"处理标注 {i+1} 时出错: {str(e)}")
+                    continue
+
+            # 检查是否被取消
+            if self.cancelled:
+                return False
+
+            # 等待编码和写入完成
+            if progress_callback:
+                if not progress_callback(95, "等待图像写入完成..."):
+                    self.cancelled = True
                     return False
 
-                # 生成数据集信息文件
-                if progress_callback:
-                    if not progress_callback(95, "生成数据集信息..."):
-                        self.cancelled = True
-                        return False
+            pipeline.close()
 
-                self._generate_multi_label_dataset_info()
+            # 快速模式：逐帧不做存在性检查，这里一次性扫描输出目录核对
+            if self.fast_path and self.output_layout == "files":
+                self._verify_written_files(images_dir, labels_dir)
 
-                if progress_callback:
-                    if not progress_callback(100, "多标签导出完成!"):
-                        self.cancelled = True
-                        return False
+            self._finalize_annotation_stats(ordered)
+            return True
 
-                return True
+        finally:
+            # 正常结束时流水线已关闭，这里只会丢弃取消/异常时剩余的任务
+            pipeline.abort()
+            # 记录已写入的帧，取消或中断后再次增量导出可以从这里继续
+            self._flush_manifest(force=True)
+            if self._label_store:
+                self.stats["label_store_rows"] += self._label_store.rows - self._label_store.first_row
+                self._label_store.close()
+                self._label_store = None
+            if self._frame_details:
+                self._frame_details.close()
+                self._frame_details = None
+            if self._split_writer:
+                self._split_writer.close()
+                self._split_writer = None
+            if self._tar_writer:
+                self._tar_writer.close()
+                self.stats["tar_shards"].extend(self._tar_writer.shards)
+                self._tar_writer = None
+            for key, value in reader.get_stats().items():
+                self.stats["decode_stats"][key] += value
+            if cache is not None:
+                cache.clear()
+            cap.release()
+
+    def _get_worker_options(self) -> Dict[str, Any]:
+        """分片工作进程中创建导出器所需的参数"""
+        return {
+            "seek_cost_frames": self.seek_cost_frames,
+            "frame_cache_bytes": self.frame_cache_bytes // self.shard_workers,
+            "encoder_workers": max(1, self.encoder_workers // self.shard_workers),
+            "label_format": self.label_format,
+            "output_layout": self.output_layout,
+            "tar_shard_bytes": self.tar_shard_bytes,
+            "incremental": self.incremental,
+            "video_hash": self.video_hash,
+            "fast_path": self.fast_path,
+            "sample_fps": self.sample_fps,
+            "label_epsilon": self.label_epsilon,
+            "dedup_threshold": self.dedup_threshold,
+            "transform": self.transform,
+            "image_codec": self.codec.spec,
+            "append": self.append,
+            "time_base": self.time_base
+        }
 
-            finally:
-                cap.release()
+    def _export_sharded(self, ordered: List[Tuple[int, AnnotationMarker]], video_fps: float,
+                        progress_callback=None) -> bool:
+        """多进程分片导出，返回False表示被取消"""
+        shards = split_annotation_shards(
+            ordered, [self._get_frame_range(ann, video_fps) for _, ann in ordered], self.shard_workers
+        )
+        shard_frames = [
+            sum(end - start + 1 for start, end in (self._get_frame_range(ann, video_fps) for _, ann in shard))
+            for shard in shards
+        ]
+        self.log.debug(f"分片导出: {len(shards)} 个分片, 每片帧数 {shard_frames}")
+
+        # 清理上次中断留下的分片临时文件（追加模式下分片进程不会覆盖它们）
+        for parts_dir in (_SHARD_DETAIL_PARTS_DIR, _SHARD_SPLIT_PARTS_DIR, _SHARD_LABEL_STORE_PARTS_DIR):
+            shutil.rmtree(os.path.join(self.output_dir, parts_dir), ignore_errors=True)
+
+        with multiprocessing.Manager() as manager:
+            cancel_event = manager.Event()
+            progress_queue = manager.Queue()
+            shard_progress = [0] * len(shards)
+            shard_counters = [(0, 0)] * len(shards)
+            self._shard_counters = (0, 0)
+
+            with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+                futures = [
+                    executor.submit(
+                        _export_shard_worker, shard_id, self.video_path, shard, self.output_dir,
+                        self.fps, video_fps, self._get_worker_options(), self._reused_ids,
+                        self._split_of, self._base_names, self.tar_shard_prefix, cancel_event, progress_queue
+                    )
+                    for shard_id, shard in enumerate(shards)
+                ]
+
+                pending = set(futures)
+                while pending:
+                    _, pending = wait(pending, timeout=0.2)
+
+                    # 汇总各分片进度（按帧数加权）
+                    while not progress_queue.empty():
+                        shard_id, value, frames_done, bytes_written = progress_queue.get()
+                        shard_progress[shard_id] = value
+                        shard_counters[shard_id] = (frames_done, bytes_written)
+                    self._shard_counters = tuple(sum(c) for c in zip(*shard_counters))
+
+                    if progress_callback and not self.cancelled:
+                        done = sum(p * n for p, n in zip(shard_progress, shard_frames))
+                        progress = int(5 + done / max(1, sum(shard_frames)) * 90)
+                        finished = len(shards) - len(pending)
+                        if not progress_callback(min(progress, 95), f"分片导出中: {finished}/{len(shards)} 个分片完成"):
+                            self.cancelled = True
+
+                    self._process_events()
+                    self._write_running_summary()
 
-        except Exception as e:
-            error_msg = f"导出失败: {str(e)}"
-            self.stats["errors"].append(error_msg)
-            print(f"导出异常: {e}")
-            return False
+                    if self.cancelled:
+                        cancel_event.set()
+
+                results = [future.result() for future in futures]
+            self._shard_counters = None
+
+        for result in results:
+            self._merge_shard_stats(result["stats"])
+            self.label_counters.merge(result["label_counters"])
+            for name, counters in result["split_counters"].items():
+                self.split_counters[name].merge(counters)
+            self.log.absorb(result["log"])
+        shutil.rmtree(os.path.join(self.output_dir, _SHARD_LOG_PARTS_DIR), ignore_errors=True)
+
+        # 各分片的逐帧明细按时间顺序拼接
+        merge_frame_details(
+            [_shard_frame_details_path(self.output_dir, shard_id) for shard_id in range(len(shards))],
+            self.frame_details_path, append=self.append
+        )
+        shutil.rmtree(os.path.join(self.output_dir, _SHARD_DETAIL_PARTS_DIR), ignore_errors=True)
+
+        if self._split_of:
+            part_dirs = [_shard_splits_dir(self.output_dir, shard_id) for shard_id in range(len(shards))]
+            merge_split_indexes(part_dirs, self.splits_dir, append=self.append)
+            shutil.rmtree(os.path.dirname(part_dirs[0]), ignore_errors=True)
+
+        # 各分片的 labels.npy 按时间顺序合并为一个文件
+        if self.writes_label_store:
+            part_dirs = [_shard_label_store_dir(self.output_dir, shard_id) for shard_id in range(len(shards))]
+            merge_label_stores(part_dirs, self.label_store_dir, len(self.all_labels), append=self.append)
+            shutil.rmtree(os.path.dirname(part_dirs[0]), ignore_errors=True)
+
+        # 各分片的清单合并到主清单
+        if self._manifest:
+            self._manifest.merge_parts(self.output_dir)
+
+        return not self.cancelled and all(result["completed"] for result in results)
+
+    def _merge_shard_stats(self, shard_stats: Dict[str, Any]):
+        """合并分片导出的统计信息"""
+        for key in ("exported_images", "exported_labels", "label_store_rows", "bytes_written"):
+            self.stats[key] += shard_stats[key]
+
+        for key in ("linear_count", "constant_count"):
+            self.stats["progression_stats"][key] += shard_stats["progression_stats"][key]
+
+        multi_stats = self.stats["multi_label_stats"]
+        multi_stats["single_label"] += shard_stats["multi_label_stats"]["single_label"]
+        multi_stats["multi_label"] += shard_stats["multi_label_stats"]["multi_label"]
+        multi_stats["max_labels_per_annotation"] = max(
+            multi_stats["max_labels_per_annotation"],
+            shard_stats["multi_label_stats"]["max_labels_per_annotation"]
+        )
+
+        for key, value in shard_stats["decode_stats"].items():
+            self.stats["decode_stats"][key] += value
+
+        self.stats["incremental"]["reused_frames"] += shard_stats["incremental"]["reused_frames"]
+
+        for key, value in shard_stats["sampling"].items():
+            self.stats["sampling"][key] += value
+
+        for kind, count in shard_stats["failure_counts"].items():
+            self.stats["failure_counts"][kind] += count
+        for kind, message in shard_stats["failure_examples"].items():
+            self.stats["failure_examples"].setdefault(kind, message)
+
+        self.stats["tar_shards"].extend(shard_stats["tar_shards"])
 
     def _test_chinese_path_support(self, test_dir: Path):
         """测试中文路径支持"""
@@ -206,18 +1016,26 @@ class MultiLabelDatasetExporter:
             success = cv2_imwrite_chinese(str(test_file), test_image)
 
             if success and os.path.exists(test_file):
-                self.stats["debug_info"].append("多标签路径支持测试: 成功")
+                self.log.debug("多标签路径支持测试: 成功")
                 os.remove(test_file)
             else:
-                self.stats["debug_info"].append("多标签路径支持测试: 失败")
+                self.log.debug("多标签路径支持测试: 失败")
 
         except Exception as e:
-            self.stats["debug_info"].append(f"多标签路径测试异常: {e}")
+            self.log.debug(f"多标签路径测试异常: {e}")
 
-    def _process_multi_label_annotation(self, cap: cv2.VideoCapture, annotation: AnnotationMarker,
-                                       images_dir: Path, labels_dir: Path, video_fps: float,
-                                       annotation_index: int) -> bool:
-        """处理单个多标签标注"""
+    def _get_frame_range(self, annotation: AnnotationMarker, video_fps: float) -> Tuple[int, int]:
+        """计算标注的帧范围（闭区间）"""
+        return annotation_frame_range(annotation, video_fps, self._frame_times)
+
+    def _process_multi_label_annotation(self, reader: SequentialFrameReader, pipeline: ExportPipeline,
+                                       annotation: AnnotationMarker, images_dir: Path, labels_dir: Path,
+                                       video_fps: float, annotation_index: int,
+                                       report_progress: Optional[Callable[[float], bool]] = None) -> bool:
+        """处理单个多标签标注 - 解码帧并提交到编码流水线
+
+        report_progress(fraction) 汇报标注内的进度，返回False表示取消
+        """
         try:
             # 检查是否被取消
             if self.cancelled:
@@ -243,189 +1061,315 @@ class MultiLabelDatasetExporter:
                     self.stats["progression_stats"]["constant_count"] += 1
 
             # 计算帧范围
-            start_frame = int(annotation.start_time * video_fps)
-            end_frame = int(annotation.end_time * video_fps)
+            start_frame, end_frame = self._get_frame_range(annotation, video_fps)
             total_frames = end_frame - start_frame + 1
 
             if total_frames <= 0:
-                self.stats["errors"].append(f"无效的时间范围: {annotation.start_time}-{annotation.end_time}")
+                self.log.error(f"无效的时间范围: {annotation.start_time}-{annotation.end_time}")
                 return False
 
             # 生成文件名前缀
-            base_name = self._generate_multi_label_safe_name(annotation, annotation_index)
+            base_name = self._base_names[annotation_index]
+            self._annotation_base_names[annotation_index] = base_name
+
+            # 已完整导出的标注不解码也不编码，只把标注数值交给写入线程（labels.npy 需要完整的行）
+            reuse_existing = annotation.id in self._reused_ids
+            if self._manifest is not None and not reuse_existing:
+                self._manifest_pending[annotation_index] = (
+                    annotation.id, annotation_signature(annotation, video_fps, self._export_settings()), base_name
+                )
+
+            self.log.debug(f"处理多标签标注: {annotation.display_labels}, 帧范围: {start_frame}-{end_frame}, 总帧数: {total_frames}")
 
-            self.stats["debug_info"].append(f"处理多标签标注: {annotation.display_labels}, 帧范围: {start_frame}-{end_frame}, 总帧数: {total_frames}")
+            # 一次性计算整个标注的动作矩阵（含舌头规则）
+            label_matrix = build_annotation_label_matrix(annotation, total_frames, np.float64)
+
+            # 按目标帧率和标注变化选取要导出的帧，未选中的帧只会被 grab() 跳过；
+            # 复用的标注沿用上次导出的帧
+            if reuse_existing and self._reused_ids[annotation.id] is not None:
+                frame_indices = self._reused_ids[annotation.id]
+            else:
+                frame_indices = select_frame_indices(label_matrix, video_fps, self.sample_fps, self.label_epsilon)
+            sampling_stats = self.stats["sampling"]
+            sampling_stats["candidate_frames"] += total_frames
+            sampling_stats["skipped_by_sampling"] += total_frames - len(frame_indices)
+
+            # 近似重复帧在解码后用感知哈希过滤
+            duplicate_filter = None
+            if self.dedup_threshold >= 0 and not reuse_existing:
+                duplicate_filter = DuplicateFilter(self.dedup_threshold)
+
+            submitted_indices = []
+            label_mask = self.label_counters.label_mask([lc.label for lc in annotation.labels])
 
             # 提取每一帧
-            frame_success_count = 0
-            for frame_idx in range(total_frames):
+            submitted_count = 0
+            for position, frame_idx in enumerate(frame_indices):
                 # 检查是否被取消
                 if self.cancelled:
                     return False
 
                 current_frame = start_frame + frame_idx
 
-                # 设置帧位置
-                cap.set(cv2.CAP_PROP_POS_FRAMES, current_frame)
-                ret, frame = cap.read()
+                if reuse_existing:
+                    frame = None
+                else:
+                    # 顺序读取帧（必要时才定位）
+                    frame = reader.read(current_frame)
 
-                if not ret or frame is None:
-                    self.stats["debug_info"].append(f"跳过帧 {current_frame}: 读取失败")
-                    continue
+                    if frame is None:
+                        self._count_failure("decode_failed", f"跳过帧 {current_frame}: 读取失败", debug=True)
+                        continue
 
-                # 验证帧数据
-                if frame.size == 0:
-                    self.stats["debug_info"].append(f"跳过帧 {current_frame}: 空帧")
-                    continue
+                    # 验证帧数据
+                    if frame.size == 0:
+                        self._count_failure("empty_frame", f"跳过帧 {current_frame}: 空帧", debug=True)
+                        continue
 
-                # 计算当前帧的进度 (0.0 到 1.0)
-                if total_frames == 1:
-                    frame_progress = 0.5
-                else:
-                    frame_progress = frame_idx / (total_frames - 1)
+                    # 有ROI时只比较ROI内的像素
+                    if duplicate_filter and duplicate_filter.is_duplicate(
+                            self.transform.crop(frame) if self.transform else frame):
+                        sampling_stats["skipped_duplicates"] += 1
+                        continue
 
                 # 生成文件名
                 frame_name = f"{base_name}_frame_{frame_idx:04d}"
 
-                # 保存图像
-                image_path = images_dir / f"{frame_name}.jpg"
-                if self._save_image_fixed(frame, str(image_path), frame_name):
-                    self.stats["exported_images"] += 1
-                    frame_success_count += 1
-                else:
-                    error_msg = f"保存图像失败: {frame_name}"
-                    self.stats["errors"].append(error_msg)
-
-                # 保存多标签标注文件
-                label_path = labels_dir / f"{frame_name}.txt"
-                if self._save_multi_label_file(label_path, annotation, frame_progress):
-                    self.stats["exported_labels"] += 1
-                else:
-                    error_msg = f"保存多标签标注文件失败: {frame_name}"
-                    self.stats["errors"].append(error_msg)
+                # 提交编码任务，编码线程跟不上时在这里阻塞
+                job = FrameExportJob(
+                    frame=frame,
+                    frame_name=frame_name,
+                    image_path=str(images_dir / f"{frame_name}{self.codec.extension}"),
+                    label_path=str(labels_dir / f"{frame_name}.txt"),
+                    label_values=label_matrix[frame_idx],
+                    label_mask=label_mask,
+                    annotation_index=annotation_index,
+                    annotation_id=annotation.id,
+                    frame_number=current_frame,
+                    timestamp=current_frame / video_fps,
+                    reuse_existing=reuse_existing
+                )
+                if not pipeline.submit(job, lambda: self.cancelled):
+                    return False
+                submitted_count += 1
+                submitted_indices.append(frame_idx)
 
-                # 处理UI事件
-                if frame_idx % 10 == 0:
-                    QApplication.processEvents()
+                # 处理UI事件、汇报进度
+                if position % 10 == 0:
+                    self._process_events()
+                    if report_progress and not report_progress(position / len(frame_indices)):
+                        self.cancelled = True
                     if self.cancelled:
                         return False
 
-            # 更新标签分布统计
-            for label_config in annotation.labels:
-                if label_config.label in self.stats["label_distribution"]:
-                    self.stats["label_distribution"][label_config.label] += frame_success_count
-
-            self.stats["debug_info"].append(f"多标签标注 {annotation.display_labels} 完成: 成功保存 {frame_success_count}/{total_frames} 帧")
-            return frame_success_count > 0
+            if self.samples_frames:
+                # 采样导出按实际提交的帧判断完整性，并记录帧序号用于增量导出
+                self._submitted_indices[annotation_index] = submitted_indices
+                self._frame_totals[annotation_index] = len(submitted_indices)
+            else:
+                self._frame_totals[annotation_index] = total_frames
+            return submitted_count > 0
 
         except Exception as e:
-            error_msg = f"处理多标签标注异常: {str(e)}"
-            self.stats["errors"].append(error_msg)
-            print(error_msg)
+            self._count_failure("annotation_failed", f"处理多标签标注异常: {str(e)}")
             return False
 
-    def _save_multi_label_file(self, file_path: Path, annotation: AnnotationMarker, frame_progress: float) -> bool:
-        """保存多标签面部动作标注文件"""
-        try:
-            # 检查是否被取消
-            if self.cancelled:
-                return False
+    def _finalize_annotation_stats(self, ordered: List[Tuple[int, AnnotationMarker]]):
+        """流水线结束后汇总每个标注的写入结果"""
+        for annotation_index, annotation in ordered:
+            if annotation_index not in self._frame_totals:
+                continue
 
-            # 创建45个动作的数值数组
-            action_values = [0.0] * 45
+            frame_success_count = self._frame_success_counts.get(annotation_index, 0)
+            total_frames = self._frame_totals[annotation_index]
 
-            # 处理每个激活的标签
-            for label_config in annotation.labels:
-                label = label_config.label
+            self.log.debug(f"多标签标注 {annotation.display_labels} 完成: 成功保存 {frame_success_count}/{total_frames} 帧")
 
-                if label in self.all_labels:
-                    label_index = self.all_labels.index(label)
+            if frame_success_count == 0:
+                self.log.error(f"标注没有成功保存任何帧: {annotation.display_labels}")
 
-                    # 根据进度类型计算当前强度
-                    if label_config.progression == ProgressionType.CONSTANT:
-                        current_intensity = label_config.intensity
-                    else:  # LINEAR
-                        current_intensity = label_config.intensity * frame_progress
+        # 快速模式不逐帧记录错误，最后汇总为一条
+        failures = {kind: count for kind, count in self.stats["failure_counts"].items() if count}
+        if self.fast_path and failures:
+            self.log.error(f"逐帧失败统计: {failures}")
 
-                    # 确保值在有效范围内
-                    current_intensity = max(0.0, min(1.0, current_intensity))
-                    action_values[label_index] = current_intensity
+    def _count_failure(self, kind: str, message: str, debug: bool = False):
+        """记录逐帧失败：快速模式只计数并保留每类的第一条信息，否则同时记录详细信息"""
+        with self._failure_lock:
+            self.stats["failure_counts"][kind] += 1
+            if self.fast_path:
+                self.stats["failure_examples"].setdefault(kind, message)
+                return
+        if debug:
+            self.log.debug(message, kind=kind)
+        else:
+            self.log.error(message, kind=kind)
+
+    def _scan_written_files(self, directory: Path, ext: str) -> Dict[str, int]:
+        """扫描一次输出目录，按文件名前缀统计非空文件数"""
+        counts: Dict[str, int] = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(ext):
+                    continue
+                base_name, separator, _ = entry.name.rpartition("_frame_")
+                if separator and entry.is_file() and entry.stat().st_size > 0:
+                    counts[base_name] = counts.get(base_name, 0) + 1
+        return counts
+
+    def _verify_written_files(self, images_dir: Path, labels_dir: Path):
+        """核对写入结果：目录中缺失的文件从成功计数中扣除"""
+        image_counts = self._scan_written_files(images_dir, self.codec.extension)
+        label_counts = self._scan_written_files(labels_dir, ".txt") if self.writes_label_files else None
+
+        missing_images = 0
+        missing_labels = 0
+        with self._counts_lock:
+            for annotation_index, base_name in self._annotation_base_names.items():
+                written = self._frame_success_counts.get(annotation_index, 0)
+                found = image_counts.get(base_name, 0)
+                if found < written:
+                    missing_images += written - found
+                    self._frame_success_counts[annotation_index] = found
+                if label_counts is not None:
+                    missing_labels += max(0, written - label_counts.get(base_name, 0))
+
+        if missing_images or missing_labels:
+            self.stats["failure_counts"]["missing_after_scan"] += missing_images + missing_labels
+            self.stats["exported_images"] = max(0, self.stats["exported_images"] - missing_images)
+            self.stats["exported_labels"] = max(0, self.stats["exported_labels"] - missing_labels)
+            self.log.error(f"目录扫描发现缺失文件: 图像 {missing_images} 个, 标注 {missing_labels} 个")
+
+    def _encode_frame_job(self, job: FrameExportJob):
+        """编码线程：压缩图像"""
+        if self.cancelled or job.reuse_existing:
+            return
+        frame = job.frame
+        if self.transform and frame is not None and frame.size > 0:
+            # 在编码线程中变换，cv2.resize/cvtColor 同样会释放GIL
+            frame = self.transform.apply(frame)
+        job.encoded = self._encode_image_fixed(frame, job.frame_name)
+
+    def _write_frame_job(self, job: FrameExportJob):
+        """写入线程：保存图像和标注文件"""
+        if self.cancelled:
+            return
 
-            # 处理舌头动作的特殊逻辑
-            self._apply_tongue_action_rules(action_values, annotation, frame_progress)
+        if job.reuse_existing:
+            # 上次导出的图像和标注文件仍然有效
+            image_saved = True
+            self.stats["incremental"]["reused_frames"] += 1
+        elif self._tar_writer:
+            image_saved = job.encoded is not None and self._save_shard_sample(job)
+        else:
+            image_saved = job.encoded is not None and self._save_image_bytes(job.encoded, job.image_path, job.frame_name)
+
+        if image_saved:
+            if not job.reuse_existing:
+                self.stats["exported_images"] += 1
+            self.label_counters.add_frame(job.label_values, job.label_mask)
+            split = self._split_of.get(job.annotation_id)
+            if split:
+                self.split_counters[split].add_frame(job.label_values, job.label_mask)
+                self._split_writer.write(split, job.frame_name if self._tar_writer else
+                                         f"images/{os.path.basename(job.image_path)}")
+            if self._frame_details:
+                self._frame_details.write(os.path.basename(job.image_path), job.annotation_id,
+                                          job.frame_number, job.timestamp, job.label_values, split)
+            with self._counts_lock:
+                self._frame_success_counts[job.annotation_index] = \
+                    self._frame_success_counts.get(job.annotation_index, 0) + 1
+        else:
+            error_msg = f"保存图像失败: {job.frame_name}"
+            if job.error:
+                error_msg += f" ({job.error})"
+            self._count_failure("encode_failed" if job.encoded is None else "image_write_failed", error_msg)
+
+        if self.writes_label_files and not job.reuse_existing:
+            if self._save_multi_label_file(job.label_path, job.label_values):
+                self.stats["exported_labels"] += 1
+            else:
+                self._count_failure("label_write_failed", f"保存多标签标注文件失败: {job.frame_name}")
 
-            # 写入文件 - 每行一个浮点数
+        # labels.npy 只记录图像保存成功的帧，保证每一行都有对应图像
+        if self._label_store and image_saved:
+            self._label_store.append(
+                job.label_values, os.path.basename(job.image_path),
+                job.annotation_id, job.frame_number, job.timestamp
+            )
+            if not self.writes_label_files and not self._tar_writer and not job.reuse_existing:
+                self.stats["exported_labels"] += 1
+
+    def _save_shard_sample(self, job: FrameExportJob) -> bool:
+        """把图像和标注记录写入tar分片"""
+        try:
+            self._tar_writer.add(job.frame_name, job.encoded, self.codec.extension, job.label_values)
+            self.stats["exported_labels"] += 1
+            self.stats["bytes_written"] += len(job.encoded)
+            return True
+        except Exception as e:
+            self.log.error(f"写入tar分片失败 {job.frame_name}: {str(e)}")
+            return False
+
+    def _save_multi_label_file(self, file_path: str, action_values: np.ndarray) -> bool:
+        """保存多标签面部动作标注文件"""
+        try:
+            # 写入文件 - 每行一个浮点数，一次写入
+            content = format_label_text(action_values)
             with open(file_path, 'w', encoding='utf-8') as f:
-                for value in action_values:
-                    f.write(f"{value:.6f}\n")
+                written = f.write(content)
+
+            self.stats["bytes_written"] += written
+
+            # 快速模式信任写入结果，由导出结束后的目录扫描统一核对
+            if self.fast_path:
+                return written == len(content)
 
             # 验证文件是否创建成功
             if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
                 return True
             else:
-                self.stats["debug_info"].append(f"多标签标注文件创建失败或为空: {file_path}")
+                self.log.debug(f"多标签标注文件创建失败或为空: {file_path}")
                 return False
 
         except Exception as e:
-            error_msg = f"保存多标签面部动作标注文件失败: {str(e)}"
-            self.stats["errors"].append(error_msg)
+            self._note_write_exception(f"保存多标签面部动作标注文件失败: {str(e)}")
             return False
 
-    def _apply_tongue_action_rules(self, action_values: List[float], annotation: AnnotationMarker, frame_progress: float):
-        """应用舌头动作的特殊规则"""
+    def _encode_image_fixed(self, frame, frame_name: str) -> Optional[bytes]:
+        """按所选编码器编码图像，失败返回None"""
         try:
-            # 检查是否有舌头动作
-            has_tongue_action = False
-            has_non_tongue_out_action = False
-
-            for label_config in annotation.labels:
-                if FacialActionConfig.is_tongue_action(label_config.label):
-                    has_tongue_action = True
-                    if label_config.label != "tongueOut":
-                        has_non_tongue_out_action = True
-
-            if has_tongue_action:
-                # 规则1：如果有舌头动作，jawOpen应该为1
-                jaw_open_index = self.all_labels.index("jawOpen")
-                if action_values[jaw_open_index] < 1.0:
-                    action_values[jaw_open_index] = 1.0
-
-                # 规则2：如果有其他舌头动作（非tongueOut），tongueOut应该为1
-                if has_non_tongue_out_action:
-                    tongue_out_index = self.all_labels.index("tongueOut")
-                    if action_values[tongue_out_index] < 1.0:
-                        action_values[tongue_out_index] = 1.0
-
-        except Exception as e:
-            self.stats["debug_info"].append(f"应用舌头动作规则时出错: {e}")
-
-    def _save_image_fixed(self, frame, image_path: str, frame_name: str) -> bool:
-        """保存图像 - 支持中文路径"""
-        try:
-            if self.cancelled:
-                return False
-
             if frame is None or frame.size == 0:
-                self.stats["debug_info"].append(f"无效帧数据: {frame_name}")
-                return False
+                self.log.debug(f"无效帧数据: {frame_name}")
+                return None
 
             h, w = frame.shape[:2]
             if h <= 0 or w <= 0:
-                self.stats["debug_info"].append(f"无效图像尺寸: {w}x{h}, {frame_name}")
-                return False
+                self.log.debug(f"无效图像尺寸: {w}x{h}, {frame_name}")
+                return None
 
             if not frame.flags['C_CONTIGUOUS']:
                 frame = np.ascontiguousarray(frame)
 
-            encode_params = [
-                cv2.IMWRITE_JPEG_QUALITY, 95,
-                cv2.IMWRITE_JPEG_OPTIMIZE, 1,
-                cv2.IMWRITE_JPEG_PROGRESSIVE, 1
-            ]
+            return self.codec.encode(frame)
+
+        except Exception as e:
+            error_msg = f"编码图像异常 {frame_name}: {str(e)}"
+            self.log.error(error_msg)
+            return None
+
+    def _save_image_bytes(self, data: bytes, image_path: str, frame_name: str) -> bool:
+        """保存已编码的图像 - 支持中文路径"""
+        try:
+            # 使用Python文件接口写入，避免OpenCV中文路径问题
+            with open(image_path, 'wb') as f:
+                written = f.write(data)
+            self.stats["bytes_written"] += written
 
-            success = cv2_imwrite_chinese(image_path, frame, encode_params)
+            if self.fast_path:
+                return written == len(data)
 
-            if success and os.path.exists(image_path):
+            if os.path.exists(image_path):
                 file_size = os.path.getsize(image_path)
                 if file_size > 0:
                     return True
@@ -439,12 +1383,37 @@ class MultiLabelDatasetExporter:
                 return False
 
         except Exception as e:
-            error_msg = f"保存图像异常 {frame_name}: {str(e)}"
-            self.stats["errors"].append(error_msg)
+            self._note_write_exception(f"保存图像异常 {frame_name}: {str(e)}")
             return False
 
-    def _generate_multi_label_safe_name(self, annotation: AnnotationMarker, annotation_index: int) -> str:
-        """生成多标签安全的文件名"""
+    def _on_write_error(self, job: FrameExportJob, error: Exception):
+        """写入线程中处理一帧时抛出异常：计入失败统计，该帧不算成功写入"""
+        self._count_failure("write_exception", f"写入导出任务异常 {job.frame_name}: {error}")
+
+    def _note_write_exception(self, error_msg: str):
+        """记录写入异常（失败本身由调用方计数）"""
+        if self.fast_path:
+            with self._failure_lock:
+                self.stats["failure_examples"].setdefault("write_exception", error_msg)
+        else:
+            self.log.error(error_msg)
+
+    def _assign_base_names(self, ordered: List[Tuple[int, AnnotationMarker]]) -> Dict[int, str]:
+        """为每个标注生成文件名前缀，ID重复的标注按在项目中出现的先后编号"""
+        names = {}
+        occurrences: Dict[str, int] = {}
+        for annotation_index, annotation in sorted(ordered, key=lambda item: item[0]):
+            occurrence = occurrences.get(annotation.id, 0)
+            occurrences[annotation.id] = occurrence + 1
+            names[annotation_index] = self._generate_multi_label_safe_name(annotation, occurrence)
+        return names
+
+    def _generate_multi_label_safe_name(self, annotation: AnnotationMarker, occurrence: int = 0) -> str:
+        """生成多标签安全的文件名 - 由视频指纹和标注ID确定，重复导出时保持不变
+
+        标注的位置不参与命名，增删其他标注后复用的文件名不变；occurrence 为同一ID第几次出现，
+        用于区分ID重复的标注（如旧项目加载时同一毫秒生成的 marker_<ms>）。
+        """
         try:
             # 使用主要标签或组合标签名
             if len(annotation.labels) == 1:
@@ -457,26 +1426,108 @@ class MultiLabelDatasetExporter:
             # 确保只包含字母、数字、下划线
             clean_label = "".join(c for c in clean_label if c.isalnum() or c == '_')
 
-            # 添加时间戳和索引
-            timestamp = str(int(time.time() * 1000))
-            unique_name = f"multi_{clean_label}_{annotation_index:03d}_{timestamp}"
-
-            # 限制文件名长度
-            if len(unique_name) > 60:
-                unique_name = unique_name[:60]
+            # 内容寻址后缀：同一视频的同一标注总是得到相同的文件名
+            key = f"{self.video_hash}:{annotation.id}" + (f":{occurrence}" if occurrence else "")
+            digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
 
-            return unique_name
+            # 限制文件名长度（只截断标签部分，保留完整后缀）
+            return f"multi_{clean_label[:40]}_{digest}"
         except Exception as e:
             # 如果生成失败，使用最简单的方案
-            return f"multi_facial_{annotation_index:03d}_{int(time.time() * 1000)}"
+            return f"multi_facial_{occurrence:03d}_{int(time.time() * 1000)}"
+
+    def _write_shard_index(self):
+        """写入tar分片索引"""
+        shards = sorted(self._dataset_stats()["tar_shards"], key=lambda shard: shard["file"])
+        shard_index = {
+            "format": "webdataset",
+            "members": {"image": self.codec.extension, "labels": ".npy (45 float32)"},
+            "total_samples": sum(shard["samples"] for shard in shards),
+            "shards": shards
+        }
+        with open(self.shards_dir / SHARD_INDEX_NAME, 'w', encoding='utf-8') as f:
+            json.dump(shard_index, f, ensure_ascii=False, indent=2)
+
+    def _stats_snapshot(self) -> Dict[str, Any]:
+        """统计信息的浅拷贝（写入线程仍在更新时也可以安全序列化）"""
+        snapshot = {}
+        for key, value in dict(self.stats).items():
+            if isinstance(value, dict):
+                value = dict(value)
+            elif isinstance(value, list):
+                value = list(value)
+            snapshot[key] = value
+        return snapshot
+
+    def _dataset_stats(self) -> Dict[str, Any]:
+        """整个数据集的统计：追加导出时在已有统计上累加本次导出"""
+        stats = self._stats_snapshot()
+        if self._base_info:
+            stats = merge_counts(self._base_info.get("statistics", {}), stats)
+        stats["label_distribution"] = self._dataset_label_counters().distribution()
+        return stats
+
+    def _dataset_label_counters(self) -> LabelCounters:
+        """整个数据集的标签计数"""
+        if not self._base_info:
+            return self.label_counters
+        counters = LabelCounters.from_dict(self.all_labels, self._base_info.get("label_statistics", {}))
+        counters.merge(self.label_counters)
+        return counters
+
+    def _dataset_sessions(self) -> List[Dict[str, Any]]:
+        """数据集包含的录制会话（本次导出的会话在最后）"""
+        first_row = self._base_info.get("label_store", {}).get("rows", 0) if self._base_info else 0
+        session = {
+            "video_path": self.video_path,
+            "video_hash": self.video_hash,
+            "annotations": len(self.annotations),
+            "frames": self.label_counters.frames,
+            "label_store_rows": [first_row, first_row + self.stats["label_store_rows"]]
+            if self.writes_label_store else None,
+            "exported_at": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        return (dataset_sessions(self._base_info) if self._base_info else []) + [session]
+
+    def _split_summary(self) -> Optional[Dict[str, Any]]:
+        """子集划分汇总，不划分时为None"""
+        if not self.split_ratios:
+            return None
+        summary = split_summary(
+            self._split_of, {name: counters.frames for name, counters in self.split_counters.items()},
+            self.split_ratios, self.split_stratify, self.split_seed
+        )
+        summary["label_distribution"] = {
+            name: counters.distribution() for name, counters in self.split_counters.items()
+        }
+        base_splits = (self._base_info or {}).get("splits")
+        if base_splits:
+            for key in ("annotations", "frames", "label_distribution"):
+                summary[key] = merge_counts(base_splits.get(key, {}), summary[key])
+        return summary
+
+    def _write_running_summary(self, force: bool = False):
+        """导出过程中按时间间隔更新 dataset_info.json"""
+        if not self.writes_summary:
+            return
+        now = time.time()
+        if not force and now - self._summary_saved_at < SUMMARY_FLUSH_INTERVAL:
+            return
+        self._summary_saved_at = now
+        self._generate_multi_label_dataset_info("running")
 
-    def _generate_multi_label_dataset_info(self):
-        """生成多标签数据集信息文件"""
-        try:
-            if self.cancelled:
-                return
+    def _generate_multi_label_dataset_info(self, status: str = "completed"):
+        """生成多标签数据集信息文件（汇总信息，原子写入，导出过程中也可以读取）
 
-            info_path = Path(self.output_dir) / "dataset_info.json"
+        逐帧的详细信息在 frame_details.jsonl 中，这里只保存计数。
+        """
+        if not self.writes_summary:
+            return
+        self._summary_status = status
+        try:
+            info_path = Path(self.output_dir) / DATASET_INFO_NAME
+            stats = self._dataset_stats()
+            now = time.strftime("%Y-%m-%d %H:%M:%S")
 
             # 创建标签映射信息
             label_mapping = {}
@@ -491,8 +1542,10 @@ class MultiLabelDatasetExporter:
             dataset_info = {
                 "dataset_name": "Multi-Label Facial Action Dataset",
                 "dataset_type": "multi_label",
-                "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "created_at": self._base_info.get("created_at", now) if self._base_info else now,
+                "updated_at": now,
                 "source_video": self.video_path,
+                "sessions": self._dataset_sessions(),
                 "total_labels": len(self.all_labels),
                 "label_mapping": label_mapping,
                 "multi_label_features": {
@@ -516,279 +1569,143 @@ class MultiLabelDatasetExporter:
                     "order": self.all_labels,
                     "multi_label_support": "同一帧可以有多个动作同时激活"
                 },
-                "statistics": self.stats,
+                "output_layout": self.output_layout,
+                "video_hash": self.video_hash,
+                "sampling": {
+                    "sample_fps": self.sample_fps,
+                    "label_epsilon": self.label_epsilon,
+                    "dedup_threshold": self.dedup_threshold
+                },
+                "frame_transform": self.transform.to_dict() if self.transform else None,
+                "image_codec": self.codec.settings(),
+                "time_base": self.time_base,
+                "export_manifest": MANIFEST_NAME if self.tracks_manifest else None,
+                "tar_shard_index": f"shards/{SHARD_INDEX_NAME}" if self.output_layout == "tar" else None,
+                "label_store": {
+                    "format": self.label_format,
+                    "npy_file": "labels.npy" if self.writes_label_store else None,
+                    "index_file": "labels_index.csv" if self.writes_label_store else None,
+                    "index_columns": ["row", "image", "annotation_id", "frame_index", "timestamp"],
+                    "dtype": "float32",
+                    "rows": stats["label_store_rows"],
+                    "usage": "np.load('labels.npy', mmap_mode='r')"
+                },
+                "progress": self.get_progress_counters(),
+                "statistics": stats,
+                "label_statistics": self._dataset_label_counters().to_dict(),
+                "frame_details": FRAME_DETAILS_NAME,
+                "splits": self._split_summary(),
+                "export_log": {
+                    "file": EXPORT_LOG_NAME,
+                    "counts": self.log.counts,
+                    "recent_errors": self.log.messages(20, "error")
+                },
                 "progression_types": {
                     "linear": {
                         "description": "动作强度随时间线性增长",
                         "formula": "value = intensity * progress",
-                        "count": self.stats["progression_stats"]["linear_count"]
+                        "count": stats["progression_stats"]["linear_count"]
                     },
                     "constant": {
                         "description": "动作强度保持恒定",
                         "formula": "value = intensity",
-                        "count": self.stats["progression_stats"]["constant_count"]
+                        "count": stats["progression_stats"]["constant_count"]
                     }
                 },
                 "tongue_actions": FacialActionConfig.TONGUE_ACTIONS,
-                "export_status": "cancelled" if self.cancelled else "completed",
+                "export_status": status,
                 "debug_information": {
                     "opencv_version": cv2.__version__,
-                    "debug_messages": self.stats["debug_info"],
                     "chinese_path_fix": "使用cv2.imencode解决中文路径问题",
                     "multi_label_implementation": "支持多标签同时标注和不同进度类型"
                 }
             }
 
-            with open(info_path, 'w', encoding='utf-8') as f:
-                json.dump(dataset_info, f, ensure_ascii=False, indent=2)
+            write_json_atomic(str(info_path), dataset_info)
 
         except Exception as e:
-            error_msg = f"生成多标签数据集信息失败: {str(e)}"
-            self.stats["errors"].append(error_msg)
-            print(error_msg)
+            self.log.error(f"生成多标签数据集信息失败: {str(e)}")
+
+    def _process_events(self):
+        """处理界面事件（仅在有界面时）"""
+        if self.process_events:
+            self.process_events()
 
     def cancel_export(self):
         """取消导出"""
         self.cancelled = True
 
 
-class FixedMultiLabelProgressDialog(QDialog):
-    """修复后的多标签进度对话框 - 解决取消逻辑问题"""
-
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("导出多标签面部动作数据集")
-        self.setModal(True)
-        self.setFixedSize(600, 280)
-
-        layout = QVBoxLayout(self)
+# 分片进程日志文件、逐帧明细、子集索引和标注存储的临时目录
+_SHARD_LOG_PARTS_DIR = ".export_log_parts"
+_SHARD_DETAIL_PARTS_DIR = ".frame_detail_parts"
+_SHARD_SPLIT_PARTS_DIR = ".split_parts"
+_SHARD_LABEL_STORE_PARTS_DIR = ".label_store_parts"
 
-        # 状态标签
-        self.status_label = QLabel("准备导出多标签数据集...")
-        layout.addWidget(self.status_label)
 
-        # 进度条
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setRange(0, 100)
-        layout.addWidget(self.progress_bar)
+def _shard_frame_details_path(output_dir: str, shard_id: int) -> str:
+    """分片进程写入逐帧明细的临时文件"""
+    return os.path.join(output_dir, _SHARD_DETAIL_PARTS_DIR, f"part-{shard_id:03d}.jsonl")
 
-        # 说明文字
-        info_label = QLabel("正在导出支持多标签和不同进度类型的面部动作数据集...")
-        info_label.setStyleSheet("color: #999; font-size: 10px;")
-        layout.addWidget(info_label)
 
-        # 调试信息显示
-        self.debug_text = QTextEdit()
-        self.debug_text.setMaximumHeight(80)
-        self.debug_text.setStyleSheet("font-size: 9px; background-color: #1e1e1e; color: #ccc;")
-        layout.addWidget(self.debug_text)
+def _shard_splits_dir(output_dir: str, shard_id: int) -> str:
+    """分片进程写入子集索引的临时目录"""
+    return os.path.join(output_dir, _SHARD_SPLIT_PARTS_DIR, f"part-{shard_id:03d}")
 
-        # 取消按钮
-        button_layout = QHBoxLayout()
-        button_layout.addStretch()
 
-        self.cancel_button = QPushButton("取消")
-        self.cancel_button.clicked.connect(self.cancel_export)
-        button_layout.addWidget(self.cancel_button)
+def _shard_label_store_dir(output_dir: str, shard_id: int) -> str:
+    """分片进程写入 labels.npy 的临时目录"""
+    return os.path.join(output_dir, _SHARD_LABEL_STORE_PARTS_DIR, f"part-{shard_id:03d}")
 
-        layout.addLayout(button_layout)
 
-        # 状态标记 - 关键修复点
-        self.user_cancelled = False          # 用户主动取消
-        self.export_completed = False        # 导出完成标记
-        self.natural_close = False           # 自然关闭标记
-        self.exporter = None
+def _export_shard_worker(shard_id: int, video_path: str, shard: List[Tuple[int, AnnotationMarker]],
+                         output_dir: str, fps: float, video_fps: float, options: Dict[str, Any],
+                         reused_ids, split_of, base_names, tar_prefix, cancel_event,
+                         progress_queue) -> Dict[str, Any]:
+    """分片导出工作进程：独立打开视频，只处理分配到的标注"""
+    exporter = MultiLabelDatasetExporter(video_path, [ann for _, ann in shard], output_dir, fps, **options)
+    exporter.label_store_dir = _shard_label_store_dir(output_dir, shard_id)
+    exporter.tar_shard_prefix = f"{tar_prefix}-p{shard_id:02d}"
+    exporter.frame_details_path = _shard_frame_details_path(output_dir, shard_id)
+    exporter.writes_summary = False
+    exporter._reused_ids = dict(reused_ids)
+    exporter._split_of = dict(split_of)
+    exporter._base_names = dict(base_names)
+    exporter.splits_dir = _shard_splits_dir(output_dir, shard_id)
 
-    def set_exporter(self, exporter):
-        """设置导出器引用"""
-        self.exporter = exporter
-
-    def update_progress(self, value: int, message: str) -> bool:
-        """更新进度"""
-        if self.user_cancelled:
-            return False
+    # 分片进程的日志写入临时文件，主进程合并到 export_log.jsonl
+    exporter.log = ExportLog(source=f"shard-{shard_id}")
+    log_path = os.path.join(output_dir, _SHARD_LOG_PARTS_DIR, f"part-{shard_id:03d}.jsonl")
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    exporter.log.open(log_path)
 
-        self.progress_bar.setValue(value)
-        self.status_label.setText(message)
+    # 分片进程把进度写入各自的清单，由主进程合并
+    if exporter.tracks_manifest:
+        part_path = manifest_part_path(output_dir, shard_id)
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        exporter._manifest = ExportManifest(part_path, exporter.video_hash, exporter._export_settings())
 
-        self.debug_text.append(f"[{value}%] {message}")
-        self.debug_text.ensureCursorVisible()
+    last_report = [0.0]
 
-        # 标记导出完成
-        if value >= 100:
-            self.export_completed = True
-
-        QApplication.processEvents()
-        return not self.user_cancelled
-
-    def cancel_export(self):
-        """用户主动取消导出"""
-        self.user_cancelled = True
-        if self.exporter:
-            self.exporter.cancel_export()
-        self.cancel_button.setText("取消中...")
-        self.cancel_button.setEnabled(False)
-        self.status_label.setText("正在取消多标签导出...")
-
-    def close_naturally(self):
-        """自然关闭对话框（导出完成后）"""
-        self.natural_close = True
-        self.close()
-
-    def closeEvent(self, event):
-        """关闭事件 - 修复关键逻辑"""
-        # 如果是自然关闭（导出完成），不设置取消状态
-        if self.natural_close or self.export_completed:
-            event.accept()
-            return
+    def progress_callback(value, message):
+        # 帧循环中汇报频繁，限制跨进程队列的写入频率
+        now = time.time()
+        if now - last_report[0] >= 0.2 or value >= 95:
+            last_report[0] = now
+            counters = exporter.get_progress_counters()
+            progress_queue.put((shard_id, (value - 5) / 90, counters["frames_done"], counters["bytes_written"]))
+        return not cancel_event.is_set()
 
-        # 如果还没有标记为用户取消，且导出未完成，则认为是用户关闭窗口
-        if not self.user_cancelled and not self.export_completed:
-            self.cancel_export()
+    images_dir = Path(output_dir) / "images"
+    labels_dir = Path(output_dir) / "labels"
 
-        event.accept()
-
-    @property
-    def cancelled(self):
-        """获取取消状态 - 只有用户主动取消才返回True"""
-        return self.user_cancelled
-
-
-def export_multi_label_dataset_fixed(parent, video_path: str, annotations: List[AnnotationMarker],
-                                    video_info: VideoInfo) -> bool:
-    """修复后的多标签数据集导出入口函数"""
     try:
-        # 基本验证
-        if not annotations:
-            QMessageBox.warning(parent, "警告", "没有标注数据可导出")
-            return False
-
-        if not os.path.exists(video_path):
-            QMessageBox.warning(parent, "警告", "视频文件不存在")
-            return False
-
-        # 统计多标签信息
-        total_labels = sum(len(ann.labels) for ann in annotations)
-        multi_label_count = sum(1 for ann in annotations if len(ann.labels) > 1)
-
-        # 预估处理时间
-        total_frames = sum(int((ann.end_time - ann.start_time) * video_info.fps) for ann in annotations)
-        estimated_time = total_frames / 100
-
-        # 显示预导出信息
-        info_msg = f"""准备导出多标签面部动作数据集
-
-视频文件: {os.path.basename(video_path)}
-标注数量: {len(annotations)}
-总标签数: {total_labels}
-多标签标注: {multi_label_count}
-动作类别: {len(FacialActionConfig.ALL_LABELS)} 种面部动作
-预计图像数: {total_frames}
-标注文件格式: 每个文件45个浮点数 (对应45种面部动作)
-预计耗时: {estimated_time:.1f}秒
-
-新功能特性:
-• ✨ 支持每个标注同时包含多个标签
-• 📈 支持线性增长和恒定强度两种进度模式
-• 🎯 每个标签可独立配置强度和进度类型
-• 🔧 自动应用舌头动作相关规则
-• 🛠️ 修复中文路径兼容性问题
-
-继续导出吗？"""
-
-        reply = QMessageBox.question(
-            parent,
-            "确认导出多标签数据集",
-            info_msg,
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-        )
-
-        if reply != QMessageBox.StandardButton.Yes:
-            return False
-
-        # 选择输出目录
-        output_dir = QFileDialog.getExistingDirectory(
-            parent,
-            "选择多标签数据集输出目录",
-            "",
-            QFileDialog.Option.ShowDirsOnly
-        )
-
-        if not output_dir:
-            return False
-
-        # 创建修复后的进度对话框
-        progress_dialog = FixedMultiLabelProgressDialog(parent)
-
-        # 创建导出器
-        exporter = MultiLabelDatasetExporter(
-            video_path,
-            annotations,
-            output_dir,
-            video_info.fps
-        )
-
-        progress_dialog.set_exporter(exporter)
-        progress_dialog.show()
-
-        # 执行导出
-        def progress_callback(value, message):
-            return progress_dialog.update_progress(value, message)
-
-        success = exporter.export_dataset(progress_callback)
-
-        # 修复：区分完成关闭和用户取消
-        if progress_dialog.export_completed:
-            # 导出完成，自然关闭对话框
-            progress_dialog.close_naturally()
-        else:
-            # 未完成，正常关闭
-            progress_dialog.close()
-
-        # 修复后的判断逻辑：先检查成功，再检查取消
-        if success and not progress_dialog.cancelled:
-            # 导出成功且未被取消
-            stats = exporter.stats
-
-            result_msg = f"""多标签面部动作数据集导出完成！
-
-输出目录: {output_dir}
-图像数量: {stats['exported_images']}
-标注文件数量: {stats['exported_labels']}
-处理的标注: {stats['total_annotations']}
-单标签标注: {stats['multi_label_stats']['single_label']}
-多标签标注: {stats['multi_label_stats']['multi_label']}
-最大标签数: {stats['multi_label_stats']['max_labels_per_annotation']}
-
-进度类型统计:
-线性增长: {stats['progression_stats']['linear_count']}
-恒定强度: {stats['progression_stats']['constant_count']}
-
-✅ 已支持多标签和不同进度类型"""
-
-            if stats['errors']:
-                result_msg += f"\n\n⚠️ 遇到 {len(stats['errors'])} 个问题，详情请查看 dataset_info.json"
-
-            QMessageBox.information(parent, "导出成功", result_msg)
-            return True
-
-        elif progress_dialog.cancelled or exporter.cancelled:
-            # 用户主动取消
-            QMessageBox.information(parent, "已取消", "多标签导出已被用户取消")
-            return False
-
-        else:
-            # 导出失败（非取消原因）
-            error_details = "\n".join(exporter.stats['errors'][-5:]) if exporter.stats['errors'] else "未知错误"
-            detailed_msg = f"""多标签导出过程中出现错误:
-
-{error_details}
-
-完整日志请查看输出目录中的 dataset_info.json 文件。"""
-
-            QMessageBox.critical(parent, "导出失败", detailed_msg)
-            return False
-
+        completed = exporter._export_annotations(shard, images_dir, labels_dir, video_fps, progress_callback)
     except Exception as e:
-        QMessageBox.critical(parent, "导出错误", f"多标签导出时出现异常:\n{str(e)}")
-        return False
\ No newline at end of file
+        exporter.log.error(f"分片 {shard_id} 导出失败: {str(e)}")
+        completed = False
+    finally:
+        exporter.log.close()
+
+    return {"completed": completed, "stats": exporter.stats, "label_counters": exporter.label_counters,
+            "split_counters": exporter.split_counters, "log": exporter.log.snapshot()}
@@ -0,0 +1,129 @@
+"""
+数据集划分 - 按标注划分 train/val/test
+同一标注的所有帧属于同一个子集（相邻帧几乎相同，按帧划分会造成训练/验证泄漏）。
+划分由标注ID的哈希决定，可重复；导出时写入线程逐帧追加 splits/<子集>.txt，不需要导出后再扫描一遍。
+"""
+import hashlib
+import math
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+
+SPLIT_NAMES = ("train", "val", "test")
+SPLITS_DIR_NAME = "splits"
+DEFAULT_SPLIT_RATIOS = (0.8, 0.1, 0.1)
+
+
+def parse_split_ratios(text: str) -> Tuple[float, float, float]:
+    """解析 "train,val,test" 形式的比例（如 0.8,0.1,0.1 或 8,1,1），归一化后返回"""
+    values = [float(v) for v in text.replace(" ", "").split(",")]
+    if len(values) == 2:
+        values.append(0.0)
+    if len(values) != 3 or any(v < 0 for v in values) or sum(values) <= 0:
+        raise ValueError(f"无效的划分比例: {text}（格式 train,val,test）")
+    total = sum(values)
+    return tuple(v / total for v in values)
+
+
+def hash_fraction(key: str, seed: str = "") -> float:
+    """把字符串映射到 [0, 1) 的确定值（与进程和Python版本无关）"""
+    digest = hashlib.md5(f"{seed}:{key}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def _split_for_fraction(fraction: float, ratios: Tuple[float, float, float]) -> str:
+    """按累积比例选择子集"""
+    boundary = 0.0
+    for name, ratio in zip(SPLIT_NAMES, ratios):
+        boundary += ratio
+        if fraction < boundary:
+            return name
+    # 浮点误差落在最后，归入最后一个比例不为0的子集
+    return [name for name, ratio in zip(SPLIT_NAMES, ratios) if ratio > 0][-1]
+
+
+def assign_splits(annotations: List[Tuple[str, List[str]]], ratios: Tuple[float, float, float] = DEFAULT_SPLIT_RATIOS,
+                  stratify: bool = True, seed: str = "") -> Dict[str, str]:
+    """为标注分配子集，annotations 为 (标注ID, 标签列表)，返回 标注ID -> 子集名
+
+    不分层时每个标注只由自身ID的哈希决定，增删其他标注不会改变已有标注的子集。
+    分层时按标签组合分组，组内按哈希排序后等间隔分配（起点由组内标注ID的哈希决定），
+    每个标签组合在各子集中的比例与 ratios 一致。标注数不足以覆盖各比例的小组合并为一组再分配，
+    小项目中每个标签组合不会都落到同一个子集。
+    """
+    if not stratify:
+        return {ann_id: _split_for_fraction(hash_fraction(ann_id, seed), ratios) for ann_id, _ in annotations}
+
+    strata: Dict[str, List[str]] = {}
+    for ann_id, labels in annotations:
+        strata.setdefault("+".join(sorted(set(labels))), []).append(ann_id)
+
+    # 组内标注数至少为 1/最小比例 时，等间隔分配才能覆盖每个比例不为0的子集
+    min_size = math.ceil(1 / min(ratio for ratio in ratios if ratio > 0) - 1e-9)
+    groups = [ids for ids in strata.values() if len(ids) >= min_size]
+    small = [ann_id for ids in strata.values() if len(ids) < min_size for ann_id in ids]
+    if small:
+        groups.append(small)
+
+    assignments = {}
+    for ids in groups:
+        ids.sort(key=lambda ann_id: hash_fraction(ann_id, seed))
+        offset = hash_fraction("|".join(sorted(ids)), seed)
+        for position, ann_id in enumerate(ids):
+            assignments[ann_id] = _split_for_fraction((position + offset) / len(ids), ratios)
+    return assignments
+
+
+class SplitIndexWriter:
+    """逐帧追加子集索引文件，每行一个样本（files布局为图像相对路径，tar布局为样本键）
+
+    append 为True时接在已有的索引之后。只应在导出写入线程中调用。
+    """
+
+    def __init__(self, splits_dir: str, append: bool = False):
+        self.splits_dir = splits_dir
+        os.makedirs(splits_dir, exist_ok=True)
+        self._files = {
+            name: open(os.path.join(splits_dir, f"{name}.txt"), "a" if append else "w", encoding="utf-8")
+            for name in SPLIT_NAMES
+        }
+
+    def write(self, split: str, sample: str):
+        """追加一个样本"""
+        self._files[split].write(sample + "\n")
+
+    def close(self):
+        """关闭文件"""
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+def merge_split_indexes(part_dirs: List[str], splits_dir: str, append: bool = False):
+    """按顺序拼接分片进程写入的子集索引"""
+    os.makedirs(splits_dir, exist_ok=True)
+    for name in SPLIT_NAMES:
+        with open(os.path.join(splits_dir, f"{name}.txt"), "a" if append else "w", encoding="utf-8") as dst:
+            for part_dir in part_dirs:
+                part_path = os.path.join(part_dir, f"{name}.txt")
+                if os.path.exists(part_path):
+                    with open(part_path, "r", encoding="utf-8") as src:
+                        shutil.copyfileobj(src, dst)
+
+
+def split_summary(assignments: Dict[str, str], frames: Dict[str, int],
+                  ratios: Optional[Tuple[float, float, float]], stratify: bool, seed: str) -> Dict[str, object]:
+    """子集划分汇总（写入数据集信息）"""
+    annotations = {name: 0 for name in SPLIT_NAMES}
+    for split in assignments.values():
+        annotations[split] += 1
+    return {
+        "ratios": dict(zip(SPLIT_NAMES, ratios)) if ratios else None,
+        "stratify": stratify,
+        "seed": seed,
+        "unit": "annotation",
+        "index_dir": SPLITS_DIR_NAME,
+        "annotations": annotations,
+        "frames": dict(frames)
+    }
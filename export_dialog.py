@@ -0,0 +1,423 @@
+"""
+多标签数据集导出对话框 - 导出器的界面入口
+"""
+import os
+import time
+from typing import List
+from PyQt6.QtWidgets import (
+    QMessageBox, QFileDialog,
+    QProgressBar, QLabel, QVBoxLayout, QHBoxLayout, QDialog,
+    QPushButton, QPlainTextEdit
+)
+from PyQt6.QtCore import QThread, QEventLoop, pyqtSignal
+from models import AnnotationMarker, VideoInfo
+from styles import FacialActionConfig
+from utils import FileUtils, TimeUtils
+from dataset_exporter import MultiLabelDatasetExporter
+from export_manifest import MANIFEST_NAME, compute_video_fingerprint
+from dataset_append import load_dataset_info, dataset_sessions
+from export_log import EXPORT_LOG_NAME
+from export_estimator import probe_video, run_calibration, estimate_export, describe_video
+from frame_transform import FrameTransform, export_roi_from_sidecar
+
+
+# 日志视图只显示最近的事件，并限制刷新频率
+LOG_VIEW_LINES = 50
+LOG_VIEW_REFRESH_INTERVAL = 0.25
+
+# 后台导出线程发出进度信号的最短间隔（秒）
+PROGRESS_SIGNAL_INTERVAL = 0.2
+
+
+class DatasetExportWorker(QThread):
+    """后台导出线程 - 导出在工作线程中全速运行，进度通过限流的信号送回界面"""
+
+    progress_changed = pyqtSignal(int, str)               # 进度百分比, 消息
+    throughput_changed = pyqtSignal(float, float, int)    # 帧/秒, 预计剩余秒数, 已写入字节
+
+    def __init__(self, exporter: MultiLabelDatasetExporter):
+        super().__init__()
+        self.exporter = exporter
+        self.success = False
+
+        self._start_time = 0.0
+        self._last_emit = 0.0
+        self._last_frames = 0
+        self._frames_per_second = 0.0
+
+    def run(self):
+        """执行导出"""
+        self._start_time = self._last_emit = time.time()
+        try:
+            self.success = self.exporter.export_dataset(self._on_progress)
+        except Exception as e:
+            print(f"后台导出异常: {e}")
+            self.success = False
+
+    def _on_progress(self, value: int, message: str) -> bool:
+        """导出器进度回调（工作线程中执行）"""
+        now = time.time()
+        if value >= 95 or now - self._last_emit >= PROGRESS_SIGNAL_INTERVAL:
+            self._emit_progress(value, message, now)
+        return not self.exporter.cancelled
+
+    def _emit_progress(self, value: int, message: str, now: float):
+        """计算吞吐量并发出信号"""
+        counters = self.exporter.get_progress_counters()
+        elapsed = max(now - self._last_emit, 1e-6)
+
+        # 帧率做指数平滑，避免标注切换时数值跳动
+        current_rate = (counters["frames_done"] - self._last_frames) / elapsed
+        if self._frames_per_second == 0.0:
+            self._frames_per_second = current_rate
+        else:
+            self._frames_per_second = 0.7 * self._frames_per_second + 0.3 * current_rate
+
+        remaining = max(0, counters["frames_total"] - counters["frames_done"])
+        eta = remaining / self._frames_per_second if self._frames_per_second > 0 else -1.0
+
+        self._last_emit = now
+        self._last_frames = counters["frames_done"]
+
+        self.progress_changed.emit(value, message)
+        self.throughput_changed.emit(self._frames_per_second, eta, counters["bytes_written"])
+
+
+class FixedMultiLabelProgressDialog(QDialog):
+    """修复后的多标签进度对话框 - 解决取消逻辑问题"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("导出多标签面部动作数据集")
+        self.setModal(True)
+        self.setFixedSize(600, 280)
+
+        layout = QVBoxLayout(self)
+
+        # 状态标签
+        self.status_label = QLabel("准备导出多标签数据集...")
+        layout.addWidget(self.status_label)
+
+        # 进度条
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        layout.addWidget(self.progress_bar)
+
+        # 吞吐量：帧率、剩余时间、已写入数据量
+        self.throughput_label = QLabel("")
+        self.throughput_label.setStyleSheet("color: #999; font-size: 10px;")
+        layout.addWidget(self.throughput_label)
+
+        # 说明文字
+        info_label = QLabel("正在导出支持多标签和不同进度类型的面部动作数据集...")
+        info_label.setStyleSheet("color: #999; font-size: 10px;")
+        layout.addWidget(info_label)
+
+        # 调试信息显示（最近的导出事件）
+        self.debug_text = QPlainTextEdit()
+        self.debug_text.setReadOnly(True)
+        self.debug_text.setMaximumBlockCount(LOG_VIEW_LINES)
+        self.debug_text.setMaximumHeight(80)
+        self.debug_text.setStyleSheet("font-size: 9px; background-color: #1e1e1e; color: #ccc;")
+        layout.addWidget(self.debug_text)
+
+        # 取消按钮
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.clicked.connect(self.cancel_export)
+        button_layout.addWidget(self.cancel_button)
+
+        layout.addLayout(button_layout)
+
+        # 状态标记 - 关键修复点
+        self.user_cancelled = False          # 用户主动取消
+        self.export_completed = False        # 导出完成标记
+        self.natural_close = False           # 自然关闭标记
+        self.exporter = None
+        self._log_sequence = 0
+        self._log_refreshed_at = 0.0
+
+    def set_exporter(self, exporter):
+        """设置导出器引用"""
+        self.exporter = exporter
+
+    def update_progress(self, value: int, message: str):
+        """更新进度（后台导出线程的信号）"""
+        if self.user_cancelled:
+            return
+
+        self.progress_bar.setValue(value)
+        self.status_label.setText(message)
+
+        # 标记导出完成
+        if value >= 100:
+            self.export_completed = True
+
+        self.refresh_log_view(force=self.export_completed)
+
+    def update_throughput(self, frames_per_second: float, eta: float, bytes_written: int):
+        """更新吞吐量显示"""
+        eta_text = TimeUtils.format_time(eta) if eta >= 0 else "--:--"
+        self.throughput_label.setText(
+            f"{frames_per_second:.0f} 帧/秒 · 剩余 {eta_text} · 已写入 {FileUtils.format_size(bytes_written)}"
+        )
+
+    def refresh_log_view(self, force: bool = False):
+        """显示导出器日志中最近的事件，按时间间隔限流，没有新事件时不刷新"""
+        if not self.exporter:
+            return
+        now = time.time()
+        if not force and now - self._log_refreshed_at < LOG_VIEW_REFRESH_INTERVAL:
+            return
+        self._log_refreshed_at = now
+
+        log = self.exporter.log
+        if log.sequence == self._log_sequence:
+            return
+        self._log_sequence = log.sequence
+
+        self.debug_text.setPlainText("\n".join(log.format_event(e) for e in log.recent(LOG_VIEW_LINES)))
+        self.debug_text.verticalScrollBar().setValue(self.debug_text.verticalScrollBar().maximum())
+
+    def cancel_export(self):
+        """用户主动取消导出"""
+        self.user_cancelled = True
+        if self.exporter:
+            self.exporter.cancel_export()
+        self.cancel_button.setText("取消中...")
+        self.cancel_button.setEnabled(False)
+        self.status_label.setText("正在取消多标签导出...")
+
+    def close_naturally(self):
+        """自然关闭对话框（导出完成后）"""
+        self.natural_close = True
+        self.close()
+
+    def closeEvent(self, event):
+        """关闭事件 - 修复关键逻辑"""
+        # 如果是自然关闭（导出完成），不设置取消状态
+        if self.natural_close or self.export_completed:
+            event.accept()
+            return
+
+        # 如果还没有标记为用户取消，且导出未完成，则认为是用户关闭窗口
+        if not self.user_cancelled and not self.export_completed:
+            self.cancel_export()
+
+        event.accept()
+
+    @property
+    def cancelled(self):
+        """获取取消状态 - 只有用户主动取消才返回True"""
+        return self.user_cancelled
+
+
+def export_multi_label_dataset_fixed(parent, video_path: str, annotations: List[AnnotationMarker],
+                                    video_info: VideoInfo) -> bool:
+    """修复后的多标签数据集导出入口函数"""
+    try:
+        # 基本验证
+        if not annotations:
+            QMessageBox.warning(parent, "警告", "没有标注数据可导出")
+            return False
+
+        if not os.path.exists(video_path):
+            QMessageBox.warning(parent, "警告", "视频文件不存在")
+            return False
+
+        # 统计多标签信息
+        total_labels = sum(len(ann.labels) for ann in annotations)
+        multi_label_count = sum(1 for ann in annotations if len(ann.labels) > 1)
+
+        # 录制时保存了ROI但没有裁剪的视频，可以只导出ROI区域
+        transform = None
+        export_roi = export_roi_from_sidecar(video_path)
+        if export_roi is not None:
+            x, y, w, h = export_roi
+            reply = QMessageBox.question(
+                parent,
+                "使用录制ROI",
+                f"检测到录制时选择的ROI区域: {w}×{h} (x:{x}, y:{y})\n\n"
+                "是否只导出ROI区域内的图像？",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply == QMessageBox.StandardButton.Yes:
+                transform = FrameTransform(roi=export_roi)
+
+        # 探测真实帧率并做一次短校准，预估处理时间和磁盘占用
+        try:
+            probe = probe_video(video_path)
+            estimate = estimate_export(annotations, probe, run_calibration(video_path, transform=transform))
+            total_frames = estimate["frames"]
+            estimate_text = (f"视频参数: {describe_video(probe)}\n"
+                             f"预计耗时: {estimate['wall_seconds']:.1f}秒\n"
+                             f"预计占用空间: {FileUtils.format_size(estimate['disk_bytes'])}")
+        except Exception as e:
+            print(f"导出预估失败: {e}")
+            total_frames = sum(int((ann.end_time - ann.start_time) * video_info.fps) for ann in annotations)
+            estimate_text = "预计耗时: 未知"
+
+        # 显示预导出信息
+        info_msg = f"""准备导出多标签面部动作数据集
+
+视频文件: {os.path.basename(video_path)}
+标注数量: {len(annotations)}
+总标签数: {total_labels}
+多标签标注: {multi_label_count}
+动作类别: {len(FacialActionConfig.ALL_LABELS)} 种面部动作
+预计图像数: {total_frames}
+标注文件格式: 每个文件45个浮点数 (对应45种面部动作)
+{estimate_text}
+
+新功能特性:
+• ✨ 支持每个标注同时包含多个标签
+• 📈 支持线性增长和恒定强度两种进度模式
+• 🎯 每个标签可独立配置强度和进度类型
+• 🔧 自动应用舌头动作相关规则
+• 🛠️ 修复中文路径兼容性问题
+
+继续导出吗？"""
+
+        reply = QMessageBox.question(
+            parent,
+            "确认导出多标签数据集",
+            info_msg,
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+
+        if reply != QMessageBox.StandardButton.Yes:
+            return False
+
+        # 选择输出目录
+        output_dir = QFileDialog.getExistingDirectory(
+            parent,
+            "选择多标签数据集输出目录",
+            "",
+            QFileDialog.Option.ShowDirsOnly
+        )
+
+        if not output_dir:
+            return False
+
+        # 目录中已有其他视频导出的数据集时，可以把当前视频追加进去
+        append = False
+        video_hash = ""
+        existing = load_dataset_info(output_dir)
+        if existing is not None and existing.get("export_status") == "completed":
+            video_hash = compute_video_fingerprint(video_path)
+            sessions = dataset_sessions(existing)
+            if all(session.get("video_hash") != video_hash for session in sessions):
+                reply = QMessageBox.question(
+                    parent,
+                    "追加到数据集",
+                    f"该目录中已有包含 {len(sessions)} 个录制会话的数据集。\n\n"
+                    "选择\"是\"把当前视频的标注追加到该数据集，\n"
+                    "选择\"否\"覆盖导出。",
+                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+                )
+                append = reply == QMessageBox.StandardButton.Yes
+
+        # 目录中已有导出清单时，可以只导出缺失或修改过的标注
+        incremental = False
+        if not append and os.path.exists(os.path.join(output_dir, MANIFEST_NAME)):
+            reply = QMessageBox.question(
+                parent,
+                "增量导出",
+                "该目录中已有导出的数据集。\n\n"
+                "选择\"是\"只导出缺失或修改过的标注，\n"
+                "选择\"否\"重新导出全部标注。",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            incremental = reply == QMessageBox.StandardButton.Yes
+
+        # 创建修复后的进度对话框
+        progress_dialog = FixedMultiLabelProgressDialog(parent)
+
+        # 创建导出器
+        exporter = MultiLabelDatasetExporter(
+            video_path,
+            annotations,
+            output_dir,
+            video_info.fps,
+            incremental=incremental,
+            video_hash=video_hash,
+            transform=transform,
+            append=append
+        )
+
+        progress_dialog.set_exporter(exporter)
+        progress_dialog.show()
+
+        # 在后台线程执行导出，界面线程只处理信号；等待期间运行局部事件循环
+        worker = DatasetExportWorker(exporter)
+        worker.progress_changed.connect(progress_dialog.update_progress)
+        worker.throughput_changed.connect(progress_dialog.update_throughput)
+
+        loop = QEventLoop()
+        worker.finished.connect(loop.quit)
+        worker.start()
+        loop.exec()
+        worker.wait()
+
+        success = worker.success
+
+        # 修复：区分完成关闭和用户取消
+        if progress_dialog.export_completed:
+            # 导出完成，自然关闭对话框
+            progress_dialog.close_naturally()
+        else:
+            # 未完成，正常关闭
+            progress_dialog.close()
+
+        # 修复后的判断逻辑：先检查成功，再检查取消
+        if success and not progress_dialog.cancelled:
+            # 导出成功且未被取消
+            stats = exporter.stats
+
+            result_msg = f"""多标签面部动作数据集导出完成！
+
+输出目录: {output_dir}
+图像数量: {stats['exported_images']}
+标注文件数量: {stats['exported_labels']}
+处理的标注: {stats['total_annotations']}
+复用的标注: {stats['incremental']['reused_annotations']} (增量导出)
+单标签标注: {stats['multi_label_stats']['single_label']}
+多标签标注: {stats['multi_label_stats']['multi_label']}
+最大标签数: {stats['multi_label_stats']['max_labels_per_annotation']}
+
+进度类型统计:
+线性增长: {stats['progression_stats']['linear_count']}
+恒定强度: {stats['progression_stats']['constant_count']}
+
+✅ 已支持多标签和不同进度类型"""
+
+            error_count = exporter.log.counts["error"]
+            if error_count:
+                result_msg += f"\n\n⚠️ 遇到 {error_count} 个问题，详情请查看 {EXPORT_LOG_NAME}"
+
+            QMessageBox.information(parent, "导出成功", result_msg)
+            return True
+
+        elif progress_dialog.cancelled or exporter.cancelled:
+            # 用户主动取消
+            QMessageBox.information(parent, "已取消", "多标签导出已被用户取消")
+            return False
+
+        else:
+            # 导出失败（非取消原因）
+            recent_errors = exporter.log.messages(5, "error")
+            error_details = "\n".join(recent_errors) if recent_errors else "未知错误"
+            detailed_msg = f"""多标签导出过程中出现错误:
+
+{error_details}
+
+完整日志请查看输出目录中的 {EXPORT_LOG_NAME} 文件。"""
+
+            QMessageBox.critical(parent, "导出失败", detailed_msg)
+            return False
+
+    except Exception as e:
+        QMessageBox.critical(parent, "导出错误", f"多标签导出时出现异常:\n{str(e)}")
+        return False
\ No newline at end of file
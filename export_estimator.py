@@ -0,0 +1,300 @@
+"""
+导出耗时/空间预估
+探测视频的真实帧率、分辨率和编码格式，对一小段帧做解码+编码校准，
+据此预测不同输出格式和进程数下的导出耗时与磁盘占用；
+也可以用同一组帧比较各图像编码器的速度和输出大小。
+"""
+import os
+import tempfile
+import time
+from typing import List, Dict, Any, Optional, Tuple
+import cv2
+import numpy as np
+from models import AnnotationMarker
+from dataset_exporter import DEFAULT_SEEK_COST_FRAMES, annotation_frame_range, plan_frame_runs
+from export_pipeline import DEFAULT_ENCODER_WORKERS
+from frame_transform import FrameTransform
+from image_codec import ImageCodec, create_codec, DEFAULT_IMAGE_CODEC, BENCHMARK_CODECS
+from label_generator import NUM_LABELS, format_label_text
+from shard_writer import encode_label_record, tar_member_size
+
+
+DEFAULT_CALIBRATION_FRAMES = 60    # 校准时顺序解码的帧数
+CALIBRATION_ENCODE_SAMPLES = 8     # 其中参与编码测试的帧数（避免缓存大量原始帧）
+DEFAULT_BLOCK_SIZE = 4096
+
+# 分片进程启动和合并结果的固定开销（秒）
+SHARD_STARTUP_SECONDS = 0.5
+
+# 预估的输出组合：(输出布局, 标注格式)
+OUTPUT_VARIANTS = [("files", "txt"), ("files", "npy"), ("files", "both"), ("tar", "npy")]
+
+# 标注文本和 labels.npy 每行的大小
+LABEL_TEXT_BYTES = len(format_label_text(np.zeros(NUM_LABELS)).encode("utf-8"))
+LABEL_NPY_ROW_BYTES = NUM_LABELS * 4
+LABEL_RECORD_BYTES = len(encode_label_record(np.zeros(NUM_LABELS)))
+LABEL_INDEX_ROW_BYTES = 80          # labels_index.csv 每行的大致长度
+
+
+def probe_video(video_path: str) -> Dict[str, Any]:
+    """读取视频的真实帧率、分辨率、帧数和编码格式"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"无法打开视频文件: {video_path}")
+
+    try:
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        codec = "".join(chr((fourcc >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ") or "unknown"
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return {
+            "fps": fps,
+            "frame_count": frame_count,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "codec": codec,
+            "duration": frame_count / fps if fps > 0 else 0.0,
+            "file_size": os.path.getsize(video_path)
+        }
+    finally:
+        cap.release()
+
+
+def _read_calibration_samples(video_path: str, sample_frames: int) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+    """在视频中段定位后顺序解码，返回用于编码测试的少量帧和定位/解码耗时"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise Exception(f"无法打开视频文件: {video_path}")
+
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        start = max(0, frame_count // 2 - sample_frames // 2)
+
+        # 定位耗时（包含回到关键帧后解码出第一帧）
+        t0 = time.perf_counter()
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        ret, frame = cap.read()
+        seek_seconds = time.perf_counter() - t0
+        if not ret or frame is None:
+            raise Exception("校准失败: 无法读取视频帧")
+
+        # 顺序解码耗时，均匀保留少量帧用于编码测试
+        keep_every = max(1, sample_frames // CALIBRATION_ENCODE_SAMPLES)
+        samples = [frame]
+        decoded = 0
+        t0 = time.perf_counter()
+        for i in range(1, sample_frames):
+            ret, frame = cap.read()
+            if not ret or frame is None:
+                break
+            decoded += 1
+            if i % keep_every == 0 and len(samples) < CALIBRATION_ENCODE_SAMPLES:
+                samples.append(frame)
+        decode_seconds = (time.perf_counter() - t0) / decoded if decoded else seek_seconds
+    finally:
+        cap.release()
+
+    return samples, {
+        "sample_frames": decoded + 1,
+        "seek_seconds": seek_seconds,
+        "decode_seconds_per_frame": decode_seconds
+    }
+
+
+def _encode_samples(samples: List[np.ndarray], codec: ImageCodec,
+                    transform: FrameTransform = None) -> Tuple[List[bytes], float]:
+    """编码测试帧，返回编码结果和单帧耗时（帧变换耗时计入编码耗时）"""
+    encoded = []
+    t0 = time.perf_counter()
+    for frame in samples:
+        if transform is not None:
+            frame = transform.apply(frame)
+        data = codec.encode(frame)
+        if data is not None:
+            encoded.append(data)
+    return encoded, (time.perf_counter() - t0) / max(1, len(samples))
+
+
+def run_calibration(video_path: str, sample_frames: int = DEFAULT_CALIBRATION_FRAMES,
+                    output_dir: str = None, transform: FrameTransform = None,
+                    codec: ImageCodec = None) -> Dict[str, Any]:
+    """在视频中段做一次定位、顺序解码和图像编码，测量单帧耗时
+
+    给出 output_dir 时还会在该目录下写入临时文件，测量逐文件写入的耗时；
+    给出 transform 时编码前先做帧变换，变换耗时计入编码耗时。
+    """
+    samples, calibration = _read_calibration_samples(video_path, sample_frames)
+
+    # 编码耗时和压缩后大小
+    codec = codec or create_codec(DEFAULT_IMAGE_CODEC)
+    encoded, encode_seconds = _encode_samples(samples, codec, transform)
+    if not encoded:
+        raise Exception("校准失败: 图像编码失败")
+
+    calibration.update({
+        "encode_seconds_per_frame": encode_seconds,
+        "image_bytes_per_frame": sum(len(data) for data in encoded) / len(encoded),
+        "write_seconds_per_file": None,
+        "block_size": DEFAULT_BLOCK_SIZE,
+        "cpu_count": os.cpu_count() or 1
+    })
+
+    if output_dir and os.path.isdir(output_dir):
+        calibration.update(_measure_writes(output_dir, encoded, codec.extension))
+    return calibration
+
+
+def benchmark_codecs(video_path: str, specs: List[str] = None, sample_frames: int = DEFAULT_CALIBRATION_FRAMES,
+                     transform: FrameTransform = None, rounds: int = 3) -> List[Dict[str, Any]]:
+    """用同一组视频帧比较各编码器的单帧编码耗时和输出大小
+
+    每个编码器重复编码 rounds 轮取最快一轮，减少首次调用和系统抖动的影响。
+    """
+    samples, _ = _read_calibration_samples(video_path, sample_frames)
+    if transform is not None:
+        samples = [transform.apply(frame) for frame in samples]
+
+    rows = []
+    for spec in specs or BENCHMARK_CODECS:
+        codec = create_codec(spec)
+        timings = []
+        encoded = []
+        for _ in range(max(1, rounds)):
+            encoded, seconds = _encode_samples(samples, codec)
+            timings.append(seconds)
+        rows.append({
+            "codec": codec.spec,
+            "extension": codec.extension,
+            "encode_ms_per_frame": min(timings) * 1000,
+            "bytes_per_frame": sum(len(data) for data in encoded) / len(encoded) if encoded else 0.0,
+            "frames": len(samples),
+            "failed": len(samples) - len(encoded)
+        })
+    return rows
+
+
+def _measure_writes(output_dir: str, encoded: List[bytes], image_ext: str = ".jpg") -> Dict[str, Any]:
+    """在输出目录中写入临时文件，测量逐文件写入耗时和文件系统块大小"""
+    result = {}
+    try:
+        result["block_size"] = os.statvfs(output_dir).f_bsize or DEFAULT_BLOCK_SIZE
+    except (AttributeError, OSError):
+        pass
+
+    label_text = format_label_text(np.zeros(NUM_LABELS))
+    with tempfile.TemporaryDirectory(prefix=".calibration_", dir=output_dir) as temp_dir:
+        t0 = time.perf_counter()
+        for i, data in enumerate(encoded):
+            with open(os.path.join(temp_dir, f"{i}{image_ext}"), "wb") as f:
+                f.write(data)
+            with open(os.path.join(temp_dir, f"{i}.txt"), "w", encoding="utf-8") as f:
+                f.write(label_text)
+        result["write_seconds_per_file"] = (time.perf_counter() - t0) / (2 * len(encoded))
+    return result
+
+
+def _allocated(size: float, block_size: int) -> float:
+    """文件按块分配后实际占用的空间"""
+    return -(-size // block_size) * block_size
+
+
+def count_export_frames(annotations: List[AnnotationMarker], fps: float,
+                        seek_cost_frames: int = DEFAULT_SEEK_COST_FRAMES,
+                        frame_times: Optional[np.ndarray] = None) -> Tuple[int, int, int]:
+    """按导出器的规则计算要导出的帧数、解码计划中的定位次数和需要解码的帧数
+
+    重叠标注共享的帧由帧缓存复用，需要解码的帧数按合并后的连续段计算。
+    frame_times 为逐帧到达时间时按 arrival 时间基准计算帧范围。
+    """
+    ranges = [annotation_frame_range(annotation, fps, frame_times) for annotation in annotations]
+    frames = sum(max(0, end - start + 1) for start, end in ranges)
+    runs = plan_frame_runs(ranges, seek_cost_frames)
+    return frames, len(runs), sum(end - start + 1 for start, end in runs)
+
+
+def estimate_export(annotations: List[AnnotationMarker], probe: Dict[str, Any], calibration: Dict[str, Any],
+                    label_format: str = "txt", output_layout: str = "files",
+                    encoder_workers: int = DEFAULT_ENCODER_WORKERS, shard_workers: int = 1,
+                    frame_times: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """预测一种导出配置的耗时和磁盘占用
+
+    解码在各分片进程中并行，编码由编码线程并行，写入是顺序的；
+    墙钟时间取三者中最慢的一段，并且不能少于全部CPU工作量除以核心数。
+    """
+    frames, seeks, decoded_frames = count_export_frames(annotations, probe["fps"], frame_times=frame_times)
+    shard_workers = max(1, min(shard_workers, len(annotations)))
+    encoder_workers = max(1, encoder_workers)
+    cpu_count = calibration["cpu_count"]
+
+    decode_cpu = decoded_frames * calibration["decode_seconds_per_frame"] + seeks * calibration["seek_seconds"]
+    encode_cpu = frames * calibration["encode_seconds_per_frame"]
+
+    # 磁盘占用
+    image_bytes = calibration["image_bytes_per_frame"]
+    block_size = calibration["block_size"]
+    payload = 0.0
+    on_disk = 0.0
+    files_per_frame = 0
+    if output_layout == "tar":
+        payload = frames * (tar_member_size(int(image_bytes)) + tar_member_size(LABEL_RECORD_BYTES))
+        on_disk = payload
+    else:
+        payload += frames * image_bytes
+        on_disk += frames * _allocated(image_bytes, block_size)
+        files_per_frame += 1
+        if label_format in ("txt", "both"):
+            payload += frames * LABEL_TEXT_BYTES
+            on_disk += frames * _allocated(LABEL_TEXT_BYTES, block_size)
+            files_per_frame += 1
+    if label_format in ("npy", "both"):
+        store_bytes = frames * (LABEL_NPY_ROW_BYTES + LABEL_INDEX_ROW_BYTES)
+        payload += store_bytes
+        on_disk += store_bytes
+
+    write_seconds = 0.0
+    if calibration["write_seconds_per_file"] is not None and output_layout == "files":
+        write_seconds = frames * files_per_frame * calibration["write_seconds_per_file"]
+
+    decode_wall = decode_cpu / shard_workers
+    encode_wall = encode_cpu / min(encoder_workers, cpu_count)
+    wall = max(decode_wall, encode_wall, write_seconds, (decode_cpu + encode_cpu) / cpu_count)
+    if shard_workers > 1:
+        wall += SHARD_STARTUP_SECONDS
+
+    return {
+        "output_layout": output_layout,
+        "label_format": label_format,
+        "shard_workers": shard_workers,
+        "encoder_workers": encoder_workers,
+        "frames": frames,
+        "seeks": seeks,
+        "decode_seconds": decode_wall,
+        "encode_seconds": encode_wall,
+        "write_seconds": write_seconds,
+        "wall_seconds": wall,
+        "payload_bytes": int(payload),
+        "disk_bytes": int(on_disk)
+    }
+
+
+def estimate_table(annotations: List[AnnotationMarker], probe: Dict[str, Any], calibration: Dict[str, Any],
+                   shard_counts: List[int] = None, variants: List[Tuple[str, str]] = None,
+                   frame_times: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """按输出格式和分片进程数列出所有组合的预估结果"""
+    cpu_count = calibration["cpu_count"]
+    if not shard_counts:
+        shard_counts = sorted({1, 2, max(1, cpu_count // 2), cpu_count})
+    rows = []
+    for output_layout, label_format in variants or OUTPUT_VARIANTS:
+        for shard_workers in shard_counts:
+            rows.append(estimate_export(
+                annotations, probe, calibration, label_format, output_layout,
+                encoder_workers=max(1, cpu_count - shard_workers), shard_workers=shard_workers,
+                frame_times=frame_times
+            ))
+    return rows
+
+
+def describe_video(probe: Dict[str, Any]) -> str:
+    """视频信息的单行描述"""
+    return f"{probe['width']}x{probe['height']} {probe['codec']} {probe['fps']:.2f}fps, {probe['frame_count']}帧"
@@ -0,0 +1,112 @@
+"""
+导出事件日志 - 有界内存 + 流式文件
+内存中只保留最近的事件（环形缓冲）和各级别计数，完整记录逐行写入 export_log.jsonl，
+长时间导出时内存占用和界面刷新开销都不会随事件数量增长。
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+
+EXPORT_LOG_NAME = "export_log.jsonl"
+LOG_LEVELS = ("debug", "info", "warning", "error")
+DEFAULT_LOG_CAPACITY = 500
+
+
+class ExportLog:
+    """结构化导出日志
+
+    可以在解码、编码、写入线程中同时调用。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_LOG_CAPACITY, source: str = ""):
+        self.events = deque(maxlen=capacity)
+        self.counts = {level: 0 for level in LOG_LEVELS}
+        self.source = source       # 事件来源（分片进程），写入每条事件
+        self.sequence = 0          # 已记录的事件总数，界面据此判断是否有新事件
+        self.path: Optional[str] = None
+
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self, path: str, append: bool = False):
+        """开始写入日志文件，打开前缓冲的事件一并写入；append 为True时接在已有日志之后"""
+        with self._lock:
+            self._file = open(path, "a" if append else "w", encoding="utf-8")
+            self.path = path
+            for event in self.events:
+                self._write(event)
+
+    def close(self):
+        """关闭日志文件"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def log(self, level: str, message: str, **fields):
+        """记录一条事件，fields 为附加的结构化字段"""
+        with self._lock:
+            self.sequence += 1
+            event = {"seq": self.sequence, "time": round(time.time(), 3), "level": level, "message": message}
+            if self.source:
+                event["source"] = self.source
+            event.update(fields)
+
+            self.events.append(event)
+            self.counts[level] += 1
+            if self._file is not None:
+                self._write(event)
+
+    def debug(self, message: str, **fields):
+        self.log("debug", message, **fields)
+
+    def info(self, message: str, **fields):
+        self.log("info", message, **fields)
+
+    def warning(self, message: str, **fields):
+        self.log("warning", message, **fields)
+
+    def error(self, message: str, **fields):
+        self.log("error", message, **fields)
+
+    def recent(self, limit: int = 0, level: str = None) -> List[Dict[str, Any]]:
+        """最近的事件，可按级别过滤"""
+        with self._lock:
+            events = [e for e in self.events if level is None or e["level"] == level]
+        return events[-limit:] if limit else events
+
+    def messages(self, limit: int = 0, level: str = None) -> List[str]:
+        """最近事件的文本"""
+        return [event["message"] for event in self.recent(limit, level)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """可序列化的日志摘要（分片进程返回给主进程）"""
+        with self._lock:
+            return {"counts": dict(self.counts), "events": list(self.events), "path": self.path}
+
+    def absorb(self, snapshot: Dict[str, Any]):
+        """合并分片进程的日志：计数累加，缓冲区事件并入，日志文件追加到当前文件"""
+        with self._lock:
+            for level, count in snapshot["counts"].items():
+                self.counts[level] += count
+            self.events.extend(snapshot["events"])
+            self.sequence += len(snapshot["events"])
+
+            part_path = snapshot.get("path")
+            if self._file is not None and part_path and os.path.exists(part_path):
+                self._file.flush()
+                with open(part_path, "r", encoding="utf-8") as src:
+                    shutil.copyfileobj(src, self._file)
+
+    def format_event(self, event: Dict[str, Any]) -> str:
+        """单条事件的显示文本"""
+        clock = time.strftime("%H:%M:%S", time.localtime(event["time"]))
+        return f"{clock} [{event['level']}] {event['message']}"
+
+    def _write(self, event: Dict[str, Any]):
+        self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
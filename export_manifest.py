@@ -0,0 +1,173 @@
+"""
+导出清单 - 支持增量/断点续传导出
+记录每个标注的内容签名和已写入的帧数。再次导出到同一目录时，
+签名一致且帧已全部写入的标注直接跳过，只导出缺失或修改过的标注。
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Any, Optional, List
+from models import AnnotationMarker
+
+
+MANIFEST_NAME = "export_manifest.json"
+MANIFEST_PARTS_DIR = ".manifest_parts"
+MANIFEST_VERSION = 1
+
+# 视频指纹只读取首尾各4MB，长视频也能快速计算
+_FINGERPRINT_SAMPLE_BYTES = 4 * 1024 * 1024
+
+
+def compute_video_fingerprint(video_path: str) -> str:
+    """计算视频文件指纹（文件大小 + 首尾数据块的SHA1）"""
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha1(str(size).encode("utf-8"))
+
+    with open(video_path, "rb") as f:
+        digest.update(f.read(_FINGERPRINT_SAMPLE_BYTES))
+        if size > _FINGERPRINT_SAMPLE_BYTES:
+            f.seek(max(_FINGERPRINT_SAMPLE_BYTES, size - _FINGERPRINT_SAMPLE_BYTES))
+            digest.update(f.read(_FINGERPRINT_SAMPLE_BYTES))
+
+    return digest.hexdigest()[:16]
+
+
+def annotation_signature(annotation: AnnotationMarker, video_fps: float, settings: Dict[str, Any]) -> str:
+    """标注内容签名：时间范围、标签配置、帧率和导出设置任一变化都会改变签名"""
+    payload = {
+        "start_time": annotation.start_time,
+        "end_time": annotation.end_time,
+        "labels": [
+            [lc.label, round(lc.intensity, 6), lc.progression.value]
+            for lc in annotation.labels
+        ],
+        "fps": round(video_fps, 6),
+        "settings": settings
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def write_json_atomic(path: str, data: Dict[str, Any]):
+    """先写临时文件再替换，保证中途崩溃时JSON文件完整（清单、数据集信息、任务队列共用）"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_json(path: str) -> Optional[Dict[str, Any]]:
+    """读取JSON文件，损坏或不存在时返回None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ExportManifest:
+    """导出清单"""
+
+    def __init__(self, path: str, video_hash: str, settings: Dict[str, Any]):
+        self.path = path
+        self.video_hash = video_hash
+        self.settings = settings
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+        # 从磁盘加载的清单所属的视频和导出设置
+        self.loaded_video_hash = None
+        self.loaded_settings = None
+
+    @classmethod
+    def load(cls, output_dir: str, video_hash: str, settings: Dict[str, Any]) -> "ExportManifest":
+        """加载输出目录中的清单，合并上次中断时残留的分片清单"""
+        manifest = cls(os.path.join(output_dir, MANIFEST_NAME), video_hash, settings)
+
+        for data in [read_json(manifest.path)] + _read_parts(output_dir):
+            if data and data.get("version") == MANIFEST_VERSION:
+                manifest.entries.update(data.get("annotations", {}))
+                # 记录来源信息，用于判断是否与本次导出兼容
+                manifest.loaded_video_hash = data.get("video_hash")
+                manifest.loaded_settings = data.get("settings")
+
+        return manifest
+
+    def is_compatible(self) -> bool:
+        """已加载的清单是否属于同一视频和同一导出设置"""
+        return self.loaded_video_hash == self.video_hash and self.loaded_settings == self.settings
+
+    def is_complete(self, annotation_id: str, signature: str) -> bool:
+        """标注是否已完整导出且内容未变化"""
+        entry = self.entries.get(annotation_id)
+        return bool(entry and entry["signature"] == signature and
+                    entry["frames_total"] > 0 and entry["frames_written"] >= entry["frames_total"])
+
+    def record(self, annotation_id: str, signature: str, base_name: str,
+               frames_total: int, frames_written: int, frame_indices: List[int] = None,
+               image_ext: str = ".jpg"):
+        """记录标注的导出进度，采样导出时同时记录导出的帧序号"""
+        entry = {
+            "signature": signature,
+            "base_name": base_name,
+            "frames_total": frames_total,
+            "frames_written": frames_written,
+            "image_ext": image_ext
+        }
+        if frame_indices is not None:
+            entry["frame_indices"] = frame_indices
+        self.entries[annotation_id] = entry
+
+    def remove(self, annotation_id: str) -> Optional[Dict[str, Any]]:
+        """移除标注记录，返回旧记录"""
+        return self.entries.pop(annotation_id, None)
+
+    def merge_parts(self, output_dir: str):
+        """合并分片进程写入的清单，保存后删除临时目录"""
+        for data in _read_parts(output_dir):
+            if data.get("video_hash") == self.video_hash:
+                self.entries.update(data.get("annotations", {}))
+        self.save()
+        remove_manifest_parts(output_dir)
+
+    def save(self, path: str = None):
+        """原子写入清单"""
+        write_json_atomic(path or self.path, {
+            "version": MANIFEST_VERSION,
+            "video_hash": self.video_hash,
+            "settings": self.settings,
+            "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "annotations": self.entries
+        })
+
+
+def _read_parts(output_dir: str) -> List[Dict[str, Any]]:
+    """读取分片清单"""
+    parts_dir = os.path.join(output_dir, MANIFEST_PARTS_DIR)
+    if not os.path.isdir(parts_dir):
+        return []
+    parts = [read_json(os.path.join(parts_dir, name))
+             for name in sorted(os.listdir(parts_dir)) if name.endswith(".json")]
+    return [data for data in parts if data]
+
+
+def remove_manifest_parts(output_dir: str):
+    """删除分片清单临时目录"""
+    shutil.rmtree(os.path.join(output_dir, MANIFEST_PARTS_DIR), ignore_errors=True)
+
+
+def manifest_part_path(output_dir: str, shard_id: int) -> str:
+    """分片进程写入的清单路径"""
+    return os.path.join(output_dir, MANIFEST_PARTS_DIR, f"part-{shard_id:03d}.json")
+
+
+def entry_file_paths(entry: Dict[str, Any], output_dir: str) -> List[str]:
+    """清单记录对应的图像和标注文件路径"""
+    paths = []
+    image_ext = entry.get("image_ext", ".jpg")   # 早期清单没有记录扩展名，均为JPEG
+    frame_indices = entry.get("frame_indices")
+    for frame_idx in (frame_indices if frame_indices is not None else range(entry["frames_total"])):
+        frame_name = f"{entry['base_name']}_frame_{frame_idx:04d}"
+        paths.append(os.path.join(output_dir, "images", f"{frame_name}{image_ext}"))
+        paths.append(os.path.join(output_dir, "labels", f"{frame_name}.txt"))
+    return paths
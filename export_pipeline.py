@@ -0,0 +1,155 @@
+"""
+数据集导出流水线 - 解码 / 编码 / 写入分离
+解码线程把帧放入有界队列，多个编码线程并行编码（cv2.imencode 会释放GIL），
+单个写入线程顺序落盘。队列有界，解码快于编码时自动阻塞，内存占用可控。
+"""
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable, Optional, Any
+import numpy as np
+
+
+# 默认编码线程数：保留一个核心给解码线程
+DEFAULT_ENCODER_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+
+# 队列结束标记
+_SENTINEL = object()
+
+
+@dataclass
+class FrameExportJob:
+    """单帧导出任务"""
+    frame: Optional[np.ndarray]
+    frame_name: str
+    image_path: str
+    label_path: str
+    label_values: Optional[np.ndarray] = None   # 45维动作数值
+    label_mask: Optional[np.ndarray] = None     # 标注配置的标签掩码（标签统计用）
+    annotation_index: int = 0
+    annotation_id: str = ""
+    frame_number: int = 0                # 视频中的绝对帧号
+    timestamp: float = 0.0               # 帧在视频中的时间（秒）
+    encoded: Optional[bytes] = None      # 编码线程填充
+    error: str = ""                      # 编码失败原因
+    reuse_existing: bool = False         # 增量导出：文件已存在，只需要记录标注
+
+
+class ExportPipeline:
+    """导出流水线
+
+    encode_fn(job) 在编码线程中执行，负责填充 job.encoded；
+    write_fn(job) 只在写入线程中执行，因此写入端的统计不需要额外加锁。
+    write_fn 抛出的异常计入 write_errors，并在写入线程中交给 on_write_error(job, 异常) 记录。
+    """
+
+    def __init__(self, encode_fn: Callable[[FrameExportJob], Any],
+                 write_fn: Callable[[FrameExportJob], Any],
+                 workers: int = DEFAULT_ENCODER_WORKERS,
+                 queue_size: int = 0,
+                 on_write_error: Optional[Callable[[FrameExportJob, Exception], Any]] = None):
+        self.encode_fn = encode_fn
+        self.write_fn = write_fn
+        self.on_write_error = on_write_error
+        self.workers = max(1, int(workers))
+
+        # 队列容量决定了同时驻留内存的帧数上限
+        queue_size = queue_size or self.workers * 2
+        self.encode_queue = queue.Queue(maxsize=queue_size)
+        self.write_queue = queue.Queue(maxsize=queue_size)
+
+        self.aborted = False
+        self.submitted = 0
+        self.write_errors = 0
+        self._encoder_threads = []
+        self._writer_thread = None
+        self._started = False
+
+    def start(self):
+        """启动编码线程和写入线程"""
+        if self._started:
+            return
+        self._started = True
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._encode_loop, name=f"export-encoder-{i}", daemon=True)
+            thread.start()
+            self._encoder_threads.append(thread)
+
+        self._writer_thread = threading.Thread(target=self._write_loop, name="export-writer", daemon=True)
+        self._writer_thread.start()
+
+    def submit(self, job: FrameExportJob, should_stop: Callable[[], bool] = None) -> bool:
+        """提交任务，队列满时阻塞（背压）
+
+        should_stop 用于在等待期间检查取消状态，返回False表示任务未提交
+        """
+        while not self.aborted:
+            if should_stop and should_stop():
+                return False
+            try:
+                self.encode_queue.put(job, timeout=0.1)
+                self.submitted += 1
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close(self):
+        """等待所有已提交任务完成并停止线程"""
+        if not self._started:
+            return
+
+        for _ in self._encoder_threads:
+            self.encode_queue.put(_SENTINEL)
+        for thread in self._encoder_threads:
+            thread.join()
+
+        self.write_queue.put(_SENTINEL)
+        self._writer_thread.join()
+
+        self._encoder_threads = []
+        self._writer_thread = None
+        self._started = False
+
+    def abort(self):
+        """放弃尚未处理的任务"""
+        self.aborted = True
+        self.close()
+
+    def _encode_loop(self):
+        """编码线程"""
+        while True:
+            job = self.encode_queue.get()
+            if job is _SENTINEL:
+                break
+            if self.aborted:
+                continue
+
+            try:
+                self.encode_fn(job)
+            except Exception as e:
+                job.error = str(e)
+
+            # 编码完成后释放原始帧，只保留压缩后的字节
+            job.frame = None
+            self.write_queue.put(job)
+
+    def _write_loop(self):
+        """写入线程"""
+        while True:
+            job = self.write_queue.get()
+            if job is _SENTINEL:
+                break
+            if self.aborted:
+                continue
+
+            try:
+                self.write_fn(job)
+            except Exception as e:
+                self.write_errors += 1
+                if self.on_write_error:
+                    self.on_write_error(job, e)
+                else:
+                    print(f"写入导出任务失败 {job.frame_name}: {e}")
@@ -0,0 +1,327 @@
+"""
+导出任务队列 - 多项目/多视频批量导出
+任务（项目, 视频, 输出目录）保存在队列文件中，进程重启后未完成的任务继续执行；
+调度时限制同时运行的任务数（磁盘IO预算）和总线程数（CPU预算），并汇报每个任务的进度。
+队列文件可能被多个进程同时修改（界面或命令行添加任务时后台正在执行队列），
+保存时在文件锁内重新读取并合并其他进程的修改，每个进程只覆盖自己修改过的任务。
+"""
+import multiprocessing
+import os
+import queue
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Any, List, Optional, Callable, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from export_manifest import write_json_atomic, read_json
+
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.expanduser("~"), ".multi_label_annotation", "export_queue.json")
+QUEUE_VERSION = 1
+JOB_STATES = ("pending", "running", "completed", "failed")
+
+# 运行期间保存队列状态的最小间隔（秒）
+QUEUE_SAVE_INTERVAL = 2.0
+
+
+@dataclass
+class ExportJob:
+    """导出任务"""
+    project_path: str
+    output_dir: str
+    video_path: str = ""                 # 为空时使用项目中记录的视频
+    options: Dict[str, Any] = field(default_factory=dict)   # 传给 export_project 的导出参数
+    job_id: str = ""
+    status: str = "pending"
+    progress: int = 0
+    message: str = ""
+    exported_images: int = 0
+    elapsed: float = 0.0                 # 最近一次运行的导出耗时（秒）
+    errors: List[str] = field(default_factory=list)
+    attempts: int = 0
+    created_at: float = 0.0
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+    def __post_init__(self):
+        if not self.job_id:
+            self.job_id = uuid.uuid4().hex[:8]
+        if not self.created_at:
+            self.created_at = time.time()
+
+    @property
+    def name(self) -> str:
+        """任务显示名称"""
+        return os.path.basename(self.project_path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式"""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ExportJob":
+        """从字典创建，忽略未知字段"""
+        known = cls.__dataclass_fields__
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+
+@contextmanager
+def _queue_file_lock(path: str):
+    """队列文件的进程间互斥锁（锁文件为 <队列文件>.lock）"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", "a+") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK 重试约10秒后仍未获得锁时报错，继续等待
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ExportQueue:
+    """持久化的导出任务队列
+
+    队列文件在每次状态变化后原子写入；运行中被中断的任务在下次加载时恢复为等待状态，
+    并以增量方式导出，已完成的标注不会重复导出。
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH):
+        self.path = path
+        self.jobs: List[ExportJob] = []
+        self._saved_at = 0.0
+
+        # 上次保存后本进程修改过/删除的任务，保存时只有这些任务覆盖磁盘上的内容
+        self._dirty: Set[str] = set()
+        self._removed: Set[str] = set()
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_QUEUE_PATH) -> "ExportQueue":
+        """加载队列文件，不存在时返回空队列"""
+        export_queue = cls(path)
+        data = read_json(path)
+        if data and data.get("version") == QUEUE_VERSION:
+            export_queue.jobs = [ExportJob.from_dict(job) for job in data.get("jobs", [])]
+        for job in export_queue.jobs:
+            if job.status == "running":
+                job.status = "pending"
+                job.message = "上次运行被中断，等待继续"
+        return export_queue
+
+    def save(self):
+        """合并其他进程的修改后原子写入队列文件"""
+        with _queue_file_lock(self.path):
+            self._merge_from_disk()
+            write_json_atomic(self.path, {
+                "version": QUEUE_VERSION,
+                "updated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "jobs": [job.to_dict() for job in self.jobs]
+            })
+        self._dirty.clear()
+        self._removed.clear()
+        self._saved_at = time.time()
+
+    def _merge_from_disk(self):
+        """以磁盘上的任务列表为准，只保留本进程修改过的任务和本进程新增的任务
+
+        其他进程新增的任务追加到列表中，修改的任务原地更新（运行中持有的任务对象保持有效）。
+        """
+        data = read_json(self.path)
+        if not data or data.get("version") != QUEUE_VERSION:
+            return
+        local = {job.job_id: job for job in self.jobs}
+        merged = []
+        for job_data in data.get("jobs", []):
+            disk_job = ExportJob.from_dict(job_data)
+            job_id = disk_job.job_id
+            if job_id in self._removed:
+                continue
+            job = local.pop(job_id, None)
+            if job is None:
+                job = disk_job
+            elif job_id not in self._dirty:
+                job.__dict__.update(disk_job.__dict__)
+            merged.append(job)
+        # 磁盘上没有的任务：本进程新增的保留，其他进程已删除的丢弃
+        merged.extend(job for job_id, job in local.items() if job_id in self._dirty)
+        self.jobs = merged
+
+    def add(self, project_path: str, output_dir: str, video_path: str = "",
+            options: Dict[str, Any] = None) -> ExportJob:
+        """添加任务；同一项目导出到同一目录的未完成任务只更新参数"""
+        project_path = os.path.abspath(project_path)
+        output_dir = os.path.abspath(output_dir)
+        for job in self.jobs:
+            if job.project_path == project_path and job.output_dir == output_dir and job.status != "completed":
+                job.video_path = video_path
+                job.options = dict(options or {})
+                job.status = "pending"
+                self._dirty.add(job.job_id)
+                return job
+
+        job = ExportJob(project_path, output_dir, video_path, dict(options or {}))
+        self.jobs.append(job)
+        self._dirty.add(job.job_id)
+        return job
+
+    def jobs_with_status(self, *statuses: str) -> List[ExportJob]:
+        """按状态筛选任务"""
+        return [job for job in self.jobs if job.status in statuses]
+
+    def retry_failed(self) -> int:
+        """把失败的任务重新设为等待，返回任务数"""
+        failed = self.jobs_with_status("failed")
+        for job in failed:
+            job.status = "pending"
+            job.errors = []
+            self._dirty.add(job.job_id)
+        return len(failed)
+
+    def remove_finished(self) -> int:
+        """删除已完成的任务，返回删除数"""
+        finished = self.jobs_with_status("completed")
+        self._remove(finished)
+        return len(finished)
+
+    def clear(self) -> int:
+        """删除所有任务，返回删除数"""
+        removed = len(self.jobs)
+        self._remove(list(self.jobs))
+        return removed
+
+    def _remove(self, jobs: List[ExportJob]):
+        """删除任务并记录，保存时从磁盘上的队列中一并删除"""
+        removed = {job.job_id for job in jobs}
+        self.jobs = [job for job in self.jobs if job.job_id not in removed]
+        self._removed |= removed
+        self._dirty -= removed
+
+    def summary(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        counts = {state: 0 for state in JOB_STATES}
+        for job in self.jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def run(self, export_fn: Callable[..., Dict[str, Any]], max_jobs: int = 1, cpu_budget: int = 0,
+            progress_callback: Optional[Callable[[ExportJob], None]] = None) -> Dict[str, int]:
+        """执行所有等待中的任务
+
+        export_fn(project_path, output_dir, encoder_workers, video_path=..., progress_queue=..., job_id=..., **options)
+        在工作进程中执行并返回结果字典（见 batch_export.export_project）。
+        max_jobs 为同时运行的任务数（同时写盘的任务越多，磁盘寻道越严重），
+        cpu_budget 为所有任务共用的线程数，平均分给每个任务的解码和编码线程。
+        """
+        pending = self.jobs_with_status("pending")
+        if not pending:
+            return self.summary()
+
+        max_jobs = max(1, min(max_jobs, len(pending)))
+        cpu_budget = cpu_budget or os.cpu_count() or 1
+        threads_per_job = max(1, cpu_budget // max_jobs)
+
+        manager = multiprocessing.Manager()
+        progress_queue = manager.Queue()
+        jobs_by_id: Dict[str, ExportJob] = {}
+        futures = {}
+        try:
+            with ProcessPoolExecutor(max_workers=max_jobs) as executor:
+                def submit(job: ExportJob):
+                    options = dict(job.options)
+                    # 每个分片进程占用一个解码线程，其余线程用于编码
+                    shard_workers = max(1, int(options.get("shard_workers", 1)))
+                    encoder_workers = max(1, threads_per_job - shard_workers)
+                    future = executor.submit(export_fn, job.project_path, job.output_dir, encoder_workers,
+                                             video_path=job.video_path, progress_queue=progress_queue,
+                                             job_id=job.job_id, **options)
+                    futures[future] = job
+                    jobs_by_id[job.job_id] = job
+                    running.add(future)
+
+                running = set()
+                for job in pending:
+                    submit(job)
+
+                while running:
+                    done, running = wait(running, timeout=0.2, return_when=FIRST_COMPLETED)
+                    self._drain_progress(progress_queue, jobs_by_id, progress_callback)
+                    for future in done:
+                        self._finish_job(futures[future], future, progress_callback)
+                    if done or time.time() - self._saved_at >= QUEUE_SAVE_INTERVAL:
+                        self.save()
+                        # 运行期间其他进程加入（或重新设为等待）的任务在本次运行中一并执行
+                        active = {futures[future].job_id for future in running}
+                        for job in self.jobs_with_status("pending"):
+                            if job.job_id not in active:
+                                submit(job)
+        finally:
+            # 被中断时运行中的任务恢复为等待，下次继续
+            for job in jobs_by_id.values():
+                if job.status == "running":
+                    job.status = "pending"
+                    self._dirty.add(job.job_id)
+            self.save()
+            manager.shutdown()
+
+        return self.summary()
+
+    def _drain_progress(self, progress_queue, jobs_by_id: Dict[str, ExportJob],
+                        progress_callback: Optional[Callable[[ExportJob], None]]):
+        """处理工作进程汇报的进度"""
+        while True:
+            try:
+                job_id, value, message = progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            job = jobs_by_id.get(job_id)
+            if job is None or job.status not in ("pending", "running"):
+                continue
+            if job.status == "pending":
+                # 第一次汇报进度时任务才真正开始
+                job.status = "running"
+                job.started_at = time.time()
+                job.attempts += 1
+            job.progress = value
+            job.message = message
+            self._dirty.add(job_id)
+            if progress_callback:
+                progress_callback(job)
+
+    def _finish_job(self, job: ExportJob, future, progress_callback: Optional[Callable[[ExportJob], None]]):
+        """记录任务结果"""
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"success": False, "errors": [str(e)], "exported_images": 0}
+
+        if job.status == "pending":
+            job.attempts += 1
+        job.status = "completed" if result["success"] else "failed"
+        job.exported_images = result["exported_images"]
+        job.elapsed = result.get("elapsed", 0.0)
+        job.errors = list(result["errors"])
+        job.progress = 100 if result["success"] else job.progress
+        job.message = "导出完成" if result["success"] else "导出失败"
+        job.finished_at = time.time()
+        self._dirty.add(job.job_id)
+        if progress_callback:
+            progress_callback(job)
@@ -0,0 +1,150 @@
+"""
+导出统计 - 紧凑计数器和逐帧明细流
+标签统计用按标签索引的 NumPy 计数数组累加，逐帧明细逐行写入 frame_details.jsonl，
+dataset_info.json 只保存汇总结果，导出过程中原子更新，可以随时读取监控进度。
+"""
+import json
+import os
+import shutil
+from typing import Dict, Any, List, Optional
+import numpy as np
+
+
+DATASET_INFO_NAME = "dataset_info.json"
+FRAME_DETAILS_NAME = "frame_details.jsonl"
+
+
+class LabelCounters:
+    """按标签索引的帧计数
+
+    annotated: 标注中配置了该标签、且成功导出的帧数（与此前的 label_distribution 一致）
+    active: 导出帧中该标签数值大于0的帧数（逐帧累加，含舌头规则自动激活的标签）
+    """
+
+    def __init__(self, labels: List[str]):
+        self.labels = list(labels)
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self.annotated = np.zeros(len(self.labels), dtype=np.int64)
+        self.active = np.zeros(len(self.labels), dtype=np.int64)
+        self.frames = 0
+
+    def label_mask(self, labels: List[str]) -> np.ndarray:
+        """标注配置的标签对应的布尔掩码"""
+        mask = np.zeros(len(self.labels), dtype=bool)
+        for label in labels:
+            i = self.index.get(label)
+            if i is not None:
+                mask[i] = True
+        return mask
+
+    def add_frame(self, values: np.ndarray, annotated: Optional[np.ndarray] = None):
+        """累加成功导出的一帧（只在写入线程中调用）
+
+        annotated 为该帧所属标注的标签掩码（见 label_mask）。
+        """
+        self.frames += 1
+        self.active += values > 0
+        if annotated is not None:
+            self.annotated += annotated
+
+    @classmethod
+    def from_dict(cls, labels: List[str], data: Dict[str, Dict[str, int]], frames: int = 0) -> "LabelCounters":
+        """从 to_dict() 的结果恢复（追加导出时读取已有数据集的计数）"""
+        counters = cls(labels)
+        for label, counts in (data or {}).items():
+            i = counters.index.get(label)
+            if i is not None:
+                counters.annotated[i] = counts.get("annotated_frames", 0)
+                counters.active[i] = counts.get("active_frames", 0)
+        counters.frames = frames
+        return counters
+
+    def merge(self, other: "LabelCounters"):
+        """合并分片进程的计数"""
+        self.annotated += other.annotated
+        self.active += other.active
+        self.frames += other.frames
+
+    def distribution(self) -> Dict[str, int]:
+        """标签分布（标签 -> 导出帧数）"""
+        return {label: int(count) for label, count in zip(self.labels, self.annotated)}
+
+    def to_dict(self) -> Dict[str, Dict[str, int]]:
+        """可序列化的计数"""
+        return {
+            label: {"annotated_frames": int(annotated), "active_frames": int(active)}
+            for label, annotated, active in zip(self.labels, self.annotated, self.active)
+        }
+
+
+class FrameDetailWriter:
+    """逐帧明细：每行一个JSON对象，记录图像、来源帧和非零的标签数值"""
+
+    def __init__(self, path: str, labels: List[str], append: bool = False):
+        self.path = path
+        self.labels = list(labels)
+        self.rows = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, image: str, annotation_id: str, frame_number: int, timestamp: float, values: np.ndarray,
+              split: Optional[str] = None):
+        """追加一帧，划分数据集时记录所属子集"""
+        active = np.flatnonzero(values)
+        row = {
+            "image": image,
+            "annotation_id": annotation_id,
+            "frame_index": frame_number,
+            "timestamp": round(timestamp, 6),
+            "labels": {self.labels[i]: round(float(values[i]), 6) for i in active}
+        }
+        if split:
+            row["split"] = split
+        self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.rows += 1
+
+    def close(self):
+        """关闭文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def merge_frame_details(part_paths: List[str], output_path: str, append: bool = False):
+    """按顺序拼接分片进程写入的逐帧明细，append 为True时接在已有明细之后"""
+    with open(output_path, "a" if append else "w", encoding="utf-8") as dst:
+        for part_path in part_paths:
+            if os.path.exists(part_path):
+                with open(part_path, "r", encoding="utf-8") as src:
+                    shutil.copyfileobj(src, dst)
+
+
+# 合并统计时取最大值的字段（不能相加）
+MAX_STAT_KEYS = frozenset({"max_labels_per_annotation"})
+# 合并统计时保留已有值的字段（快速模式下每类失败只保留第一条信息）
+FIRST_VALUE_KEYS = frozenset({"failure_examples"})
+
+
+def merge_counts(base: Dict[str, Any], extra: Dict[str, Any]) -> Dict[str, Any]:
+    """累加两份统计：整数计数相加，max_* 字段取最大值，字典递归合并，列表拼接，其他值取 extra 的
+
+    平均值、比例等浮点数是派生值，相加没有意义，合并时取 extra 的，需要时由调用方按合并后的计数重新计算。
+    """
+    merged = dict(base)
+    for key, value in extra.items():
+        previous = merged.get(key)
+        if isinstance(value, bool) or previous is None:
+            merged[key] = value
+        elif key in MAX_STAT_KEYS:
+            merged[key] = max(previous, value)
+        elif key in FIRST_VALUE_KEYS and isinstance(value, dict) and isinstance(previous, dict):
+            merged[key] = {**value, **previous}
+        elif isinstance(value, int) and isinstance(previous, int):
+            merged[key] = previous + value
+        elif isinstance(value, dict) and isinstance(previous, dict):
+            merged[key] = merge_counts(previous, value)
+        elif isinstance(value, list) and isinstance(previous, list):
+            merged[key] = previous + value
+        else:
+            merged[key] = value
+    return merged
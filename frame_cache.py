@@ -0,0 +1,66 @@
+"""
+解码帧缓存 - 按内存预算的LRU
+一次导出中多个标注可能覆盖相同的帧（相邻标注共享边界帧、标注之间有重叠），
+缓存已解码的帧，回退读取时直接命中，不再定位和重新解码。
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+import numpy as np
+
+
+DEFAULT_FRAME_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class FrameCache:
+    """帧号 -> 解码帧的LRU缓存，总字节数不超过 max_bytes
+
+    缓存的帧会被多个导出任务共享，调用方不能原地修改。
+    set_window() 丢弃不会再被读取的帧，并且只缓存之后还会被读取的帧，
+    互不重叠的标注因此不占用缓存。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_FRAME_CACHE_BYTES):
+        self.max_bytes = max(0, int(max_bytes))
+        self.frames: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self.bytes = 0
+        self.admit_from = 0
+
+        self.hits = 0
+        self.evictions = 0
+
+    def get(self, frame_index: int) -> Optional[np.ndarray]:
+        """读取缓存的帧，未命中返回None"""
+        frame = self.frames.get(frame_index)
+        if frame is not None:
+            self.frames.move_to_end(frame_index)
+            self.hits += 1
+        return frame
+
+    def put(self, frame_index: int, frame: np.ndarray):
+        """缓存一帧，超出预算时淘汰最久未使用的帧"""
+        if frame_index < self.admit_from or frame.nbytes > self.max_bytes or frame_index in self.frames:
+            return
+        self.frames[frame_index] = frame
+        self.bytes += frame.nbytes
+        while self.bytes > self.max_bytes:
+            _, evicted = self.frames.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def set_window(self, keep_from: int, admit_from: int):
+        """丢弃帧号小于 keep_from 的帧，之后只缓存帧号不小于 admit_from 的帧"""
+        self.admit_from = admit_from
+        for frame_index in [i for i in self.frames if i < keep_from]:
+            self.bytes -= self.frames.pop(frame_index).nbytes
+
+    def clear(self):
+        """清空缓存"""
+        self.frames.clear()
+        self.bytes = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存统计"""
+        return {
+            "cache_hits": self.hits,
+            "cache_evictions": self.evictions
+        }
@@ -0,0 +1,198 @@
+"""
+JPEG解码线程池 - 预览用的解码，接收回调只把原始字节放入有界队列，解码在后台线程中进行
+解码结果按接收顺序重新排序后输出。解码跟不上时丢弃最旧的未解码帧并计数，预览总是显示最新的画面，
+网络接收不会被解码阻塞，数据也不会在内核缓冲区中堆积造成延迟。
+录制直接使用收到的JPEG数据，不经过解码线程池（见 video_recorder）。
+预览通过只保留最新帧的槽位取帧，GUI跟不上时跳过旧帧。
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+import cv2
+import numpy as np
+
+
+DEFAULT_DECODE_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+DEFAULT_DECODE_QUEUE_SIZE = 8
+
+_STOP = object()
+
+
+@dataclass
+class ReceivedFrame:
+    """接收到的一帧"""
+    sequence: int                       # 接收顺序编号（只对进入解码队列的帧编号）
+    data: bytes                         # 原始JPEG字节
+    timestamp: float                    # 接收时间（time.monotonic()）
+    image: Optional[np.ndarray] = None  # 解码后的BGR图像，解码失败为None
+    skipped: bool = False               # 解码繁忙被丢弃，没有解码
+
+
+class FrameDecodePool:
+    """JPEG解码线程池
+
+    submit() 在接收线程中调用，不会阻塞；on_frame(frame) 在解码线程中按 sequence 顺序调用，
+    解码失败的帧跳过。cv2.imdecode 会释放GIL，多个解码线程可以并行。
+    """
+
+    def __init__(self, on_frame: Callable[[ReceivedFrame], None],
+                 workers: int = DEFAULT_DECODE_WORKERS,
+                 queue_size: int = DEFAULT_DECODE_QUEUE_SIZE):
+        self.on_frame = on_frame
+        self.workers = max(1, int(workers))
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._threads = []
+
+        # 乱序完成的解码结果，等待前面的帧完成后按顺序输出
+        self._reorder_lock = threading.Lock()
+        # 已按顺序排好、等待输出的帧。同一时间只有一个解码线程在锁外调用 on_frame，
+        # 其他线程只登记结果后返回，on_frame 耗时不会阻塞其他线程解码
+        self._ready: deque = deque()
+        self._emitting = False
+        self._pending: Dict[int, ReceivedFrame] = {}
+        self._next_output = 0
+        self._next_sequence = 0
+
+        self.received = 0
+        self.decoded = 0
+        self.decode_failed = 0
+        self.dropped = 0
+
+    def start(self):
+        """启动解码线程"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._decode_loop, name=f"jpeg-decode-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """停止解码线程，队列中未解码的帧丢弃"""
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, data: bytes, timestamp: Optional[float] = None) -> bool:
+        """提交一帧JPEG数据，队列已满时丢弃最旧的未解码帧，返回是否有帧被丢弃（只应在接收线程中调用）"""
+        self.received += 1
+        frame = ReceivedFrame(self._next_sequence, data, time.monotonic() if timestamp is None else timestamp)
+        self._next_sequence += 1
+        try:
+            self._queue.put_nowait(frame)
+            return False
+        except queue.Full:
+            pass
+
+        try:
+            oldest = self._queue.get_nowait()
+        except queue.Empty:
+            oldest = None
+        if oldest is not None and oldest is not _STOP:
+            # 丢弃的帧也要登记，后面的帧才能按顺序输出
+            oldest.skipped = True
+            self.dropped += 1
+            self._complete(oldest)
+        # 只有接收线程放入数据，取出一帧后一定有空位
+        self._queue.put_nowait(frame)
+        return True
+
+    def get_stats(self) -> Dict[str, int]:
+        """解码统计"""
+        return {
+            "received": self.received,
+            "decoded": self.decoded,
+            "decode_failed": self.decode_failed,
+            "dropped": self.dropped,
+            "queue_depth": self._queue.qsize()
+        }
+
+    def _decode_loop(self):
+        """解码线程"""
+        while True:
+            frame = self._queue.get()
+            if frame is _STOP:
+                return
+            try:
+                frame.image = cv2.imdecode(np.frombuffer(frame.data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            except cv2.error:
+                frame.image = None
+            self._complete(frame)
+
+    def _complete(self, frame: ReceivedFrame):
+        """记录解码结果，并按顺序输出已经连续的帧"""
+        with self._reorder_lock:
+            self._pending[frame.sequence] = frame
+            while self._next_output in self._pending:
+                self._ready.append(self._pending.pop(self._next_output))
+                self._next_output += 1
+            if self._emitting or not self._ready:
+                return
+            self._emitting = True
+
+        while True:
+            with self._reorder_lock:
+                if not self._ready:
+                    self._emitting = False
+                    return
+                ready = self._ready.popleft()
+            if ready.skipped:
+                continue
+            if ready.image is None:
+                self.decode_failed += 1
+                continue
+            self.decoded += 1
+            try:
+                self.on_frame(ready)
+            except Exception as e:
+                print(f"处理解码帧失败: {e}")
+
+
+class LatestFrameSlot:
+    """预览用的最新帧槽 - 只保留最新一帧，未显示就被覆盖的旧帧计为丢弃
+
+    publish() 在解码线程中调用，take() 在GUI线程中调用。槽位是 maxlen=1 的 deque，
+    append/popleft 都是原子操作，不需要加锁，生产者永远不会等待GUI。
+    publish() 返回True时需要通知GUI取帧；通知发出后、GUI取帧前到达的帧只替换槽内的帧，
+    不再重复通知，Qt事件队列中最多只有一个待处理的通知。
+    """
+
+    def __init__(self):
+        self._slot: deque = deque(maxlen=1)
+        self._notify_pending = False
+        self.published = 0
+        self.taken = 0
+
+    def publish(self, frame) -> bool:
+        """放入最新帧，返回是否需要通知GUI"""
+        self._slot.append(frame)
+        self.published += 1
+        if self._notify_pending:
+            return False
+        self._notify_pending = True
+        return True
+
+    def take(self):
+        """取出最新帧，没有新帧时返回None"""
+        # 先清除通知标记再取帧：之后到达的帧会重新通知，不会滞留在槽中
+        self._notify_pending = False
+        try:
+            frame = self._slot.popleft()
+        except IndexError:
+            return None
+        self.taken += 1
+        return frame
+
+    @property
+    def dropped(self) -> int:
+        """被覆盖、没有显示的帧数"""
+        return max(0, self.published - self.taken - len(self._slot))
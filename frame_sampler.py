@@ -0,0 +1,75 @@
+"""
+导出帧采样与去重
+30fps的人脸录像中相邻帧几乎相同，导出时可以：
+按目标帧率采样、只在45维标注变化超过阈值时输出、或用感知哈希丢弃近似重复的帧。
+"""
+from typing import List, Sequence
+import cv2
+import numpy as np
+
+
+# 感知哈希（dHash）比较的是 9x8 灰度缩略图中相邻像素的明暗关系，共64位
+_DHASH_SIZE = 8
+
+
+def select_rate_indices(n_frames: int, video_fps: float, sample_fps: float) -> Sequence[int]:
+    """按目标帧率选取标注内的帧序号，sample_fps<=0 或不低于视频帧率时保留全部帧"""
+    if n_frames <= 0:
+        return range(0)
+    if sample_fps <= 0 or sample_fps >= video_fps:
+        return range(n_frames)
+
+    # 按时间等间隔取帧，同一帧只取一次
+    step = video_fps / sample_fps
+    return sorted(set(int(i * step) for i in range(int((n_frames - 1) / step) + 1)))
+
+
+def select_label_change_indices(label_matrix: np.ndarray, candidates: Sequence[int],
+                                epsilon: float) -> List[int]:
+    """只保留标注向量相对上一个保留帧变化超过 epsilon 的帧（第一帧总是保留）"""
+    selected = []
+    last = None
+    for index in candidates:
+        values = label_matrix[index]
+        if last is None or np.max(np.abs(values - last)) > epsilon:
+            selected.append(index)
+            last = values
+    return selected
+
+
+def select_frame_indices(label_matrix: np.ndarray, video_fps: float,
+                         sample_fps: float = 0.0, label_epsilon: float = 0.0) -> Sequence[int]:
+    """组合目标帧率和标注变化两种采样，返回要导出的帧序号"""
+    indices = select_rate_indices(label_matrix.shape[0], video_fps, sample_fps)
+    if label_epsilon > 0:
+        indices = select_label_change_indices(label_matrix, indices, label_epsilon)
+    return indices
+
+
+def frame_dhash(frame: np.ndarray) -> int:
+    """计算帧的64位差值哈希"""
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (_DHASH_SIZE + 1, _DHASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hash_distance(a: int, b: int) -> int:
+    """两个哈希的汉明距离（int.bit_count() 需要Python 3.10，这里兼容3.8）"""
+    return bin(a ^ b).count("1")
+
+
+class DuplicateFilter:
+    """近似重复帧过滤：与上一个保留帧的哈希距离不超过阈值时视为重复"""
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        self.last_hash = None
+
+    def is_duplicate(self, frame: np.ndarray) -> bool:
+        """判断是否重复，不重复时把该帧作为新的比较基准"""
+        frame_hash = frame_dhash(frame)
+        if self.last_hash is not None and hash_distance(frame_hash, self.last_hash) <= self.max_distance:
+            return True
+        self.last_hash = frame_hash
+        return False
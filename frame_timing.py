@@ -0,0 +1,121 @@
+"""
+录制帧计时 - 输入帧率测量和逐帧时间戳记录
+录制时每写入一帧，在 <视频>.timestamps.csv 中记录该帧的来源帧序号和到达时间（相对第一帧的秒数），
+导出或分析时可以把真实时间（秒）映射到准确的帧号，不依赖视频文件头中的名义帧率。
+标注时间默认按视频时间轴（播放器位置）换算帧号；只有按录制开始后的真实时间记录的标注才使用 arrival 时间基准。
+"""
+import os
+import time
+from collections import deque
+from typing import Optional, Tuple
+import numpy as np
+
+
+TIMESTAMPS_SIDECAR_SUFFIX = ".timestamps.csv"
+TIMING_MODES = ("measured", "constant")
+TIME_BASES = ("video", "arrival")   # 标注时间换算帧号的基准：视频时间轴 / 逐帧到达时间
+DEFAULT_RECORD_FPS = 30.0
+
+
+class FrameRateMeter:
+    """滑动窗口内的输入帧率"""
+
+    def __init__(self, window: int = 60):
+        self._times: deque = deque(maxlen=max(2, window))
+
+    def add(self, timestamp: Optional[float] = None):
+        """记录一帧的到达时间（time.monotonic()）"""
+        self._times.append(time.monotonic() if timestamp is None else timestamp)
+
+    @property
+    def fps(self) -> float:
+        """当前帧率，帧数不足时返回0"""
+        if len(self._times) < 2:
+            return 0.0
+        span = self._times[-1] - self._times[0]
+        return (len(self._times) - 1) / span if span > 0 else 0.0
+
+
+def measured_fps(first_time: float, last_time: float, frames: int) -> float:
+    """按首尾到达时间计算平均帧率，无法计算时返回0"""
+    span = last_time - first_time
+    if frames < 2 or span <= 0:
+        return 0.0
+    return (frames - 1) / span
+
+
+def timestamps_sidecar_path(video_path: str) -> str:
+    """视频对应的逐帧时间戳文件路径"""
+    return video_path + TIMESTAMPS_SIDECAR_SUFFIX
+
+
+class TimestampWriter:
+    """逐帧时间戳记录，每行 帧号,来源帧序号,到达时间（秒）
+
+    恒定帧率录制时重复写入的帧沿用来源帧的序号和到达时间。只应在录制线程中调用。
+    """
+
+    def __init__(self, video_path: str):
+        self.path = timestamps_sidecar_path(video_path)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write("frame,sequence,time\n")
+
+    def write(self, frame_index: int, sequence: int, seconds: float):
+        """记录一帧"""
+        self._file.write(f"{frame_index},{sequence},{seconds:.6f}\n")
+
+    def close(self):
+        """关闭文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def load_frame_timestamps(video_path: str) -> Optional[np.ndarray]:
+    """读取视频的逐帧到达时间（按帧号排列的秒数），没有时间戳文件或损坏时返回None"""
+    path = timestamps_sidecar_path(video_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        data = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2)
+    except (OSError, ValueError) as e:
+        print(f"读取帧时间戳失败: {e}")
+        return None
+    if data.size == 0:
+        return np.zeros(0)
+    return data[np.argsort(data[:, 0], kind="stable"), 2]
+
+
+def frame_index_at(timestamps: np.ndarray, seconds: float) -> int:
+    """到达时间最接近 seconds 的帧号（timestamps 见 load_frame_timestamps）"""
+    if len(timestamps) == 0:
+        return 0
+    i = int(np.searchsorted(timestamps, seconds))
+    if i <= 0:
+        return 0
+    if i >= len(timestamps):
+        return len(timestamps) - 1
+    return i if timestamps[i] - seconds < seconds - timestamps[i - 1] else i - 1
+
+
+def frame_range_at(timestamps: np.ndarray, start: float, end: float) -> Tuple[int, int]:
+    """到达时间落在 [start, end] 内的帧范围（闭区间），区间内没有帧时取最接近起点的一帧"""
+    count = len(timestamps)
+    first = int(np.searchsorted(timestamps, start, side="left"))
+    last = int(np.searchsorted(timestamps, end, side="right")) - 1
+    if first > last or first >= count or last < 0:
+        index = frame_index_at(timestamps, start)
+        return index, index
+    return first, last
+
+
+def load_time_base(video_path: str, time_base: str) -> Optional[np.ndarray]:
+    """按时间基准加载换算帧号用的逐帧时间，video 返回None；arrival 时缺少时间戳文件抛出 ValueError"""
+    if time_base not in TIME_BASES:
+        raise ValueError(f"不支持的时间基准: {time_base}")
+    if time_base == "video":
+        return None
+    timestamps = load_frame_timestamps(video_path)
+    if timestamps is None or len(timestamps) == 0:
+        raise ValueError(f"视频没有逐帧时间戳文件: {timestamps_sidecar_path(video_path)}")
+    return timestamps
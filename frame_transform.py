@@ -0,0 +1,172 @@
+"""
+导出帧变换 - ROI裁剪 / 缩放 / 灰度 / 等比缩放补边
+在编码前对帧做变换，只编码和保存训练真正需要的像素。
+录制页面选择的ROI会保存为视频旁的 <视频>.roi.json，导出时可以直接复用。
+"""
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Tuple
+import cv2
+import numpy as np
+
+
+ROI_SIDECAR_SUFFIX = ".roi.json"
+
+
+def clamp_roi(roi: Tuple[int, int, int, int], width: int, height: int) -> Tuple[int, int, int, int]:
+    """把ROI限制在图像范围内，返回 (x, y, x2, y2)，至少保留1个像素"""
+    x, y, w, h = roi
+    x1 = max(0, min(x, width - 1))
+    y1 = max(0, min(y, height - 1))
+    x2 = max(x1 + 1, min(x + w, width))
+    y2 = max(y1 + 1, min(y + h, height))
+    return x1, y1, x2, y2
+
+
+@dataclass
+class FrameTransform:
+    """编码前的帧变换
+
+    执行顺序：ROI裁剪 -> 灰度 -> 缩放（letterbox 时等比缩放后居中补黑边）。
+    """
+    roi: Optional[Tuple[int, int, int, int]] = None   # 原始帧坐标 (x, y, w, h)
+    size: Optional[Tuple[int, int]] = None            # 输出尺寸 (宽, 高)
+    grayscale: bool = False
+    letterbox: bool = False
+
+    @property
+    def is_identity(self) -> bool:
+        """是否不做任何变换"""
+        return self.roi is None and self.size is None and not self.grayscale
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """ROI裁剪（返回视图，不复制像素）"""
+        if self.roi is None:
+            return frame
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = clamp_roi(self.roi, w, h)
+        return frame[y1:y2, x1:x2]
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        """对单帧执行全部变换"""
+        frame = self.crop(frame)
+        if self.grayscale and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.size is not None:
+            frame = self._resize(frame)
+        return np.ascontiguousarray(frame)
+
+    def output_size(self, width: int, height: int) -> Tuple[int, int]:
+        """给定原始帧尺寸时的输出尺寸"""
+        if self.size is not None:
+            return self.size
+        if self.roi is not None:
+            x1, y1, x2, y2 = clamp_roi(self.roi, width, height)
+            return x2 - x1, y2 - y1
+        return width, height
+
+    def _resize(self, frame: np.ndarray) -> np.ndarray:
+        """缩放到目标尺寸，缩小用 INTER_AREA 避免摩尔纹"""
+        target_w, target_h = self.size
+        h, w = frame.shape[:2]
+        scale = min(target_w / w, target_h / h) if self.letterbox else None
+
+        if scale is None:
+            interpolation = cv2.INTER_AREA if target_w * target_h < w * h else cv2.INTER_LINEAR
+            return cv2.resize(frame, (target_w, target_h), interpolation=interpolation)
+
+        new_w = max(1, min(target_w, round(w * scale)))
+        new_h = max(1, min(target_h, round(h * scale)))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        resized = cv2.resize(frame, (new_w, new_h), interpolation=interpolation)
+
+        canvas = np.zeros((target_h, target_w) + frame.shape[2:], dtype=frame.dtype)
+        x = (target_w - new_w) // 2
+        y = (target_h - new_h) // 2
+        canvas[y:y + new_h, x:x + new_w] = resized
+        return canvas
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式（写入导出设置和数据集信息）"""
+        return {
+            "roi": list(self.roi) if self.roi is not None else None,
+            "size": list(self.size) if self.size is not None else None,
+            "grayscale": self.grayscale,
+            "letterbox": self.letterbox
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FrameTransform":
+        """从字典创建"""
+        roi = data.get("roi")
+        size = data.get("size")
+        return cls(
+            roi=tuple(int(v) for v in roi) if roi else None,
+            size=tuple(int(v) for v in size) if size else None,
+            grayscale=bool(data.get("grayscale", False)),
+            letterbox=bool(data.get("letterbox", False))
+        )
+
+
+def parse_roi(text: str) -> Tuple[int, int, int, int]:
+    """解析 "x,y,w,h" 形式的ROI"""
+    values = [int(v) for v in text.replace(" ", "").split(",")]
+    if len(values) != 4 or values[2] <= 0 or values[3] <= 0:
+        raise ValueError(f"无效的ROI: {text}（格式 x,y,w,h）")
+    return tuple(values)
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    """解析 "WxH" 形式的尺寸"""
+    values = [int(v) for v in text.lower().replace(" ", "").split("x")]
+    if len(values) != 2 or values[0] <= 0 or values[1] <= 0:
+        raise ValueError(f"无效的尺寸: {text}（格式 宽x高）")
+    return tuple(values)
+
+
+def roi_sidecar_path(video_path: str) -> str:
+    """视频对应的ROI记录文件路径"""
+    return video_path + ROI_SIDECAR_SUFFIX
+
+
+def save_roi_sidecar(video_path: str, roi: Tuple[int, int, int, int],
+                     frame_size: Tuple[int, int], cropped: bool) -> bool:
+    """保存录制时选择的ROI
+
+    cropped 表示录制时是否已经裁剪；未裁剪的视频导出时可以再按该ROI裁剪。
+    """
+    try:
+        with open(roi_sidecar_path(video_path), "w", encoding="utf-8") as f:
+            json.dump({
+                "roi": list(roi),
+                "frame_size": list(frame_size),
+                "cropped": cropped
+            }, f, ensure_ascii=False, indent=2)
+        return True
+    except OSError as e:
+        print(f"保存ROI记录失败: {e}")
+        return False
+
+
+def load_roi_sidecar(video_path: str) -> Optional[Dict[str, Any]]:
+    """读取视频的ROI记录，不存在或损坏时返回None"""
+    path = roi_sidecar_path(video_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data["roi"] = tuple(int(v) for v in data["roi"])
+        return data
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"读取ROI记录失败: {e}")
+        return None
+
+
+def export_roi_from_sidecar(video_path: str) -> Optional[Tuple[int, int, int, int]]:
+    """导出时可复用的ROI：只有录制时未裁剪的视频才需要在导出时裁剪"""
+    data = load_roi_sidecar(video_path)
+    if data is None or data.get("cropped", True):
+        return None
+    return data["roi"]
@@ -0,0 +1,149 @@
+"""
+导出图像编码器
+可选 JPEG（基线/优化）、WebP、PNG（压缩级别）和原始 uint8 .npy，
+按项目在磁盘占用和编码速度之间取舍。编码器用 "名称[:参数]" 描述，如 jpeg:90、png:1。
+"""
+import io
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+import cv2
+import numpy as np
+
+
+class ImageCodec(ABC):
+    """图像编码器基类：encode() 在编码线程中调用，返回编码后的字节；没有实现 encode() 的子类不能实例化"""
+    name = ""
+    extension = ""
+
+    @abstractmethod
+    def encode(self, frame: np.ndarray) -> Optional[bytes]:
+        """编码一帧图像，失败时返回None"""
+
+    @property
+    def spec(self) -> str:
+        """编码器描述字符串"""
+        return self.name
+
+    def settings(self) -> Dict[str, Any]:
+        """编码设置（写入导出设置和数据集信息）"""
+        return {"codec": self.name}
+
+
+def _imencode(ext: str, frame: np.ndarray, params: list) -> Optional[bytes]:
+    success, buffer = cv2.imencode(ext, frame, params)
+    return buffer.tobytes() if success else None
+
+
+@dataclass
+class JpegCodec(ImageCodec):
+    """JPEG：基线编码最快；optimize/progressive 文件略小但编码明显更慢"""
+    quality: int = 95
+    optimize: bool = False
+    progressive: bool = False
+
+    name = "jpeg"
+    extension = ".jpg"
+
+    def encode(self, frame: np.ndarray) -> Optional[bytes]:
+        return _imencode(".jpg", frame, [
+            cv2.IMWRITE_JPEG_QUALITY, self.quality,
+            cv2.IMWRITE_JPEG_OPTIMIZE, int(self.optimize),
+            cv2.IMWRITE_JPEG_PROGRESSIVE, int(self.progressive)
+        ])
+
+    @property
+    def spec(self) -> str:
+        return f"{'jpeg-opt' if self.optimize else 'jpeg'}:{self.quality}"
+
+    def settings(self) -> Dict[str, Any]:
+        return {"codec": self.name, "quality": self.quality,
+                "optimize": self.optimize, "progressive": self.progressive}
+
+
+@dataclass
+class WebpCodec(ImageCodec):
+    """WebP：同等画质下比JPEG小，编码较慢；quality>100 为无损"""
+    quality: int = 90
+
+    name = "webp"
+    extension = ".webp"
+
+    def encode(self, frame: np.ndarray) -> Optional[bytes]:
+        return _imencode(".webp", frame, [cv2.IMWRITE_WEBP_QUALITY, self.quality])
+
+    @property
+    def spec(self) -> str:
+        return f"webp:{self.quality}"
+
+    def settings(self) -> Dict[str, Any]:
+        return {"codec": self.name, "quality": self.quality}
+
+
+@dataclass
+class PngCodec(ImageCodec):
+    """PNG无损：压缩级别0-9，级别越低越快、文件越大"""
+    level: int = 3
+
+    name = "png"
+    extension = ".png"
+
+    def encode(self, frame: np.ndarray) -> Optional[bytes]:
+        return _imencode(".png", frame, [cv2.IMWRITE_PNG_COMPRESSION, self.level])
+
+    @property
+    def spec(self) -> str:
+        return f"png:{self.level}"
+
+    def settings(self) -> Dict[str, Any]:
+        return {"codec": self.name, "level": self.level}
+
+
+@dataclass
+class RawCodec(ImageCodec):
+    """原始 uint8 像素，保存为 .npy（不压缩，几乎没有编码开销，可 np.load 直接读取）"""
+    name = "raw"
+    extension = ".npy"
+
+    def encode(self, frame: np.ndarray) -> Optional[bytes]:
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, np.ascontiguousarray(frame, dtype=np.uint8), allow_pickle=False)
+        return buffer.getvalue()
+
+
+CODEC_NAMES = ("jpeg", "jpeg-opt", "webp", "png", "raw")
+
+# 默认与此前的导出结果一致：JPEG质量95，优化+渐进式
+DEFAULT_IMAGE_CODEC = "jpeg-opt:95"
+
+# 基准测试比较的编码器
+BENCHMARK_CODECS = ["jpeg-opt:95", "jpeg:95", "jpeg:85", "webp:90", "png:1", "png:6", "raw"]
+
+
+def create_codec(spec: str) -> ImageCodec:
+    """根据 "名称[:参数]" 创建编码器，参数为JPEG/WebP质量或PNG压缩级别"""
+    name, _, param = spec.strip().lower().partition(":")
+    try:
+        value = int(param) if param else None
+    except ValueError:
+        raise ValueError(f"无效的编码参数: {spec}")
+
+    if name in ("jpeg", "jpg", "jpeg-opt"):
+        quality = 95 if value is None else value
+        if not 0 <= quality <= 100:
+            raise ValueError(f"JPEG质量应在0-100之间: {spec}")
+        optimized = name == "jpeg-opt"
+        return JpegCodec(quality, optimize=optimized, progressive=optimized)
+    if name == "webp":
+        quality = 90 if value is None else value
+        if not 1 <= quality <= 101:
+            raise ValueError(f"WebP质量应在1-101之间: {spec}")
+        return WebpCodec(quality)
+    if name == "png":
+        level = 3 if value is None else value
+        if not 0 <= level <= 9:
+            raise ValueError(f"PNG压缩级别应在0-9之间: {spec}")
+        return PngCodec(level)
+    if name in ("raw", "npy"):
+        return RawCodec()
+    raise ValueError(f"不支持的图像编码: {spec}（可选: {', '.join(CODEC_NAMES)}）")
@@ -0,0 +1,82 @@
+"""
+多标签动作数值生成 - 向量化版本
+一次性计算整个标注的 (帧数, 45) 动作矩阵，供导出使用
+"""
+from typing import List
+import numpy as np
+from models import AnnotationMarker, LabelConfig, ProgressionType
+from styles import FacialActionConfig
+
+
+# 标签 -> 列索引（预先计算，避免逐帧 list.index 线性查找）
+LABEL_INDEX = {label: i for i, label in enumerate(FacialActionConfig.ALL_LABELS)}
+NUM_LABELS = len(FacialActionConfig.ALL_LABELS)
+
+JAW_OPEN_INDEX = LABEL_INDEX["jawOpen"]
+TONGUE_OUT_INDEX = LABEL_INDEX["tongueOut"]
+
+
+def frame_progress_array(n_frames: int) -> np.ndarray:
+    """每一帧在标注中的进度 (0.0 到 1.0)，单帧标注取0.5"""
+    if n_frames <= 0:
+        return np.zeros(0)
+    if n_frames == 1:
+        return np.full(1, 0.5)
+    return np.linspace(0.0, 1.0, n_frames)
+
+
+def build_label_matrix(labels: List[LabelConfig], progress: np.ndarray,
+                       dtype=np.float32) -> np.ndarray:
+    """根据标签配置计算给定进度序列上的动作矩阵
+
+    Args:
+        labels: 标注的标签配置列表
+        progress: 每一帧的进度 (0.0 到 1.0)
+        dtype: 结果类型；写文本文件时用 float64，保证与逐帧计算的结果逐位一致
+
+    Returns:
+        (len(progress), 45) 的矩阵
+    """
+    progress = np.asarray(progress, dtype=np.float64)
+    matrix = np.zeros((progress.shape[0], NUM_LABELS), dtype=np.float64)
+
+    has_tongue_action = False
+    has_non_tongue_out_action = False
+
+    for label_config in labels:
+        index = LABEL_INDEX.get(label_config.label)
+        if index is None:
+            continue
+
+        # 恒定进度直接广播，线性进度按进度缩放
+        if label_config.progression == ProgressionType.CONSTANT:
+            matrix[:, index] = label_config.intensity
+        else:  # LINEAR
+            matrix[:, index] = label_config.intensity * progress
+
+        if FacialActionConfig.is_tongue_action(label_config.label):
+            has_tongue_action = True
+            if label_config.label != "tongueOut":
+                has_non_tongue_out_action = True
+
+    # 确保值在有效范围内
+    np.clip(matrix, 0.0, 1.0, out=matrix)
+
+    # 舌头动作规则：整列置1
+    if has_tongue_action:
+        matrix[:, JAW_OPEN_INDEX] = 1.0
+        if has_non_tongue_out_action:
+            matrix[:, TONGUE_OUT_INDEX] = 1.0
+
+    return matrix.astype(dtype, copy=False)
+
+
+def build_annotation_label_matrix(annotation: AnnotationMarker, n_frames: int,
+                                  dtype=np.float32) -> np.ndarray:
+    """计算标注全部帧的动作矩阵 (n_frames, 45)"""
+    return build_label_matrix(annotation.labels, frame_progress_array(n_frames), dtype)
+
+
+def format_label_text(values: np.ndarray) -> str:
+    """格式化为标注文件内容 - 每行一个浮点数"""
+    return "".join(f"{value:.6f}\n" for value in np.asarray(values).tolist())
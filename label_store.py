@@ -0,0 +1,146 @@
+"""
+二进制标注存储 - labels.npy + labels_index.csv
+所有帧的45维动作数值写入一个 (N, 45) float32 的 .npy 文件，
+训练时可以直接 np.load(path, mmap_mode='r') 映射整个数据集。
+"""
+import csv
+import os
+import shutil
+from typing import List, Optional
+import numpy as np
+
+
+LABELS_NPY_NAME = "labels.npy"
+LABELS_INDEX_NAME = "labels_index.csv"
+INDEX_COLUMNS = ["row", "image", "annotation_id", "frame_index", "timestamp"]
+
+# .npy 头部固定为128字节，写完数据后原地改写行数
+_NPY_HEADER_SIZE = 128
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def _npy_header(n_rows: int, n_cols: int) -> bytes:
+    """生成固定长度的 .npy v1.0 头部"""
+    header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d, %d), }" % (n_rows, n_cols)
+    # 魔数(8) + 头长度(2) + 头部内容，以换行结尾并用空格补齐
+    header_len = _NPY_HEADER_SIZE - len(_NPY_MAGIC) - 2
+    header = header.ljust(header_len - 1) + "\n"
+    return _NPY_MAGIC + header_len.to_bytes(2, "little") + header.encode("latin1")
+
+
+def read_label_store_rows(output_dir: str, npy_name: str = LABELS_NPY_NAME) -> int:
+    """读取已有 labels.npy 头部中的行数，文件不存在时返回0"""
+    npy_path = os.path.join(output_dir, npy_name)
+    if not os.path.exists(npy_path):
+        return 0
+    with open(npy_path, "rb") as f:
+        np.lib.format.read_magic(f)
+        shape, _, _ = np.lib.format.read_array_header_1_0(f)
+        if f.tell() != _NPY_HEADER_SIZE:
+            raise ValueError(f"不是导出器写入的标注存储: {npy_path}")
+    return shape[0]
+
+
+def truncate_label_store(output_dir: str, rows: int, n_cols: int):
+    """把 labels.npy 截断到指定行数（追加导出失败时回滚），行索引由调用方截断"""
+    npy_path = os.path.join(output_dir, LABELS_NPY_NAME)
+    if not os.path.exists(npy_path):
+        return
+    with open(npy_path, "r+b") as f:
+        f.truncate(_NPY_HEADER_SIZE + rows * n_cols * 4)
+        f.seek(0)
+        f.write(_npy_header(rows, n_cols))
+
+
+class LabelStoreWriter:
+    """增量写入 labels.npy 和行索引
+
+    行数事先未知：先写入占位头部，逐行追加数据，关闭时改写头部中的行数。
+    append 为True时在已有文件末尾继续追加，行号接着已有的行数编号。
+    只应在单个线程（导出写入线程）中调用。
+    """
+
+    def __init__(self, output_dir: str, n_cols: int,
+                 npy_name: str = LABELS_NPY_NAME, index_name: str = LABELS_INDEX_NAME,
+                 append: bool = False):
+        self.npy_path = os.path.join(output_dir, npy_name)
+        self.index_path = os.path.join(output_dir, index_name)
+        self.n_cols = n_cols
+        self.rows = 0
+        self.first_row = 0     # 追加时第一条新记录的行号
+
+        if append and os.path.exists(self.npy_path) and os.path.exists(self.index_path):
+            self.rows = read_label_store_rows(output_dir, npy_name)
+            self.first_row = self.rows
+            self._npy_file = open(self.npy_path, "r+b")
+            self._npy_file.truncate(_NPY_HEADER_SIZE + self.rows * n_cols * 4)
+            self._npy_file.seek(0, os.SEEK_END)
+            self._index_file = open(self.index_path, "a", encoding="utf-8", newline="")
+            self._index_writer = csv.writer(self._index_file)
+            return
+
+        self._npy_file = open(self.npy_path, "wb")
+        self._npy_file.write(_npy_header(0, n_cols))
+
+        self._index_file = open(self.index_path, "w", encoding="utf-8", newline="")
+        self._index_writer = csv.writer(self._index_file)
+        self._index_writer.writerow(INDEX_COLUMNS)
+
+    def append(self, values: np.ndarray, image_name: str, annotation_id: str,
+               frame_index: int, timestamp: float) -> int:
+        """追加一行，返回行号"""
+        row = np.asarray(values, dtype="<f4").reshape(self.n_cols)
+        self._npy_file.write(row.tobytes())
+        self._index_writer.writerow([self.rows, image_name, annotation_id, frame_index, f"{timestamp:.6f}"])
+        self.rows += 1
+        return self.rows - 1
+
+    def close(self):
+        """写入最终行数并关闭文件"""
+        if self._npy_file is None:
+            return
+
+        self._npy_file.seek(0)
+        self._npy_file.write(_npy_header(self.rows, self.n_cols))
+        self._npy_file.close()
+        self._index_file.close()
+        self._npy_file = None
+        self._index_file = None
+
+
+def merge_label_stores(part_dirs: List[str], output_dir: str, n_cols: int, append: bool = False) -> int:
+    """合并多个分片的标注存储，行号按分片顺序重新编号，返回总行数
+
+    append 为True时追加到已有的标注存储之后。
+    """
+    writer = LabelStoreWriter(output_dir, n_cols, append=append)
+    try:
+        for part_dir in part_dirs:
+            npy_path = os.path.join(part_dir, LABELS_NPY_NAME)
+            index_path = os.path.join(part_dir, LABELS_INDEX_NAME)
+            if not os.path.exists(npy_path):
+                continue
+
+            # 数据部分直接按块复制
+            with open(npy_path, "rb") as src:
+                src.seek(_NPY_HEADER_SIZE)
+                shutil.copyfileobj(src, writer._npy_file)
+
+            with open(index_path, "r", encoding="utf-8", newline="") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for record in reader:
+                    writer._index_writer.writerow([writer.rows] + record[1:])
+                    writer.rows += 1
+    finally:
+        writer.close()
+
+    return writer.rows
+
+
+def load_label_store(output_dir: str, mmap: bool = True) -> Optional[np.ndarray]:
+    """加载 labels.npy，默认以只读内存映射方式打开"""
+    npy_path = os.path.join(output_dir, LABELS_NPY_NAME)
+    if not os.path.exists(npy_path):
+        return None
+    return np.load(npy_path, mmap_mode="r" if mmap else None)
@@ -210,6 +210,11 @@ class MultiLabelVideoAnnotationMainWindow(QMainWindow):
         export_dataset_action.triggered.connect(self.export_multi_label_dataset)
         file_menu.addAction(export_dataset_action)
 
+        export_queue_action = QAction("加入导出队列", self)
+        export_queue_action.setToolTip("保存项目并加入后台导出任务队列，适合批量导出多个录制")
+        export_queue_action.triggered.connect(self.add_to_export_queue)
+        file_menu.addAction(export_queue_action)
+
         file_menu.addSeparator()
 
         # 退出
@@ -284,6 +289,13 @@ class MultiLabelVideoAnnotationMainWindow(QMainWindow):
         else:
             QMessageBox.information(self, "提示", "请先切换到多标签标注页面")
 
+    def add_to_export_queue(self):
+        """把当前项目加入导出任务队列"""
+        if self.annotation_page:
+            self.annotation_page.add_to_export_queue()
+        else:
+            QMessageBox.information(self, "提示", "请先切换到多标签标注页面")
+
     def show_annotation_statistics(self):
         """显示标注统计"""
         if self.annotation_page and self.annotation_page.annotation_manager:
@@ -0,0 +1,128 @@
+"""
+MJPEG AVI写入 - 把收到的JPEG数据原样写入AVI文件，不解码也不重新编码
+每帧是一个 00dc 数据块，关闭时写入 idx1 索引并回填帧数，OpenCV/播放器可以直接读取和定位。
+AVI 1.0 的文件大小字段为32位，单个文件不超过4GB。
+"""
+import os
+import struct
+from array import array
+
+
+# 留出 idx1 索引的空间（每帧16字节），文件总大小保持在32位范围内
+MAX_AVI_BYTES = 0xFFFFFFFF - (64 << 20)
+
+_AVIF_HASINDEX = 0x10
+_AVIIF_KEYFRAME = 0x10
+
+
+class MjpegAviWriter:
+    """MJPEG AVI写入器
+
+    write() 写入一帧完整的JPEG数据；所有帧都是关键帧，可以逐帧定位。
+    close() 时回填文件头中的帧数和帧率，未正常关闭的文件缺少索引，但数据块本身完整。
+    """
+
+    def __init__(self, path: str, width: int, height: int, fps: float = 30.0):
+        self.path = path
+        self.width = int(width)
+        self.height = int(height)
+        self.fps = float(fps)
+        self.frame_count = 0
+        self.full = False   # 达到大小上限后不再写入
+
+        self._offsets = array("I")
+        self._sizes = array("I")
+        self._max_frame_size = 0
+
+        self._file = open(path, "wb")
+        self._write_headers()
+
+    def _write_headers(self):
+        """写入文件头，帧数、帧率等字段在关闭时回填"""
+        f = self._file
+        f.write(b"RIFF" + struct.pack("<I", 0) + b"AVI ")
+
+        # hdrl: avih(8+56) + strl LIST(12 + strh(8+56) + strf(8+40))
+        strl_size = 4 + (8 + 56) + (8 + 40)
+        hdrl_size = 4 + (8 + 56) + (8 + strl_size)
+        f.write(b"LIST" + struct.pack("<I", hdrl_size) + b"hdrl")
+
+        f.write(b"avih" + struct.pack("<I", 56))
+        self._avih_pos = f.tell()
+        f.write(struct.pack("<14I", 0, 0, 0, _AVIF_HASINDEX, 0, 0, 1, 0,
+                            self.width, self.height, 0, 0, 0, 0))
+
+        f.write(b"LIST" + struct.pack("<I", strl_size) + b"strl")
+        f.write(b"strh" + struct.pack("<I", 56))
+        self._strh_pos = f.tell()
+        f.write(b"vidsMJPG" + struct.pack("<IHHIIIIIIiI4h", 0, 0, 0, 0, 1, 30, 0, 0, 0, -1, 0,
+                                          0, 0, self.width, self.height))
+        f.write(b"strf" + struct.pack("<I", 40))
+        f.write(struct.pack("<IiiHH4sIiiII", 40, self.width, self.height, 1, 24, b"MJPG",
+                            self.width * self.height * 3, 0, 0, 0, 0))
+
+        f.write(b"LIST" + struct.pack("<I", 0))
+        self._movi_pos = f.tell()
+        f.write(b"movi")
+
+    def write(self, jpeg: bytes) -> bool:
+        """写入一帧JPEG数据，文件达到大小上限时返回False"""
+        if self.full:
+            return False
+        size = len(jpeg)
+        pos = self._file.tell()
+        if pos + 8 + size + 1 > MAX_AVI_BYTES:
+            self.full = True
+            print(f"录制文件达到AVI大小上限，停止写入: {self.path}")
+            return False
+
+        self._file.write(b"00dc" + struct.pack("<I", size))
+        self._file.write(jpeg)
+        if size % 2:
+            self._file.write(b"\0")
+        self._offsets.append(pos - self._movi_pos)
+        self._sizes.append(size)
+        self._max_frame_size = max(self._max_frame_size, size)
+        self.frame_count += 1
+        return True
+
+    def close(self, fps: float = None):
+        """写入索引并回填文件头，fps 不为空时按该帧率写入（如实测帧率）"""
+        if self._file is None:
+            return
+        if fps:
+            self.fps = float(fps)
+        f = self._file
+
+        movi_end = f.tell()
+        f.write(b"idx1" + struct.pack("<I", 16 * self.frame_count))
+        for offset, size in zip(self._offsets, self._sizes):
+            f.write(b"00dc" + struct.pack("<III", _AVIIF_KEYFRAME, offset, size))
+        file_end = f.tell()
+
+        # 帧率用 rate/scale 表示，保留三位小数
+        scale = 1000
+        rate = max(1, int(round(self.fps * scale)))
+        buffer_size = self._max_frame_size + 8
+        f.seek(4)
+        f.write(struct.pack("<I", file_end - 8))
+        f.seek(self._avih_pos)
+        f.write(struct.pack("<5I", int(round(1000000 / self.fps)) if self.fps > 0 else 0,
+                            int(buffer_size * self.fps), 0, _AVIF_HASINDEX, self.frame_count))
+        f.seek(self._avih_pos + 28)
+        f.write(struct.pack("<I", buffer_size))
+        f.seek(self._strh_pos + 20)
+        f.write(struct.pack("<IIII", scale, rate, 0, self.frame_count))
+        f.write(struct.pack("<I", buffer_size))
+        f.seek(self._movi_pos - 4)
+        f.write(struct.pack("<I", movi_end - self._movi_pos))
+
+        f.close()
+        self._file = None
+
+    @property
+    def bytes_written(self) -> int:
+        """已写入的文件大小"""
+        if self._file is None:
+            return os.path.getsize(self.path)
+        return self._file.tell()
@@ -2,6 +2,8 @@
 视频录制页面 - 支持ROI选择功能
 """
 import cv2
+import os
+import time
 import asyncio
 import websocket
 import threading
@@ -10,17 +12,26 @@ from datetime import datetime
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
     QPushButton, QGroupBox, QTextEdit, QFileDialog, QMessageBox,
-    QProgressBar, QSpinBox, QCheckBox
+    QProgressBar, QSpinBox, QCheckBox, QComboBox
 )
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QThread, pyqtSlot
 from styles import StyleSheet, ColorPalette
 from widgets import ROIVideoWidget
+from frame_transform import save_roi_sidecar
+from frame_decoder import FrameDecodePool, LatestFrameSlot, ReceivedFrame
+from video_recorder import VideoRecorder, DEFAULT_RECORD_QUEUE_SIZE
+from frame_timing import FrameRateMeter, DEFAULT_RECORD_FPS
 
 
 class WebSocketImageReceiver(QThread):
-    """WebSocket图像接收线程 - 修复版"""
+    """WebSocket图像接收线程 - 修复版
 
-    image_received = pyqtSignal(np.ndarray)
+    接收回调把JPEG字节按到达顺序直接交给 frame_sink（录制），不经过解码，解码繁忙不影响录制；
+    同时交给解码线程池解码预览，预览只保留最新一帧，通过 frame_available 通知GUI取帧，
+    GUI跟不上时旧帧直接丢弃。
+    """
+
+    frame_available = pyqtSignal()  # 预览槽中有新帧
     connection_status_changed = pyqtSignal(bool, str)  # connected, message
 
     def __init__(self, ip_address):
@@ -28,6 +39,12 @@ class WebSocketImageReceiver(QThread):
         self.ip_address = ip_address
         self.ws = None
         self.running = False
+        self.frame_count = 0
+        self.total_bytes_received = 0
+        self.decoder = FrameDecodePool(self.on_frame_decoded)
+        self.preview = LatestFrameSlot()
+        self.frame_sink = None  # 录制回调 sink(jpeg_bytes, timestamp, sequence)，在接收线程中按到达顺序调用
+        self.fps_meter = FrameRateMeter()
 
     def run(self):
         """运行WebSocket连接"""
@@ -48,6 +65,7 @@ class WebSocketImageReceiver(QThread):
             )
 
             self.running = True
+            self.decoder.start()
             # 添加ping_interval来保持连接活跃3
             self.ws.run_forever(ping_interval=30, ping_timeout=10)
 
@@ -55,6 +73,13 @@ class WebSocketImageReceiver(QThread):
             print(f"WebSocket连接异常: {e}")
             self.connection_status_changed.emit(False, f"连接失败: {str(e)}")
 
+        finally:
+            self.decoder.stop()
+            stats = self.decoder.get_stats()
+            print(f"解码统计: 接收 {stats['received']} 帧, 解码 {stats['decoded']} 帧, "
+                  f"解码失败 {stats['decode_failed']} 帧, 解码繁忙丢弃 {stats['dropped']} 帧, "
+                  f"预览跳过 {self.preview.dropped} 帧")
+
     def on_open(self, ws):
         """连接打开"""
         print("WebSocket连接已建立")
@@ -63,30 +88,25 @@ class WebSocketImageReceiver(QThread):
         self.total_bytes_received = 0
 
     def on_message(self, ws, message):
-        """接收消息 - 参考HTML实现"""
-        try:
-            # 检查消息类型
-            if isinstance(message, bytes):
-                # 二进制数据，应该是JPEG图像
-                self.total_bytes_received += len(message)
+        """接收消息 - 参考HTML实现
 
-                # 使用numpy处理字节数据
-                img_array = np.frombuffer(message, dtype=np.uint8)
-
-                # 解码JPEG图像
-                image = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-
-                if image is not None:
-                    self.image_received.emit(image)
-                else:
-                    print("图像解码失败")
-            else:
-                # 文本消息
-                pass
-
-        except Exception as e:
-            print(f"解析图像失败: {e}")
-            # 不要因为单帧解析失败就断开连接，继续尝试
+        二进制消息是JPEG图像，这里只入队，不在接收回调中解码，避免解码耗时拖慢socket读取。
+        """
+        if isinstance(message, bytes):
+            sequence = self.frame_count
+            self.frame_count += 1
+            self.total_bytes_received += len(message)
+            now = time.monotonic()
+            self.fps_meter.add(now)
+            sink = self.frame_sink
+            if sink is not None:
+                sink(message, now, sequence)
+            self.decoder.submit(message, now)
+
+    def on_frame_decoded(self, frame: ReceivedFrame):
+        """解码线程按接收顺序回调：预览只替换最新帧"""
+        if self.preview.publish(frame):
+            self.frame_available.emit()
 
     def on_error(self, ws, error):
         """连接错误"""
@@ -115,45 +135,6 @@ class WebSocketImageReceiver(QThread):
             self.ws.close()
 
 
-class VideoRecorder:
-    """视频录制器"""
-
-    def __init__(self):
-        self.writer = None
-        self.is_recording = False
-        self.frame_count = 0
-        self.output_path = ""
-
-    def start_recording(self, output_path: str, frame_size: tuple):
-        """开始录制"""
-        try:
-            self.output_path = output_path
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            self.writer = cv2.VideoWriter(output_path, fourcc, 30, frame_size)
-            self.is_recording = True
-            self.frame_count = 0
-            print(f"开始录制到: {output_path}, 尺寸: {frame_size}")
-            return True
-        except Exception as e:
-            print(f"开始录制失败: {e}")
-            return False
-
-    def write_frame(self, frame: np.ndarray):
-        """写入帧"""
-        if self.is_recording and self.writer:
-            self.writer.write(frame)
-            self.frame_count += 1
-
-    def stop_recording(self):
-        """停止录制"""
-        if self.writer:
-            self.writer.release()
-            self.writer = None
-        self.is_recording = False
-        print(f"录制停止，共录制 {self.frame_count} 帧")
-        return self.output_path, self.frame_count
-
-
 class RecordingPage(QWidget):
     """视频录制页面 - 支持ROI功能"""
 
@@ -175,12 +156,21 @@ class RecordingPage(QWidget):
         self.record_button = None
         self.save_path_input = None
         self.frame_counter = None
+        self.preview_drop_label = None
+        self.record_queue_label = None
         self.recording_time_label = None
 
         # ROI相关UI组件
         self.roi_enabled_checkbox = None
         self.roi_reset_button = None
+        self.roi_crop_checkbox = None
         self.roi_info_label = None
+        self.passthrough_checkbox = None
+        self.queue_size_spinbox = None
+        self.overflow_combo = None
+        self.timing_combo = None
+        self.target_fps_spinbox = None
+        self.input_fps_label = None
 
         # 状态
         self.is_connected = False
@@ -273,6 +263,12 @@ class RecordingPage(QWidget):
         self.roi_reset_button.clicked.connect(self.reset_roi)
         layout.addWidget(self.roi_reset_button)
 
+        # 不裁剪时录制完整画面，ROI保存到视频旁的 .roi.json，导出时再裁剪
+        self.roi_crop_checkbox = QCheckBox("录制时裁剪")
+        self.roi_crop_checkbox.setChecked(True)
+        self.roi_crop_checkbox.setToolTip("取消勾选时录制完整画面，ROI仅保存下来供导出数据集时裁剪")
+        layout.addWidget(self.roi_crop_checkbox)
+
         # ROI信息显示
         self.roi_info_label = QLabel("ROI: 未设置")
         self.roi_info_label.setStyleSheet("color: #999; font-size: 11px;")
@@ -307,6 +303,48 @@ class RecordingPage(QWidget):
         # 录制参数
         params_layout = QHBoxLayout()
 
+        self.passthrough_checkbox = QCheckBox("直通录制JPEG (MJPEG AVI)")
+        self.passthrough_checkbox.setChecked(True)
+        self.passthrough_checkbox.setToolTip("把收到的JPEG帧原样写入AVI文件，不重新编码，CPU占用低且没有画质损失；"
+                                             "录制时裁剪ROI则只对裁剪区域重新编码JPEG")
+        self.passthrough_checkbox.toggled.connect(self.on_passthrough_changed)
+        params_layout.addWidget(self.passthrough_checkbox)
+
+        # 录制队列：写入跟不上时缓存的帧数和队列满时的处理方式
+        params_layout.addWidget(QLabel("录制队列:"))
+        self.queue_size_spinbox = QSpinBox()
+        self.queue_size_spinbox.setRange(8, 1000)
+        self.queue_size_spinbox.setValue(DEFAULT_RECORD_QUEUE_SIZE)
+        self.queue_size_spinbox.setSuffix(" 帧")
+        params_layout.addWidget(self.queue_size_spinbox)
+
+        self.overflow_combo = QComboBox()
+        self.overflow_combo.addItem("队列满时暂停接收（录制不丢帧）", "block")
+        self.overflow_combo.addItem("队列满时丢弃最旧帧", "drop_oldest")
+        self.overflow_combo.addItem("队列满时丢弃新帧", "drop_newest")
+        self.overflow_combo.setToolTip("暂停接收：写入跟不上时接收线程等待，录制不丢帧，但预览和网络接收会暂停，"
+                                       "持续卡顿时可能导致设备端缓冲溢出或断线\n"
+                                       "丢弃：接收不受影响，丢弃的帧计入\"录制丢帧\"\n"
+                                       "预览解码繁忙时丢弃的帧只影响预览，单独显示，不影响录制")
+        params_layout.addWidget(self.overflow_combo)
+
+        # 录制计时：按实测帧率写入每一帧，或按到达时间重复/丢弃帧得到恒定帧率
+        self.timing_combo = QComboBox()
+        self.timing_combo.addItem("按实测帧率录制", "measured")
+        self.timing_combo.addItem("恒定帧率录制", "constant")
+        self.timing_combo.setToolTip("实测帧率：写入每一帧，视频帧率为实际输入帧率\n"
+                                     "恒定帧率：按帧到达时间重复或丢弃帧，视频第i帧对应录制开始后 i/帧率 秒\n"
+                                     "两种方式都在视频旁保存逐帧到达时间（.timestamps.csv）")
+        self.timing_combo.currentIndexChanged.connect(self.on_timing_mode_changed)
+        params_layout.addWidget(self.timing_combo)
+
+        self.target_fps_spinbox = QSpinBox()
+        self.target_fps_spinbox.setRange(1, 120)
+        self.target_fps_spinbox.setValue(int(DEFAULT_RECORD_FPS))
+        self.target_fps_spinbox.setSuffix(" fps")
+        self.target_fps_spinbox.setEnabled(False)
+        params_layout.addWidget(self.target_fps_spinbox)
+
         params_layout.addStretch()
 
         # 自动生成文件名按钮
@@ -343,8 +381,14 @@ class RecordingPage(QWidget):
         # 录制信息显示
         info_layout = QVBoxLayout()
         self.frame_counter = QLabel("帧数: 0")
+        self.input_fps_label = QLabel("输入帧率: -")
+        self.preview_drop_label = QLabel("预览跳过: 0 | 解码丢弃: 0")
+        self.record_queue_label = QLabel("录制队列: 0 | 录制丢帧: 0")
         self.recording_time_label = QLabel("录制时间: 00:00")
         info_layout.addWidget(self.frame_counter)
+        info_layout.addWidget(self.input_fps_label)
+        info_layout.addWidget(self.preview_drop_label)
+        info_layout.addWidget(self.record_queue_label)
         info_layout.addWidget(self.recording_time_label)
         control_layout.addLayout(info_layout)
 
@@ -373,7 +417,8 @@ class RecordingPage(QWidget):
 
         # 创建WebSocket接收器，不使用端口参数（因为使用/ws路径）
         self.ws_receiver = WebSocketImageReceiver(ip)
-        self.ws_receiver.image_received.connect(self.on_image_received)
+        self.ws_receiver.frame_available.connect(self.on_frame_available)
+        self.ws_receiver.frame_sink = self.recorder.write_frame
         self.ws_receiver.connection_status_changed.connect(self.on_connection_status_changed)
         self.ws_receiver.start()
 
@@ -399,27 +444,50 @@ class RecordingPage(QWidget):
         if self.roi_enabled_checkbox.isChecked():
             self.roi_reset_button.setEnabled(True)
 
-    @pyqtSlot(np.ndarray)
-    def on_image_received(self, image):
-        """接收到图像"""
-        self.current_frame = image.copy()
+    @pyqtSlot()
+    def on_frame_available(self):
+        """预览槽中有新帧 - 只显示最新一帧（录制已在接收线程中收到每一帧）"""
+        if self.ws_receiver is None:
+            return
+        frame = self.ws_receiver.preview.take()
+        if frame is None:
+            return
 
-        # 更新显示
-        self.video_display.update_image(image)
+        # 解码出的图像不会再被修改，不需要复制
+        self.current_frame = frame.image
+        self.video_display.update_image(frame.image)
 
-        # 如果正在录制，处理并写入帧
+        self.preview_drop_label.setText(f"预览跳过: {self.ws_receiver.preview.dropped} | "
+                                        f"解码丢弃: {self.ws_receiver.decoder.dropped}")
+        self.input_fps_label.setText(f"输入帧率: {self.ws_receiver.fps_meter.fps:.1f} fps")
         if self.recorder.is_recording:
-            # 获取要保存的图像（可能经过ROI裁剪）
-            frame_to_save = self.get_frame_for_recording(image)
-            self.recorder.write_frame(frame_to_save)
-            self.frame_counter.setText(f"帧数: {self.recorder.frame_count}")
+            self.update_recording_stats()
+
+    def update_recording_stats(self):
+        """更新录制帧数、队列深度和录制丢帧数"""
+        stats = self.recorder.get_stats()
+        frame_text = f"帧数: {stats['written']}"
+        if self.recorder.timing_mode == "constant":
+            frame_text += f" (重复 {stats['duplicated']} / 丢弃 {stats['rate_dropped']})"
+        self.frame_counter.setText(frame_text)
+        # 录制丢帧包括队列满丢弃的帧和无法解码的无效帧；预览解码丢弃的帧不影响录制，单独显示
+        self.record_queue_label.setText(
+            f"录制队列: {stats['queue_depth']}/{self.recorder.queue_size} | "
+            f"录制丢帧: {stats['dropped'] + stats['decode_failed']}")
 
     def get_frame_for_recording(self, image: np.ndarray) -> np.ndarray:
         """获取用于录制的帧（应用ROI裁剪）"""
-        if self.video_display.has_valid_roi():
+        if self.video_display.has_valid_roi() and self.roi_crop_checkbox.isChecked():
             return self.video_display.get_cropped_image(image)
         return image
 
+    def get_recording_roi(self):
+        """录制时裁剪的ROI (x, y, w, h)，不裁剪时返回None"""
+        if self.video_display.has_valid_roi() and self.roi_crop_checkbox.isChecked():
+            roi_rect = self.video_display.get_original_roi()
+            return (roi_rect.x(), roi_rect.y(), roi_rect.width(), roi_rect.height())
+        return None
+
     @pyqtSlot(bool, str)
     def on_connection_status_changed(self, connected, message):
         """连接状态改变"""
@@ -471,16 +539,31 @@ class RecordingPage(QWidget):
         self.roi_rect = None
         self.status_label.setText("ROI已重置")
 
+    def on_timing_mode_changed(self, index: int):
+        """只有恒定帧率录制需要设置目标帧率"""
+        self.target_fps_spinbox.setEnabled(self.timing_combo.currentData() == "constant")
+
+    def recording_extension(self) -> str:
+        """当前录制模式的文件扩展名"""
+        return ".avi" if self.passthrough_checkbox.isChecked() else ".mp4"
+
+    def on_passthrough_changed(self, checked: bool):
+        """切换录制模式时同步修改保存路径的扩展名"""
+        save_path = self.save_path_input.text().strip()
+        if save_path:
+            self.save_path_input.setText(os.path.splitext(save_path)[0] + self.recording_extension())
+
     def browse_save_path(self):
         """浏览保存路径"""
         # 获取当前文件名作为默认值
-        current_filename = self.save_path_input.text() or f"recording_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+        extension = self.recording_extension()
+        current_filename = self.save_path_input.text() or f"recording_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
 
         file_path, _ = QFileDialog.getSaveFileName(
             self,
             "选择保存路径",
             current_filename,
-            "视频文件 (*.mp4);;所有文件 (*)"
+            f"视频文件 (*{extension});;所有文件 (*)"
         )
 
         if file_path:
@@ -489,7 +572,7 @@ class RecordingPage(QWidget):
     def generate_filename(self):
         """生成新的文件名"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"recording_{timestamp}.mp4"
+        filename = f"recording_{timestamp}{self.recording_extension()}"
         self.save_path_input.setText(filename)
 
         # 显示提示信息
@@ -513,6 +596,12 @@ class RecordingPage(QWidget):
             QMessageBox.warning(self, "警告", "请设置保存路径")
             return
 
+        # MJPEG数据只能写入AVI容器，mp4v编码写入MP4
+        passthrough = self.passthrough_checkbox.isChecked()
+        if os.path.splitext(save_path)[1].lower() != self.recording_extension():
+            save_path = os.path.splitext(save_path)[0] + self.recording_extension()
+            self.save_path_input.setText(save_path)
+
         # 获取用于录制的帧（可能经过ROI裁剪）
         frame_for_recording = self.get_frame_for_recording(self.current_frame)
         h, w = frame_for_recording.shape[:2]
@@ -524,7 +613,13 @@ class RecordingPage(QWidget):
             return
 
         # 开始录制
-        if self.recorder.start_recording(save_path, frame_size):
+        # ROI在录制期间锁定，录制线程按开始时的ROI裁剪
+        self.recorder.queue_size = self.queue_size_spinbox.value()
+        self.recorder.overflow_policy = self.overflow_combo.currentData()
+        self.recorder.timing_mode = self.timing_combo.currentData()
+        self.recorder.target_fps = float(self.target_fps_spinbox.value())
+        fps_hint = self.ws_receiver.fps_meter.fps if self.ws_receiver else 0.0
+        if self.recorder.start_recording(save_path, frame_size, self.get_recording_roi(), passthrough, fps_hint):
             self.record_button.setText("停止录制")
             self.record_button.setStyleSheet(f"QPushButton {{ background-color: {ColorPalette.ERROR}; }}")
 
@@ -543,6 +638,12 @@ class RecordingPage(QWidget):
             # 禁用ROI相关控件，防止录制时修改
             self.roi_enabled_checkbox.setEnabled(False)
             self.roi_reset_button.setEnabled(False)
+            self.roi_crop_checkbox.setEnabled(False)
+            self.passthrough_checkbox.setEnabled(False)
+            self.queue_size_spinbox.setEnabled(False)
+            self.overflow_combo.setEnabled(False)
+            self.timing_combo.setEnabled(False)
+            self.target_fps_spinbox.setEnabled(False)
         else:
             QMessageBox.critical(self, "错误", "开始录制失败")
 
@@ -558,23 +659,32 @@ class RecordingPage(QWidget):
 
         # 重新启用ROI控件
         self.roi_enabled_checkbox.setEnabled(True)
+        self.roi_crop_checkbox.setEnabled(True)
+        self.passthrough_checkbox.setEnabled(True)
+        self.queue_size_spinbox.setEnabled(True)
+        self.overflow_combo.setEnabled(True)
+        self.timing_combo.setEnabled(True)
+        self.on_timing_mode_changed(self.timing_combo.currentIndex())
+        self.update_recording_stats()
         if self.roi_enabled_checkbox.isChecked():
             self.roi_reset_button.setEnabled(True)
 
         if frame_count > 0:
+            self.save_recording_roi(output_path)
+
             # 显示录制完成信息
             roi_info = ""
             if self.video_display.has_valid_roi():
                 roi_rect = self.video_display.get_original_roi()
                 roi_info = f" (ROI区域: {roi_rect.width()}×{roi_rect.height()})"
 
-            self.status_label.setText(f"录制完成 - 共 {frame_count} 帧{roi_info}")
+            self.status_label.setText(f"录制完成 - 共 {frame_count} 帧, {self.recorder.fps:g} fps{roi_info}")
 
             # 询问是否打开标注页面
             reply = QMessageBox.question(
                 self,
                 "录制完成",
-                f"录制完成！\n文件保存到: {output_path}\n共录制 {frame_count} 帧{roi_info}\n\n是否切换到标注页面？",
+                f"录制完成！\n文件保存到: {output_path}\n共录制 {frame_count} 帧 ({self.recorder.fps:g} fps){roi_info}\n\n是否切换到标注页面？",
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
             )
 
@@ -583,6 +693,19 @@ class RecordingPage(QWidget):
         else:
             self.status_label.setText("录制失败")
 
+    def save_recording_roi(self, output_path: str):
+        """把录制时的ROI保存到视频旁，导出数据集时可以复用"""
+        if not self.video_display.has_valid_roi() or self.current_frame is None:
+            return
+        roi_rect = self.video_display.get_original_roi()
+        h, w = self.current_frame.shape[:2]
+        save_roi_sidecar(
+            output_path,
+            (roi_rect.x(), roi_rect.y(), roi_rect.width(), roi_rect.height()),
+            (w, h),
+            cropped=self.roi_crop_checkbox.isChecked()
+        )
+
     def update_recording_time(self):
         """更新录制时间显示"""
         if self.recording_start_time:
@@ -591,6 +714,8 @@ class RecordingPage(QWidget):
             minutes = seconds // 60
             seconds = seconds % 60
             self.recording_time_label.setText(f"录制时间: {minutes:02d}:{seconds:02d}")
+            # 没有新的预览帧时也刷新录制队列状态
+            self.update_recording_stats()
 
     def closeEvent(self, event):
         """关闭事件"""
@@ -52,7 +52,14 @@ def check_file_integrity():
     required_files = [
         'app.py', 'main_window.py', 'annotation_page.py',
         'recording_page.py', 'annotation_manager.py', 'models.py',
-        'styles.py', 'utils.py', 'video_player.py', 'dataset_exporter.py'
+        'styles.py', 'utils.py', 'video_player.py', 'dataset_exporter.py',
+        'export_pipeline.py', 'export_dialog.py', 'label_generator.py',
+        'label_store.py', 'shard_writer.py', 'export_manifest.py',
+        'export_log.py', 'export_estimator.py', 'frame_sampler.py',
+        'frame_transform.py', 'image_codec.py', 'frame_cache.py',
+        'export_queue.py', 'export_stats.py', 'dataset_split.py',
+        'dataset_append.py', 'frame_decoder.py', 'mjpeg_writer.py',
+        'video_recorder.py', 'frame_timing.py'
     ]
     
     missing_files = []
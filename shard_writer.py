@@ -0,0 +1,115 @@
+"""
+tar分片输出 - WebDataset风格
+每个样本在tar中占两个成员: <key>.jpg（编码后的图像）和 <key>.npy（45维float32标注），
+分片写满指定大小后切换到下一个文件，顺序写入便于拷贝和流式读取。
+"""
+import io
+import os
+import tarfile
+import time
+from typing import List, Dict, Any
+import numpy as np
+
+
+DEFAULT_SHARD_MAX_BYTES = 1024 ** 3   # 每个分片约1GB
+SHARD_INDEX_NAME = "index.json"
+
+_TAR_BLOCK_SIZE = 512
+
+
+def tar_member_size(data_size: int) -> int:
+    """tar成员实际占用的字节数：512字节头 + 按512字节对齐的数据"""
+    return _TAR_BLOCK_SIZE + (data_size + _TAR_BLOCK_SIZE - 1) // _TAR_BLOCK_SIZE * _TAR_BLOCK_SIZE
+
+
+def encode_label_record(values: np.ndarray) -> bytes:
+    """把45维标注编码为 .npy 字节"""
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(values, dtype="<f4"))
+    return buffer.getvalue()
+
+
+class TarShardWriter:
+    """顺序写入固定大小的tar分片
+
+    只应在单个线程（导出写入线程）中调用。
+    """
+
+    def __init__(self, shards_dir: str, prefix: str = "shard",
+                 max_bytes: int = DEFAULT_SHARD_MAX_BYTES):
+        self.shards_dir = shards_dir
+        self.prefix = prefix
+        self.max_bytes = max(1, int(max_bytes))
+
+        self.shards: List[Dict[str, Any]] = []   # 已完成分片的索引信息
+        self._tar = None
+        self._current = None
+
+    def add(self, key: str, image_bytes: bytes, image_ext: str, label_values: np.ndarray) -> str:
+        """写入一个样本，返回所在分片的文件名"""
+        label_bytes = encode_label_record(label_values)
+        record_size = tar_member_size(len(image_bytes)) + tar_member_size(len(label_bytes))
+
+        # 当前分片放不下时切换到新分片（空分片总是接收，避免超大样本死循环）
+        if self._current is None or (
+                self._current["samples"] > 0 and self._current["bytes"] + record_size > self.max_bytes):
+            self._open_next()
+
+        mtime = int(time.time())   # 整数时间戳，避免生成额外的PAX扩展头
+        self._add_member(f"{key}{image_ext}", image_bytes, mtime)
+        self._add_member(f"{key}.npy", label_bytes, mtime)
+
+        self._current["samples"] += 1
+        self._current["bytes"] += record_size
+        if self._current["first_key"] is None:
+            self._current["first_key"] = key
+        self._current["last_key"] = key
+        return self._current["file"]
+
+    def close(self):
+        """关闭当前分片"""
+        if self._tar is not None:
+            self._tar.close()
+            self._current["bytes"] = os.path.getsize(os.path.join(self.shards_dir, self._current["file"]))
+            self.shards.append(self._current)
+            self._tar = None
+            self._current = None
+
+    def _open_next(self):
+        """开始一个新分片"""
+        self.close()
+        file_name = f"{self.prefix}-{len(self.shards):06d}.tar"
+        self._tar = tarfile.open(os.path.join(self.shards_dir, file_name), "w")
+        self._current = {
+            "file": file_name,
+            "samples": 0,
+            "bytes": 0,
+            "first_key": None,
+            "last_key": None
+        }
+
+    def _add_member(self, name: str, data: bytes, mtime: int):
+        """向tar追加一个成员"""
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = mtime
+        self._tar.addfile(info, io.BytesIO(data))
+
+
+def iter_shard_samples(shard_path: str):
+    """按顺序读取分片中的样本，产出 (key, image_bytes, label_values)"""
+    with tarfile.open(shard_path, "r") as tar:
+        pending = {}
+        for member in tar:
+            if not member.isfile():
+                continue
+            key, ext = os.path.splitext(member.name)
+            data = tar.extractfile(member).read()
+            pending.setdefault(key, {})[ext] = data
+
+            sample = pending[key]
+            if ".npy" in sample and len(sample) == 2:
+                image_bytes = next(v for k, v in sample.items() if k != ".npy")
+                labels = np.load(io.BytesIO(sample[".npy"]))
+                del pending[key]
+                yield key, image_bytes, labels
@@ -0,0 +1,58 @@
+"""
+追加导出测试
+"""
+import os
+import cv2
+import numpy as np
+import dataset_exporter
+from dataset_exporter import MultiLabelDatasetExporter
+from models import AnnotationMarker, LabelConfig
+
+
+def _make_video(path, shade, frames=60, fps=30.0):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), (shade + i * 3) % 256, dtype=np.uint8))
+    writer.release()
+
+
+def _annotations():
+    return [
+        AnnotationMarker(start_time=i * 0.4, end_time=i * 0.4 + 0.2, id=f"marker_{i}",
+                         labels=[LabelConfig("jawOpen")])
+        for i in range(4)
+    ]
+
+
+def _export(video, output_dir, **options):
+    exporter = MultiLabelDatasetExporter(str(video), _annotations(), str(output_dir), 30.0,
+                                         encoder_workers=2, label_format="both", append=True, **options)
+    return exporter.export_dataset()
+
+
+def _snapshot(output_dir):
+    files = {name: sorted(os.listdir(os.path.join(output_dir, name))) for name in ("images", "labels")}
+    for name in ("labels_index.csv", "frame_details.jsonl", "labels.npy", "dataset_info.json"):
+        with open(os.path.join(output_dir, name), "rb") as f:
+            files[name] = f.read()
+    return files
+
+
+def test_failed_sharded_append_is_rolled_back(tmp_path, monkeypatch):
+    """分片进程写入图像后、合并索引前失败，回滚删除全部追加的文件"""
+    first, second = tmp_path / "first.avi", tmp_path / "second.avi"
+    _make_video(first, 0)
+    _make_video(second, 128)
+    output_dir = tmp_path / "dataset"
+
+    assert _export(first, output_dir)
+    before = _snapshot(output_dir)
+
+    def fail_merge(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(dataset_exporter, "merge_frame_details", fail_merge)
+    assert not _export(second, output_dir, shard_workers=2)
+
+    assert _snapshot(output_dir) == before
+    assert not os.path.exists(os.path.join(output_dir, ".append_checkpoint.json"))
@@ -0,0 +1,43 @@
+"""
+数据集划分测试
+"""
+from dataset_split import SPLIT_NAMES, assign_splits
+
+
+def _count(assignments):
+    counts = {name: 0 for name in SPLIT_NAMES}
+    for split in assignments.values():
+        counts[split] += 1
+    return counts
+
+
+def test_small_mixed_project_has_train():
+    """小项目中每个标签组合只有少量标注时，训练集不能为空"""
+    annotations = [
+        ("marker_1700000000001", ["jawOpen"]),
+        ("marker_1700000000002", ["jawOpen"]),
+        ("marker_1700000000003", ["tongueOut"]),
+        ("marker_1700000000004", ["tongueOut"]),
+    ]
+    for seed in ("", "1", "2", "abc"):
+        counts = _count(assign_splits(annotations, (0.6, 0.2, 0.2), stratify=True, seed=seed))
+        assert counts["train"] > 0
+        assert sum(counts.values()) == len(annotations)
+
+
+def test_singleton_groups_do_not_share_split():
+    """每个标签组合只有一个标注时，不会全部落到同一个子集"""
+    annotations = [(f"ann_{i}", [f"label_{i}"]) for i in range(10)]
+    counts = _count(assign_splits(annotations, (0.6, 0.2, 0.2), stratify=True))
+    assert counts == {"train": 6, "val": 2, "test": 2}
+
+
+def test_large_groups_follow_ratios():
+    """足够大的标签组合按比例精确分配"""
+    annotations = [(f"jaw_{i}", ["jawOpen"]) for i in range(50)] + \
+                  [(f"tongue_{i}", ["tongueOut"]) for i in range(30)]
+    assignments = assign_splits(annotations, (0.6, 0.2, 0.2), stratify=True)
+    jaw = _count({k: v for k, v in assignments.items() if k.startswith("jaw_")})
+    tongue = _count({k: v for k, v in assignments.items() if k.startswith("tongue_")})
+    assert jaw == {"train": 30, "val": 10, "test": 10}
+    assert tongue == {"train": 18, "val": 6, "test": 6}
@@ -0,0 +1,33 @@
+"""
+导出错误记录测试
+"""
+import dataset_exporter
+from dataset_exporter import MultiLabelDatasetExporter
+from test_incremental_export import _annotations, _make_video
+
+
+def test_annotation_errors_are_counted_and_logged(tmp_path, monkeypatch, capsys):
+    """处理标注时的异常计入失败统计并写入导出日志，不直接打印"""
+    video = tmp_path / "video.avi"
+    _make_video(video)
+    original = dataset_exporter.build_annotation_label_matrix
+
+    def fail_second(annotation, *args, **kwargs):
+        if annotation.id == "marker_1":
+            raise ValueError("bad labels")
+        return original(annotation, *args, **kwargs)
+
+    monkeypatch.setattr(dataset_exporter, "build_annotation_label_matrix", fail_second)
+    for fast_path in (False, True):
+        exporter = MultiLabelDatasetExporter(str(video), _annotations(), str(tmp_path / f"out_{fast_path}"), 30.0,
+                                             encoder_workers=2, fast_path=fast_path)
+        assert exporter.export_dataset()
+        assert exporter.stats["failure_counts"]["annotation_failed"] == 1
+        errors = " ".join(exporter.log.messages(0, "error"))
+        if fast_path:
+            # 快速模式只保留每类的第一条信息，日志中记录汇总
+            assert "bad labels" in exporter.stats["failure_examples"]["annotation_failed"]
+            assert "annotation_failed" in errors
+        else:
+            assert "bad labels" in errors
+    assert "bad labels" not in capsys.readouterr().out
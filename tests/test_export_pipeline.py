@@ -0,0 +1,28 @@
+"""
+导出流水线测试
+"""
+from export_pipeline import ExportPipeline, FrameExportJob
+
+
+def test_write_errors_are_reported():
+    """写入线程中的异常交给 on_write_error，其余任务继续写入"""
+    written, errors = [], []
+
+    def encode(job):
+        job.encoded = b"x"
+
+    def write(job):
+        if job.frame_name.endswith("3"):
+            raise OSError("disk full")
+        written.append(job.frame_name)
+
+    pipeline = ExportPipeline(encode, write, workers=2,
+                              on_write_error=lambda job, e: errors.append((job.frame_name, str(e))))
+    pipeline.start()
+    for i in range(10):
+        pipeline.submit(FrameExportJob(None, f"frame_{i}", "", ""))
+    pipeline.close()
+
+    assert errors == [("frame_3", "disk full")]
+    assert pipeline.write_errors == 1
+    assert len(written) == 9
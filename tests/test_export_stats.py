@@ -0,0 +1,30 @@
+"""
+导出统计合并测试
+"""
+from export_stats import merge_counts
+
+
+def _session(images, max_labels, example):
+    return {
+        "exported_images": images,
+        "total_annotations": 4,
+        "multi_label_stats": {"single_label": 3, "multi_label": 1, "max_labels_per_annotation": max_labels},
+        "failure_counts": {"decode_failed": 1},
+        "failure_examples": {"decode_failed": example},
+        "tar_shards": [{"file": f"shard-{images}.tar"}],
+        "average_frames": images / 4
+    }
+
+
+def test_merge_two_sessions():
+    """两次追加会话的统计：计数相加，最大值取最大，派生的平均值不相加"""
+    merged = merge_counts(_session(40, 2, "first"), _session(20, 2, "second"))
+    assert merged["exported_images"] == 60
+    assert merged["total_annotations"] == 8
+    assert merged["multi_label_stats"] == {"single_label": 6, "multi_label": 2, "max_labels_per_annotation": 2}
+    assert merged["failure_counts"] == {"decode_failed": 2}
+    assert merged["failure_examples"] == {"decode_failed": "first"}
+    assert len(merged["tar_shards"]) == 2
+    assert merged["average_frames"] == 5.0
+
+    assert merge_counts(_session(40, 1, "a"), _session(20, 3, "b"))["multi_label_stats"]["max_labels_per_annotation"] == 3
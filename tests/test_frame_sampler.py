@@ -0,0 +1,30 @@
+"""
+帧采样和去重测试
+"""
+import numpy as np
+from frame_sampler import DuplicateFilter, frame_dhash, hash_distance
+
+
+def _gradient(reverse=False):
+    row = np.linspace(0, 255, 64, dtype=np.uint8)
+    frame = np.tile(row[::-1] if reverse else row, (48, 1))
+    return np.dstack([frame] * 3)
+
+
+def test_hash_distance():
+    assert hash_distance(0, 0) == 0
+    assert hash_distance(0b1011, 0b0001) == 2
+    assert hash_distance(0, (1 << 64) - 1) == 64
+
+
+def test_duplicate_filter_compares_hamming_distance():
+    """与上一个保留帧的汉明距离不超过阈值的帧被过滤"""
+    frame = _gradient()
+    different = _gradient(reverse=True)
+    assert hash_distance(frame_dhash(frame), frame_dhash(different)) > 8
+
+    dedup = DuplicateFilter(max_distance=8)
+    assert not dedup.is_duplicate(frame)
+    assert dedup.is_duplicate(frame.copy())
+    assert not dedup.is_duplicate(different)
+    assert dedup.is_duplicate(different)
@@ -0,0 +1,49 @@
+"""
+逐帧时间戳映射测试
+"""
+import numpy as np
+import pytest
+from dataset_exporter import annotation_frame_range
+from export_estimator import count_export_frames
+from frame_timing import TimestampWriter, frame_range_at, load_frame_timestamps, load_time_base
+from models import AnnotationMarker
+
+
+def _marker(start, end):
+    return AnnotationMarker(start_time=start, end_time=end, id="marker_1")
+
+
+def _write_sidecar(video_path, times):
+    writer = TimestampWriter(str(video_path))
+    for i, seconds in enumerate(times):
+        writer.write(i, i * 2, seconds)
+    writer.close()
+
+
+def test_frame_range_follows_arrival_times():
+    """到达时间不均匀时按真实时间取帧，而不是按名义帧率换算"""
+    times = np.array([0.0, 0.1, 0.2, 0.5, 0.6, 1.0])
+    assert frame_range_at(times, 0.15, 0.55) == (2, 3)
+    assert frame_range_at(times, 0.0, 10.0) == (0, 5)
+    # 区间内没有帧时取最接近起点的一帧
+    assert frame_range_at(times, 0.7, 0.8) == (4, 4)
+    assert frame_range_at(times, 5.0, 6.0) == (5, 5)
+
+
+def test_annotation_frame_range_uses_sidecar(tmp_path):
+    video = tmp_path / "rec.avi"
+    _write_sidecar(video, [0.0, 0.1, 0.2, 0.5, 0.6, 1.0])
+    frame_times = load_time_base(str(video), "arrival")
+    assert list(frame_times) == list(load_frame_timestamps(str(video)))
+
+    marker = _marker(0.15, 0.55)
+    assert annotation_frame_range(marker, 10.0) == (1, 5)
+    assert annotation_frame_range(marker, 10.0, frame_times) == (2, 3)
+    assert count_export_frames([marker], 10.0, frame_times=frame_times)[0] == 2
+
+
+def test_time_base_defaults_to_video(tmp_path):
+    video = tmp_path / "rec.avi"
+    assert load_time_base(str(video), "video") is None
+    with pytest.raises(ValueError):
+        load_time_base(str(video), "arrival")
@@ -0,0 +1,25 @@
+"""
+图像编码器测试
+"""
+from dataclasses import dataclass
+import numpy as np
+import pytest
+from image_codec import ImageCodec, BENCHMARK_CODECS, create_codec
+
+
+def test_incomplete_codec_fails_at_construction():
+    @dataclass
+    class NoEncodeCodec(ImageCodec):
+        quality: int = 90
+        name = "broken"
+
+    with pytest.raises(TypeError):
+        NoEncodeCodec()
+
+
+def test_builtin_codecs_encode():
+    frame = np.zeros((8, 8, 3), dtype=np.uint8)
+    for spec in BENCHMARK_CODECS:
+        codec = create_codec(spec)
+        assert codec.encode(frame)
+        assert create_codec(codec.spec).settings() == codec.settings()
@@ -0,0 +1,84 @@
+"""
+增量导出测试
+"""
+import csv
+import json
+import os
+import cv2
+import numpy as np
+from dataset_exporter import MultiLabelDatasetExporter
+from models import AnnotationMarker, LabelConfig
+
+
+def _make_video(path, frames=60, fps=30.0):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), i * 4 % 256, dtype=np.uint8))
+    writer.release()
+
+
+def _annotations():
+    return [
+        AnnotationMarker(start_time=i * 0.4, end_time=i * 0.4 + 0.2, id=f"marker_{i}",
+                         labels=[LabelConfig("jawOpen" if i % 2 else "mouthSmileLeft")])
+        for i in range(4)
+    ]
+
+
+def _export(video, annotations, output_dir, **options):
+    exporter = MultiLabelDatasetExporter(str(video), annotations, str(output_dir), 30.0,
+                                         encoder_workers=2, label_format="both", incremental=True,
+                                         split_ratios=(0.5, 0.25, 0.25), **options)
+    assert exporter.export_dataset()
+    return exporter
+
+
+def _assert_indexes_complete(output_dir, expected_rows):
+    with open(os.path.join(output_dir, "labels_index.csv"), encoding="utf-8") as f:
+        images = [row["image"] for row in csv.DictReader(f)]
+    with open(os.path.join(output_dir, "frame_details.jsonl"), encoding="utf-8") as f:
+        details = [json.loads(line)["image"] for line in f if line.strip()]
+    split_images = []
+    for name in os.listdir(os.path.join(output_dir, "splits")):
+        with open(os.path.join(output_dir, "splits", name), encoding="utf-8") as f:
+            split_images += [os.path.basename(line.strip()) for line in f if line.strip()]
+
+    assert len(images) == expected_rows
+    assert sorted(details) == sorted(images)
+    assert sorted(split_images) == sorted(images)
+    for image in images:
+        assert os.path.exists(os.path.join(output_dir, "images", image))
+        label = os.path.splitext(image)[0] + ".txt"
+        assert os.path.exists(os.path.join(output_dir, "labels", label))
+    assert len(os.listdir(os.path.join(output_dir, "images"))) == expected_rows
+
+
+def test_deleting_an_annotation_keeps_reused_files(tmp_path):
+    """删除第一个标注后增量导出，其余标注复用的文件和索引仍然一致"""
+    video = tmp_path / "video.avi"
+    _make_video(video)
+    output_dir = tmp_path / "dataset"
+    annotations = _annotations()
+
+    first = _export(video, annotations, output_dir)
+    rows_per_annotation = 7
+    _assert_indexes_complete(output_dir, rows_per_annotation * 4)
+    assert first.stats["incremental"]["reused_annotations"] == 0
+
+    second = _export(video, annotations[1:], output_dir)
+    assert second.stats["incremental"]["reused_annotations"] == 3
+    assert second.stats["incremental"]["removed_files"] == rows_per_annotation * 2
+    _assert_indexes_complete(output_dir, rows_per_annotation * 3)
+
+
+def test_inserting_an_annotation_keeps_reused_files(tmp_path):
+    video = tmp_path / "video.avi"
+    _make_video(video)
+    output_dir = tmp_path / "dataset"
+    annotations = _annotations()
+
+    _export(video, annotations[1:], output_dir, shard_workers=2)
+    second = _export(video, annotations, output_dir, shard_workers=2)
+    assert second.stats["incremental"]["reused_annotations"] == 3
+    assert second.stats["incremental"]["removed_files"] == 0
+    _assert_indexes_complete(output_dir, 7 * 4)
@@ -37,6 +37,14 @@ class TimeUtils:
 class FileUtils:
     """文件操作工具函数"""
 
+    @staticmethod
+    def format_size(num_bytes: float) -> str:
+        """格式化文件大小显示"""
+        for unit in ("B", "KB", "MB", "GB"):
+            if num_bytes < 1024 or unit == "GB":
+                return f"{num_bytes:.0f}{unit}" if unit == "B" else f"{num_bytes:.1f}{unit}"
+            num_bytes /= 1024
+
     @staticmethod
     def get_video_extensions() -> tuple:
         """获取支持的视频文件扩展名"""
@@ -0,0 +1,278 @@
+"""
+视频录制器 - 录制线程和有界帧队列
+write_frame() 只把收到的JPEG数据放入队列，录制线程按顺序写入文件，编码和磁盘耗时不会阻塞接收和界面。
+录制直接由接收线程按到达顺序送入，不经过预览用的解码线程池，解码繁忙不会丢失录制帧；
+只有 mp4v 编码或裁剪ROI时才在录制线程中解码。
+队列已满时按溢出策略处理：等待（接收线程暂停读取，不丢帧）、丢弃最旧的帧或丢弃新到的帧。
+计时模式 measured 写入每一帧，视频帧率为实测的平均输入帧率；constant 按到达时间重复或丢弃帧，
+使视频的第 i 帧对应录制开始后 i/目标帧率 秒。两种模式都记录逐帧到达时间（见 frame_timing）。
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+import cv2
+import numpy as np
+from frame_transform import clamp_roi
+from mjpeg_writer import MjpegAviWriter
+from frame_timing import TIMING_MODES, DEFAULT_RECORD_FPS, TimestampWriter, measured_fps
+
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+DEFAULT_OVERFLOW_POLICY = "block"
+DEFAULT_RECORD_QUEUE_SIZE = 64
+
+
+class VideoRecorder:
+    """视频录制器
+
+    write_frame() 在接收线程中调用，不会阻塞GUI线程（block 策略只会让接收线程等待）。
+    直通模式把收到的JPEG数据原样写入MJPEG AVI，不重新编码；只有裁剪ROI时才对裁剪区域编码JPEG。
+    """
+
+    JPEG_QUALITY = 95  # 直通模式下裁剪ROI后重新编码的质量
+
+    def __init__(self, queue_size: int = DEFAULT_RECORD_QUEUE_SIZE,
+                 overflow_policy: str = DEFAULT_OVERFLOW_POLICY,
+                 timing_mode: str = "measured", target_fps: float = DEFAULT_RECORD_FPS):
+        self.writer = None
+        self.is_recording = False
+        self.passthrough = False
+        self.frame_count = 0
+        self.output_path = ""
+        self.roi = None
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.timing_mode = timing_mode
+        self.target_fps = target_fps
+        self.fps = DEFAULT_RECORD_FPS   # 视频文件的帧率
+
+        self._frames: deque = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self.dropped_frames = 0
+        self.max_queue_depth = 0
+        self.decode_failed = 0
+
+        # 计时状态（只在录制线程中修改）
+        self._timestamps = None
+        self._first_time = None
+        self._last_time = None
+        self._last_written = None
+        self.source_frames = 0
+        self.duplicated_frames = 0
+        self.rate_dropped_frames = 0
+
+    def start_recording(self, output_path: str, frame_size: tuple, roi: tuple = None,
+                        passthrough: bool = False, fps_hint: float = 0.0):
+        """开始录制，roi 为 (x, y, w, h) 时只录制该区域，frame_size 为裁剪后的尺寸
+
+        passthrough 为True时写入MJPEG AVI（output_path 应为 .avi），否则用 mp4v 重新编码。
+        fps_hint 为录制前实测的输入帧率：mp4v 的帧率只能在打开时设置，measured 模式按它打开；
+        MJPEG AVI 在停止时按整个录制的实测帧率回填。
+        """
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            print(f"未知的队列溢出策略: {self.overflow_policy}")
+            return False
+        if self.timing_mode not in TIMING_MODES:
+            print(f"未知的录制计时模式: {self.timing_mode}")
+            return False
+        try:
+            self.output_path = output_path
+            if self.timing_mode == "constant":
+                self.fps = float(self.target_fps)
+            else:
+                self.fps = round(fps_hint, 3) if fps_hint > 0 else DEFAULT_RECORD_FPS
+            if passthrough:
+                self.writer = MjpegAviWriter(output_path, frame_size[0], frame_size[1], self.fps)
+            else:
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                self.writer = cv2.VideoWriter(output_path, fourcc, self.fps, frame_size)
+            self._timestamps = TimestampWriter(output_path)
+            self.passthrough = passthrough
+            self.roi = roi
+            self.frame_count = 0
+            self.dropped_frames = 0
+            self.max_queue_depth = 0
+            self.decode_failed = 0
+            self._first_time = None
+            self._last_time = None
+            self._last_written = None
+            self.source_frames = 0
+            self.duplicated_frames = 0
+            self.rate_dropped_frames = 0
+            self._frames.clear()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._write_loop, name="video-recorder", daemon=True)
+            self._thread.start()
+            self.is_recording = True
+            print(f"开始录制到: {output_path}, 尺寸: {frame_size}, {'直通MJPEG' if passthrough else 'mp4v'}, "
+                  f"{self.timing_mode} {self.fps:g} fps, 队列 {self.queue_size} 帧 ({self.overflow_policy})")
+            return True
+        except Exception as e:
+            print(f"开始录制失败: {e}")
+            return False
+
+    def write_frame(self, jpeg: bytes, timestamp: Optional[float] = None, sequence: int = -1) -> bool:
+        """把收到的一帧JPEG数据放入录制队列，返回是否入队
+
+        timestamp 为该帧的到达时间（time.monotonic()），sequence 为接收序号，记录到时间戳文件中。
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        with self._cond:
+            if not self.is_recording:
+                return False
+            if len(self._frames) >= self.queue_size:
+                if self.overflow_policy == "drop_newest":
+                    self.dropped_frames += 1
+                    return False
+                if self.overflow_policy == "drop_oldest":
+                    self._frames.popleft()
+                    self.dropped_frames += 1
+                else:
+                    while len(self._frames) >= self.queue_size and self.is_recording:
+                        self._cond.wait()
+                    if not self.is_recording:
+                        return False
+            self._frames.append((jpeg, timestamp, sequence))
+            self.max_queue_depth = max(self.max_queue_depth, len(self._frames))
+            self._cond.notify_all()
+        return True
+
+    @property
+    def queue_depth(self) -> int:
+        """录制队列中等待写入的帧数"""
+        return len(self._frames)
+
+    def get_stats(self) -> Dict[str, int]:
+        """录制统计"""
+        return {
+            "written": self.frame_count,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "dropped": self.dropped_frames,
+            "duplicated": self.duplicated_frames,
+            "rate_dropped": self.rate_dropped_frames,
+            "decode_failed": self.decode_failed
+        }
+
+    @property
+    def measured_fps(self) -> float:
+        """本次录制的实测平均输入帧率"""
+        if self._first_time is None:
+            return 0.0
+        return measured_fps(self._first_time, self._last_time, self.source_frames)
+
+    def _write_loop(self):
+        """录制线程"""
+        while True:
+            with self._cond:
+                while not self._frames and not self._stopping:
+                    self._cond.wait()
+                if not self._frames:
+                    return
+                item = self._frames.popleft()
+                self._cond.notify_all()
+            self._record(*item)
+
+    def _record(self, jpeg: bytes, timestamp: float, sequence: int):
+        """按计时模式写入一帧
+
+        constant 模式下该帧对应的输出帧号为 round(到达时间 * 目标帧率)：
+        前面空缺的帧号重复上一帧，帧号已被占用（到达过密）时丢弃该帧。
+        """
+        if self._first_time is None:
+            self._first_time = timestamp
+        self._last_time = timestamp
+        self.source_frames += 1
+        seconds = timestamp - self._first_time
+
+        if self.timing_mode == "constant":
+            slot = int(round(seconds * self.fps))
+            if slot < self.frame_count:
+                self.rate_dropped_frames += 1
+                return
+            while self.frame_count < slot and self._last_written is not None:
+                data, last_sequence, last_seconds = self._last_written
+                if not self._write(data, last_sequence, last_seconds):
+                    return
+                self.duplicated_frames += 1
+
+        data = self._encode(jpeg)
+        if data is not None and self._write(data, sequence, seconds):
+            self._last_written = (data, sequence, seconds)
+
+    def _encode(self, jpeg: bytes):
+        """返回写入的数据：直通且不裁剪时为原始JPEG数据，不解码；否则解码、裁剪ROI后为图像或重新编码的JPEG"""
+        if self.passthrough and self.roi is None:
+            # 不解码，只检查JPEG起始标记，避免把无效数据写入视频
+            if not jpeg.startswith(b"\xff\xd8"):
+                self.decode_failed += 1
+                return None
+            return jpeg
+        try:
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        except cv2.error:
+            frame = None
+        if frame is None:
+            self.decode_failed += 1
+            return None
+        if self.roi is not None:
+            h, w = frame.shape[:2]
+            x, y, x2, y2 = clamp_roi(self.roi, w, h)
+            frame = frame[y:y2, x:x2]
+        if not self.passthrough:
+            return frame
+        try:
+            return cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.JPEG_QUALITY])[1].tobytes()
+        except cv2.error as e:
+            print(f"编码帧失败: {e}")
+            return None
+
+    def _write(self, data, sequence: int, seconds: float) -> bool:
+        """写入一帧并记录时间戳"""
+        try:
+            if self.passthrough:
+                if not self.writer.write(data):
+                    return False
+            else:
+                self.writer.write(data)
+            self._timestamps.write(self.frame_count, sequence, seconds)
+        except (cv2.error, OSError) as e:
+            print(f"写入帧失败: {e}")
+            return False
+        self.frame_count += 1
+        return True
+
+    def stop_recording(self):
+        """停止录制，队列中剩余的帧写完后关闭文件"""
+        with self._cond:
+            self.is_recording = False
+            self._stopping = True
+            pending = len(self._frames)
+            self._cond.notify_all()
+        if self._thread is not None:
+            if pending:
+                print(f"等待写入剩余 {pending} 帧...")
+            self._thread.join()
+            self._thread = None
+        source_fps = self.measured_fps
+        if self.writer:
+            if self.passthrough:
+                # measured 模式按整个录制的实测帧率回填AVI文件头
+                if self.timing_mode == "measured" and source_fps > 0:
+                    self.fps = round(source_fps, 3)
+                self.writer.close(self.fps)
+            else:
+                self.writer.release()
+            self.writer = None
+        if self._timestamps is not None:
+            self._timestamps.close()
+            self._timestamps = None
+        print(f"录制停止，共录制 {self.frame_count} 帧，队列满丢弃 {self.dropped_frames} 帧，"
+              f"队列最大 {self.max_queue_depth} 帧")
+        print(f"实测输入帧率 {source_fps:.2f} fps，视频帧率 {self.fps:g} fps ({self.timing_mode})，"
+              f"重复 {self.duplicated_frames} 帧，按帧率丢弃 {self.rate_dropped_frames} 帧")
+        return self.output_path, self.frame_count
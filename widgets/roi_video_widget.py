@@ -6,6 +6,7 @@ import numpy as np
 from PyQt6.QtWidgets import QLabel
 from PyQt6.QtCore import Qt, pyqtSignal, QPoint, QRect
 from PyQt6.QtGui import QPainter, QPen, QColor, QPixmap, QImage, QBrush
+from frame_transform import clamp_roi
 
 
 class ROIVideoWidget(QLabel):
@@ -109,12 +110,9 @@ class ROIVideoWidget(QLabel):
             return image
 
         roi = self.original_roi_rect
-        # 确保ROI在图像范围内
+        # 确保ROI在图像范围内（与导出时的ROI裁剪规则一致）
         h, w = image.shape[:2]
-        x = max(0, min(roi.x(), w - 1))
-        y = max(0, min(roi.y(), h - 1))
-        x2 = max(x + 1, min(roi.x() + roi.width(), w))
-        y2 = max(y + 1, min(roi.y() + roi.height(), h))
+        x, y, x2, y2 = clamp_roi((roi.x(), roi.y(), roi.width(), roi.height()), w, h)
 
         return image[y:y2, x:x2]
 